@@ -0,0 +1,153 @@
+# glog scale benchmarks: create / collect / semantic_versioning / report.
+#
+# Every phase runs in its own fresh process against synthetic data, so the
+# peak RSS reported is that phase's alone. Results go to a JSON file that
+# can be compared with a previous run to catch regressions:
+#
+#   python benchmarks/scale.py                          # 1k and 10k
+#   python benchmarks/scale.py --sizes 1000,10000,100000,1000000
+#   python benchmarks/scale.py --output new.json --compare old.json
+#
+# 1M artifacts means 1M files on disk, make sure the temp folder can take it.
+
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent / "src"))
+sys.path.insert(0, str(HERE))
+
+import synthetic  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # windows
+    resource = None
+
+PHASES = ["create_artifact", "collect_changelogs", "semantic_versioning", "build_report", "write_report"]
+
+# a regression is flagged when a phase gets this much slower
+REGRESSION_RATIO = 1.25
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_phase(phase: str, size: int, workdir: str) -> dict:
+    """
+    Prepares the data for one phase, then times it. Runs in a child process.
+    """
+    from gslogger import glog, jin
+
+    root = Path(workdir)
+    config = synthetic.make_project(root)
+    os.chdir(root)
+
+    if phase == "collect_changelogs":
+        synthetic.make_artifacts(config, size)
+    elif phase in ("build_report", "write_report"):
+        synthetic.make_store(config, size)
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        started = time.perf_counter()
+
+        if phase == "create_artifact":
+            # the non-interactive half of create_artifact
+            for i in range(size):
+                glog.write_artifact(config, "ADDED", f"benchmark artifact number {i}")
+        elif phase == "collect_changelogs":
+            glog.collect_changelogs(config)
+        elif phase == "semantic_versioning":
+            build, version = 0, [0, 0, 0]
+            for i in range(size):
+                build, version = glog.semantic_versioning(build, version, "--f" if i % 50 == 0 else "fix")
+        elif phase == "build_report":
+            jin.build_report(config)
+        elif phase == "write_report":
+            jin.write_report(config)
+
+        wall = time.perf_counter() - started
+
+    return {
+        "phase": phase,
+        "size": size,
+        "wall_s": round(wall, 4),
+        "items_per_sec": round(size / wall, 1) if wall else None,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def compare(results: list, previous: Path) -> bool:
+    """
+    Prints each phase against a previous results file.
+
+    :return: True when any phase is slower by more than REGRESSION_RATIO
+    """
+    old = {(r["phase"], r["size"]): r for r in json.loads(previous.read_text())["results"]}
+    regressed = False
+    print(f"\ncompared with {previous}:")
+    for r in results:
+        before = old.get((r["phase"], r["size"]))
+        if not before or not before["wall_s"]:
+            continue
+        ratio = r["wall_s"] / before["wall_s"]
+        flag = "REGRESSION" if ratio > REGRESSION_RATIO else ""
+        regressed |= ratio > REGRESSION_RATIO
+        print(f"  {r['phase']:<20} {r['size']:>9}  x{ratio:5.2f} {flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="glog scale benchmarks")
+    parser.add_argument("--sizes", default="1000,10000", help="comma separated entry counts")
+    parser.add_argument("--phases", default=",".join(PHASES), help="comma separated phases")
+    parser.add_argument("--output", default="benchmark_results.json", help="results JSON file")
+    parser.add_argument("--compare", type=Path, help="a previous results JSON file")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    phases = args.phases.split(",")
+    results = []
+
+    print(f"{'phase':<20} {'size':>9} {'wall s':>9} {'items/s':>11} {'peak MB':>8}")
+    for size in sizes:
+        for phase in phases:
+            with tempfile.TemporaryDirectory() as tmp:
+                # a fresh process per phase keeps peak RSS honest
+                with ProcessPoolExecutor(max_workers=1) as pool:
+                    r = pool.submit(run_phase, phase, size, tmp).result()
+            results.append(r)
+            print(
+                f"{r['phase']:<20} {r['size']:>9} {r['wall_s']:>9.3f} "
+                f"{r['items_per_sec'] or 0:>11.0f} {r['peak_rss_mb'] or 0:>8.1f}"
+            )
+
+    report = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    Path(args.output).write_text(json.dumps(report, indent=4), encoding="utf-8")
+    print(f"\nresults written to {args.output}")
+
+    if args.compare and compare(results, args.compare):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# glog cold start benchmark.
+#
+# Times fresh `python -m gslogger.glog` processes, the way pre-commit hooks
+# call glog, in a throw-away project and compares the median against
+# STARTUP_BUDGET_MS.
+#
+#   python benchmarks/startup.py            # 20 runs per command
+#   python benchmarks/startup.py --runs 50
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from synthetic import make_project
+
+HERE = Path(__file__).resolve().parent
+SRC = HERE.parent / "src"
+
+# median wall time for one glog process on a developer laptop
+STARTUP_BUDGET_MS = 150
+
+COMMANDS = {
+    "help": ["-h"],
+    "query (no match)": ["-q", "--versions", "v999.0.0.."],
+}
+
+
+def time_command(root: Path, args: list, runs: int) -> list:
+    env = dict(os.environ, PYTHONPATH=str(SRC))
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-m", "gslogger.glog", *args],
+            cwd=root,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            check=True,
+        )
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="glog cold start benchmark")
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    # the interpreter alone, to see what glog adds on top of it
+    baseline = []
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], check=True)
+        baseline.append((time.perf_counter() - started) * 1000)
+    print(f"{'python -c pass':<20} median {statistics.median(baseline):7.1f} ms")
+
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        make_project(root)
+        for name, cmd in COMMANDS.items():
+            median = statistics.median(time_command(root, cmd, args.runs))
+            verdict = "ok" if median <= STARTUP_BUDGET_MS else "OVER BUDGET"
+            failed |= median > STARTUP_BUDGET_MS
+            print(f"{name:<20} median {median:7.1f} ms  (budget {STARTUP_BUDGET_MS} ms) {verdict}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# concurrency stress test: many artifact writers and collectors at once.
+#
+# Writer processes add uniquely numbered artifacts as fast as they can,
+# while collector processes run collect_changelogs in a loop. Once the
+# writers are done a final collect picks up the rest, then every message
+# is looked up in the log store. Exits non-zero if any artifact was lost
+# or collected twice.
+#
+#   python benchmarks/stress_concurrency.py
+#   python benchmarks/stress_concurrency.py --writers 16 --per-writer 500 --collectors 3
+#   python benchmarks/stress_concurrency.py --format spool
+
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent / "src"))
+sys.path.insert(0, str(HERE))
+
+import synthetic  # noqa: E402
+
+
+def _config(root: str) -> dict:
+    return json.loads((Path(root) / "glog.json").read_text(encoding="utf-8"))
+
+
+def writer(root: str, n: int, count: int) -> None:
+    from gslogger import glog
+
+    os.chdir(root)
+    data = _config(root)
+    for i in range(count):
+        # collect capitalizes messages, keep them lower case to compare
+        glog.write_artifact(data, "FIXED", f"writer {n} artifact {i} stress")
+
+
+def collector(root: str, done, rounds) -> None:
+    from gslogger import glog
+
+    os.chdir(root)
+    while not done.is_set():
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            if glog.collect_changelogs(_config(root)):
+                with rounds.get_lock():
+                    rounds.value += 1
+        time.sleep(0.01)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="glog concurrent writer / collector stress test")
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--per-writer", type=int, default=200)
+    parser.add_argument("--collectors", type=int, default=2)
+    parser.add_argument("--format", choices=["files", "spool"], default="files")
+    args = parser.parse_args()
+
+    from gslogger import glog, store
+
+    with tempfile.TemporaryDirectory() as tmp:
+        synthetic.make_project(Path(tmp), artifact_format=args.format)
+        done = multiprocessing.Event()
+        rounds = multiprocessing.Value("i", 0)
+
+        started = time.perf_counter()
+        collectors = [
+            multiprocessing.Process(target=collector, args=(tmp, done, rounds))
+            for _ in range(args.collectors)
+        ]
+        writers = [
+            multiprocessing.Process(target=writer, args=(tmp, n, args.per_writer))
+            for n in range(args.writers)
+        ]
+        for p in collectors + writers:
+            p.start()
+        for p in writers:
+            p.join()
+        done.set()
+        for p in collectors:
+            p.join()
+
+        os.chdir(tmp)
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            glog.collect_changelogs(_config(tmp))
+        elapsed = time.perf_counter() - started
+
+        seen = Counter()
+        for record in store.iter_versions(_config(tmp)):
+            for messages in record["logs"].values():
+                seen.update(m.lower() for m in messages)
+        os.chdir(HERE)
+
+    expected = {
+        f"writer {n} artifact {i} stress" for n in range(args.writers) for i in range(args.per_writer)
+    }
+    lost = expected - set(seen)
+    duplicated = [m for m, c in seen.items() if c > 1]
+
+    total = args.writers * args.per_writer
+    print(f"{total} artifacts, {args.writers} writers, {args.collectors} collectors, format {args.format}")
+    print(f"{rounds.value} concurrent collects, {elapsed:.2f}s, {total / elapsed:.0f} artifacts/sec")
+    print(f"lost: {len(lost)}  duplicated: {len(duplicated)}")
+    if lost or duplicated:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# synthetic glog projects for the benchmarks.
+#
+# make_project    a glog.json and empty ch-logs folder
+# make_artifacts  n artifact files, as `glog` would leave them
+# make_store      a segmented log store holding n collected versions
+
+import datetime
+import json
+import random
+from pathlib import Path
+
+CHTYPES = ["FUTURE UPDATES", "ADDED", "CHANGED", "REMOVED", "FIXED", "SECURITY"]
+WORDS = (
+    "parser config store render cache segment version build artifact "
+    "collect output template index query journal fix update remove add"
+).split()
+
+
+def make_project(root: Path, **app) -> dict:
+    """
+    Writes a minimal glog.json into root and returns it as running config.
+
+    :param root: The project folder, must exist
+    :param app: Extra keys for the "app" section
+    :return: The configuration dict
+    """
+    (root / "ch-logs").mkdir(exist_ok=True)
+    config = {
+        "CHTYPES": list(CHTYPES),
+        "app": {
+            "app_title": "bench",
+            "atf_pattern": ".txt",
+            "build_number": 0,
+            "f_count": 0,
+            "version_number": [0, 0, 0],
+            **app,
+        },
+        "dev": {"dev_email": "bench@example.com", "dev_link": "", "developer": "bench"},
+        "paths": {
+            "CWD": str(root),
+            "DIR_OUTPUT": str(root / "ch-logs"),
+            "FILE_CONFIG": str(root / "glog.json"),
+            "FILE_LOG": str(root / "ch-logs" / "log_store.json"),
+            "FILE_OUTPUT": str(root / "changelog.md"),
+        },
+    }
+    (root / "glog.json").write_text(json.dumps(config, indent=4), encoding="utf-8")
+    return config
+
+
+def _message(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 12)))
+
+
+def make_artifacts(config: dict, n: int, seed: int = 0) -> None:
+    """
+    Writes n artifact files into DIR_OUTPUT, with unique sortable names.
+
+    :param config: The configuration from make_project
+    :param n: Number of artifacts
+    :param seed: Random seed, the same seed gives the same files
+    :return: None
+    """
+    rng = random.Random(seed)
+    folder = Path(config["paths"]["DIR_OUTPUT"])
+    for i in range(n):
+        a_type = rng.choice(CHTYPES)
+        stamp = f"2024-01-01-00-00-00-{i:08d}"
+        with open(folder / f"{stamp}-{a_type}.txt", "w") as f:
+            f.write(f"{stamp}\n{a_type}\n{_message(rng)}\nDev {i % 7} <dev{i % 7}@example.com>\n")
+
+
+def make_store(config: dict, n: int, seed: int = 0, segment_size: int = 256) -> None:
+    """
+    Writes a segmented log store of n versions, streamed, never all in memory.
+
+    :param config: The configuration from make_project
+    :param n: Number of versions
+    :param seed: Random seed
+    :param segment_size: Records per segment, see store.SEGMENT_SIZE
+    :return: None
+    """
+    rng = random.Random(seed)
+    folder = Path(config["paths"]["DIR_OUTPUT"]) / "store"
+    folder.mkdir(parents=True, exist_ok=True)
+
+    manifest = {"format": 1, "count": 0, "doc_parts": {"futures": []}, "segments": []}
+    fs = None
+    for i in range(n):
+        if i % segment_size == 0:
+            if fs:
+                fs.close()
+            name = f"seg-{len(manifest['segments']):06d}.jsonl"
+            fs = open(folder / name, "w", encoding="utf-8")
+            manifest["segments"].append({"name": name, "count": 0})
+
+        version = [i // 10000, (i // 100) % 100, i % 100]
+        logs = {}
+        for a_type in rng.sample(CHTYPES[1:], rng.randint(1, 3)):
+            logs[a_type] = [_message(rng).capitalize() for _ in range(rng.randint(1, 4))]
+        record = {
+            "build_number": i + 1,
+            "contributors": f"Dev {i % 7} <dev{i % 7}@example.com>",
+            "date": (datetime.date(2000, 1, 1) + datetime.timedelta(days=i // 4)).isoformat(),
+            "logs": logs,
+            "version_number": version,
+        }
+        fs.write(json.dumps(record, sort_keys=True) + "\n")
+
+        segment = manifest["segments"][-1]
+        segment["count"] += 1
+        segment.setdefault("first", version)
+        segment["last"] = version
+        manifest["count"] += 1
+
+    if fs:
+        fs.close()
+    (folder / "manifest.json").write_text(json.dumps(manifest, indent=4), encoding="utf-8")
@@ -135,7 +135,8 @@ try:
     for target in targets:
         target.write_text(toml.dumps(para_dict), encoding="utf-8")
 
-    print(f"Success building configs! \n{'\n'.join(map(str, targets))}")
+    target_list = "\n".join(map(str, targets))
+    print(f"Success building configs! \n{target_list}")
 except Exception as e:
     print(f"ERROR Building Configs: {e}")
 
@@ -1,6 +1,10 @@
-try:
-    from version import __version__, __author__, __author_email__
-except ImportError:
-    from .version import __version__, __author__, __author_email__
+__all__ = ["__version__", "__author__", "__author_email__"]
 
-__all__ = [__version__, __author__, __author_email__]
+
+def __getattr__(name):
+    # resolved on first use, importing gslogger doesn't read glog.json
+    if name in __all__:
+        from . import version
+
+        return getattr(version, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
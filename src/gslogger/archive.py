@@ -0,0 +1,125 @@
+# compressed archive segments for the log store.
+#
+# `glog --compact` swaps old store segments for archives: the same JSON
+# lines, compressed in blocks of ARCHIVE_BLOCK records, each block its own
+# gzip member (or xz stream), so the file as a whole still opens with zcat
+# or xz -d. Beside each archive a small offset index lists the blocks:
+#
+#   arc-000000.jsonl.gz     block 0 | block 1 | ...
+#   arc-000000.idx.json     {"codec": "gzip", "blocks": [[offset, length, records], ...]}
+#
+# Readers memory-map the archive and decode a block only when a line in it
+# is asked for, so an archive costs nothing until a render or query reaches
+# that far back. Lines come back exactly as they were stored, which keeps
+# every hash of a record (render cache, query index) valid across a compact.
+
+import gzip
+import json
+import lzma
+import mmap
+from bisect import bisect_right
+from pathlib import Path
+
+ARCHIVE_BLOCK = 64
+INDEX_SUFFIX = ".idx.json"
+
+# codec -> (file suffix, compress, decompress)
+CODECS = {
+    "gzip": (".jsonl.gz", lambda b: gzip.compress(b, compresslevel=9, mtime=0), gzip.decompress),
+    "lzma": (".jsonl.xz", lambda b: lzma.compress(b, preset=6), lzma.decompress),
+}
+
+
+def archive_name(index: int, codec: str) -> str:
+    # store.is_archived() goes by the "arc-" prefix
+    return f"arc-{index:06d}{CODECS[codec][0]}"
+
+
+def index_name(name: str) -> str:
+    return name.split(".", 1)[0] + INDEX_SUFFIX
+
+
+def write_archive(folder: Path, name: str, codec: str, lines: list) -> int:
+    """
+    Writes lines (oldest first, each ending in a newline) as an archive and
+    its offset index.
+
+    :param folder: The store folder
+    :param name: From archive_name()
+    :param codec: A CODECS key
+    :param lines: The segment's raw lines
+    :return: The archive's size in bytes
+    """
+    compress = CODECS[codec][1]
+    blocks, offset = [], 0
+    tmp = folder / (name + ".tmp")
+    with open(tmp, "wb") as fs:
+        for start in range(0, len(lines), ARCHIVE_BLOCK):
+            chunk = lines[start : start + ARCHIVE_BLOCK]
+            packed = compress("".join(chunk).encode("utf-8"))
+            fs.write(packed)
+            blocks.append([offset, len(packed), len(chunk)])
+            offset += len(packed)
+    # the index first: an archive is only used once the manifest names it,
+    # and then both are complete
+    (folder / index_name(name)).write_text(json.dumps({"codec": codec, "blocks": blocks}), encoding="utf-8")
+    tmp.replace(folder / name)
+    return offset
+
+
+class Archive:
+    """
+    One archive segment, memory-mapped and decoded a block at a time.
+    """
+
+    def __init__(self, folder: Path, name: str):
+        index = json.loads((folder / index_name(name)).read_text(encoding="utf-8"))
+        self.blocks = index["blocks"]
+        self.decompress = CODECS[index["codec"]][2]
+        # the line number each block starts at
+        self.starts = []
+        total = 0
+        for _, _, count in self.blocks:
+            self.starts.append(total)
+            total += count
+        self.count = total
+        with open(folder / name, "rb") as fs:
+            self.map = mmap.mmap(fs.fileno(), 0, access=mmap.ACCESS_READ)
+        self._cached = (None, None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def block(self, n: int) -> list:
+        """
+        :param n: The block number
+        :return: Its lines, oldest first, without newlines
+        """
+        if self._cached[0] != n:
+            offset, length, _ = self.blocks[n]
+            text = self.decompress(self.map[offset : offset + length]).decode("utf-8")
+            self._cached = (n, [line for line in text.split("\n") if line.strip()])
+        return self._cached[1]
+
+    def line(self, line_no: int) -> str:
+        """
+        :param line_no: The line's position in the segment, 0 is the oldest
+        :return: The raw JSON line
+        """
+        n = bisect_right(self.starts, line_no) - 1
+        return self.block(n)[line_no - self.starts[n]]
+
+    def lines(self) -> list:
+        """
+        :return: Every raw JSON line, oldest first
+        """
+        out = []
+        for n in range(len(self.blocks)):
+            out.extend(self.block(n))
+        return out
+
+    def close(self) -> None:
+        self.map.close()
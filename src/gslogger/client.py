@@ -0,0 +1,57 @@
+# Talking to a running `glog serve` (see daemon.py).
+#
+# Kept apart from the daemon so the CLI, which asks the socket before every
+# add, -c and -g, only pays for a plain socket connect and never imports
+# asyncio.
+
+import json
+import socket
+from pathlib import Path
+
+SOCKET = ".glog.sock"
+
+
+def socket_path(data: dict) -> Path:
+    """
+    Returns the daemon socket location, inside paths.DIR_OUTPUT.
+
+    :param data: The running configuration
+    :return: A Path
+    """
+    return Path(data["paths"]["DIR_OUTPUT"]) / SOCKET
+
+
+def supported() -> bool:
+    return hasattr(socket, "AF_UNIX")
+
+
+def request(data: dict, message: dict, timeout: float = 60.0):
+    """
+    Sends one request to a running daemon.
+
+    :param data: The running configuration, only paths are used
+    :param message: The request
+    :param timeout: Seconds to wait for the reply
+    :return: The reply dict, or None when no daemon is listening
+    """
+    target = socket_path(data)
+    if not supported() or not target.exists():
+        return None
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        try:
+            sock.connect(str(target))
+        except OSError:
+            # a socket file left behind by a daemon that died
+            return None
+        sock.sendall(json.dumps(message).encode("utf-8") + b"\n")
+        with sock.makefile("rb") as fs:
+            line = fs.readline()
+    finally:
+        sock.close()
+
+    if not line:
+        raise ConnectionError(f"DAEMON: {target} closed without a reply")
+    return json.loads(line)
@@ -0,0 +1,186 @@
+# glog serve: one long running glog for many short lived clients.
+#
+# CI jobs that each start glog pay for interpreter start up and race each
+# other in DIR_OUTPUT. `glog serve` listens on a Unix socket in DIR_OUTPUT
+# instead, keeps the config and the imported store / render code warm, and
+# does all disk work itself, one operation at a time.
+#
+# The protocol is JSON lines, one request and one reply per line:
+#
+#   {"cmd": "add", "entries": [{"type": "FIXED", "message": "..."}]}
+#   {"cmd": "collect"}   {"cmd": "generate"}   {"cmd": "ping"}   {"cmd": "stop"}
+#
+#   {"ok": true, "message": "ADD: 2 artifacts created.", "result": [...]}
+#   {"ok": false, "error": "..."}
+#
+# Adds are group committed: requests arriving within COMMIT_WINDOW of each
+# other (up to MAX_BATCH entries) are written by one add_artifacts call,
+# which is a single append with the spool format. Each request is checked
+# on its own first, so one bad entry only fails its own request.
+#
+# The glog CLI tries the socket first for add, -c and -g and falls back to
+# working on the files directly when no daemon answers, through client.py,
+# so asking the socket never imports asyncio.
+
+import asyncio
+import json
+import os
+import signal
+from pathlib import Path
+
+try:
+    from client import request, socket_path, supported
+    from extras import load_config
+    from instrument import log
+except ImportError:
+    from .client import request, socket_path, supported
+    from .extras import load_config
+    from .instrument import log
+
+COMMIT_WINDOW = 0.005
+MAX_BATCH = 1000
+
+
+class Daemon:
+    """
+    The state behind one `glog serve`: config, the add queue and a disk lock.
+    """
+
+    def __init__(self, data: dict, check, add, collect, generate):
+        self.config_file = data["paths"]["FILE_CONFIG"]
+        self.check = check
+        self.add = add
+        self.collect = collect
+        self.generate = generate
+        self.pending = []
+        self.wake = asyncio.Event()
+        self.disk = asyncio.Lock()
+        self.stopped = asyncio.Event()
+
+    def config(self) -> dict:
+        # mtime checked, so a glog.json changed by anyone else is picked up
+        return load_config(self.config_file)
+
+    async def on_disk(self, func, *args):
+        # one disk operation at a time, off the event loop
+        async with self.disk:
+            return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    async def committer(self) -> None:
+        while True:
+            await self.wake.wait()
+            await asyncio.sleep(COMMIT_WINDOW)
+            self.wake.clear()
+
+            batch, size = [], 0
+            while self.pending and (not batch or size + len(self.pending[0][0]) <= MAX_BATCH):
+                entries, future = self.pending.pop(0)
+                batch.append((entries, future))
+                size += len(entries)
+            if self.pending:
+                self.wake.set()
+
+            try:
+                files = await self.on_disk(self.add, self.config(), [e for es, _ in batch for e in es])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            log.debug(f"DAEMON: group commit of {size} artifacts from {len(batch)} requests")
+            start = 0
+            for entries, future in batch:
+                future.set_result(files[start : start + len(entries)])
+                start += len(entries)
+
+    async def handle(self, message: dict) -> dict:
+        cmd = message.get("cmd")
+
+        if cmd == "ping":
+            return {"ok": True, "message": "DAEMON: running", "result": os.getpid()}
+
+        if cmd == "stop":
+            self.stopped.set()
+            return {"ok": True, "message": "DAEMON: stopping"}
+
+        if cmd == "add":
+            data = self.config()
+            entries = message.get("entries") or []
+            for n, entry in enumerate(entries, start=1):
+                try:
+                    self.check(data, entry)
+                except ValueError as e:
+                    return {"ok": False, "error": f"ADD: entry {n}: {e}"}
+            future = asyncio.get_running_loop().create_future()
+            self.pending.append((entries, future))
+            self.wake.set()
+            files = await future
+            created = sum(f is not None for f in files)
+            return {"ok": True, "message": f"ADD: {created} artifacts created.", "result": files}
+
+        if cmd == "collect":
+            collected = await self.on_disk(self.collect, self.config())
+            text = "collected" if collected else "nothing to collect"
+            return {"ok": True, "message": f"DAEMON: {text}", "result": collected}
+
+        if cmd == "generate":
+            written = await self.on_disk(self.generate, self.config())
+            text = "Changelog generated" if written else "Changelog up to date"
+            return {"ok": True, "message": text, "result": written}
+
+        return {"ok": False, "error": f"DAEMON: unknown command {cmd!r}"}
+
+    async def client(self, reader, writer) -> None:
+        try:
+            while line := await reader.readline():
+                try:
+                    reply = await self.handle(json.loads(line))
+                except Exception as e:
+                    reply = {"ok": False, "error": str(e)}
+                writer.write(json.dumps(reply).encode("utf-8") + b"\n")
+                await writer.drain()
+        finally:
+            writer.close()
+
+
+async def _serve(daemon: Daemon, target: Path) -> None:
+    server = await asyncio.start_unix_server(daemon.client, path=str(target))
+    committer = asyncio.create_task(daemon.committer())
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, daemon.stopped.set)
+
+    log.info(f"DAEMON: listening on {target} (pid {os.getpid()})")
+    async with server:
+        await daemon.stopped.wait()
+    committer.cancel()
+
+
+def serve(data: dict, check, add, collect, generate) -> None:
+    """
+    Runs the daemon in the foreground until stopped.
+
+    The commands are passed in by glog, so this module doesn't import it.
+
+    :param data: The running configuration
+    :param check: check_entry(data, entry)
+    :param add: add_artifacts(data, entries) -> list
+    :param collect: collect_changelogs(data) -> bool
+    :param generate: write_report(data) -> bool
+    :return: None
+    """
+    if not supported():
+        raise RuntimeError("DAEMON: glog serve needs Unix domain sockets")
+
+    target = socket_path(data)
+    if target.exists():
+        if request(data, {"cmd": "ping"}) is not None:
+            raise RuntimeError(f"DAEMON: already running on {target}")
+        target.unlink()
+
+    try:
+        asyncio.run(_serve(Daemon(data, check, add, collect, generate), target))
+    finally:
+        target.unlink(missing_ok=True)
+        log.info("DAEMON: stopped")
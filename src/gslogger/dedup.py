@@ -0,0 +1,454 @@
+# duplicate artifacts, found by content hash.
+#
+# CI retries and rebased branches write the same artifact twice, and every
+# copy used to become its own changelog entry and version bump. Each entry
+# is hashed by its type and normalized message (case, whitespace and the
+# --r marker don't matter) into an index kept next to the store:
+#
+#   ch-logs/store/dedup/
+#   ├── meta.json      # the store generation, how many collected versions
+#   │                  #   the index covers and the newest of them
+#   ├── 000.json       # hash -> where it is: the newest version holding it
+#   ├── ...            #   "v0.2.72", an open future "futures", or
+#   └── fff.json       #   "pending:<artifact file or spool#id>"
+#
+# Sharded by the first 3 hex digits of the hash, so a lookup reads one small file
+# however long the history is. Writers look up every new artifact before
+# writing it and note it as pending afterwards; collect checks the whole
+# batch again, against the history and against itself, and stages the
+# shards it changed into its journal so the index lands with the version.
+# Only collect, under the collect lease, builds the index: writers never
+# open the store, and before the first collect they write unchecked.
+#
+# An entry is only a duplicate of history within app.dedup_window (default
+# DEDUP_WINDOW) of the newest versions, a retry or a rebase lands soon after
+# the original, while "Updated dependencies" may rightly come back any time.
+# A future stops being one once it's resolved.
+#
+# What happens to a duplicate is app.dedup_policy:
+#
+#   "keep"   collected as before, only reported (default)
+#   "skip"   not written, not collected
+#   "merge"  collected into no entry and no version bump, its contributor
+#            is credited on the version being collected
+
+import contextlib
+import hashlib
+import json
+import os
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # windows, concurrent writers may drop each other's pending notes
+    fcntl = None
+
+try:
+    from instrument import log, span
+    from journal import stage
+    from todo import OPEN, records
+    import spool
+except ImportError:
+    from .instrument import log, span
+    from .journal import stage
+    from .todo import OPEN, records
+    from . import spool
+
+DEDUP_DIR = "dedup"
+SHARD_DIGITS = 3
+META = "meta.json"
+LOCK = "dedup.lock"
+POLICIES = ("keep", "skip", "merge")
+FORMAT = 2
+PENDING = "pending:"
+DEDUP_WINDOW = 10
+
+
+def policy(data: dict) -> str:
+    """
+    Returns app.dedup_policy, "keep" when not set.
+
+    :param data: The running configuration
+    :return: One of POLICIES
+    """
+    value = data["app"].get("dedup_policy", "keep")
+    if value not in POLICIES:
+        raise ValueError(f"DEDUP: dedup_policy {value!r}, expected one of {', '.join(POLICIES)}")
+    return value
+
+
+def window(data: dict) -> int:
+    """
+    Returns app.dedup_window, DEDUP_WINDOW when not set.
+
+    :param data: The running configuration
+    :return: How many of the newest versions an artifact can be a duplicate of
+    """
+    value = data["app"].get("dedup_window", DEDUP_WINDOW)
+    if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+        raise ValueError(f"DEDUP: dedup_window {value!r}, expected a number of versions, 0 or more")
+    return value
+
+
+def _tag(version: list) -> str:
+    return "v" + ".".join(map(str, version))
+
+
+def _newest(tags, n: int) -> list:
+    # the n newest version tags, newest first
+    return sorted(set(tags), key=lambda t: [int(p) for p in t[1:].split(".")], reverse=True)[:n]
+
+
+def normalize(message: str) -> str:
+    """
+    Returns the part of a message that makes it a duplicate.
+
+    Collect stores messages capitalized and with --r spelled out, so the
+    stored entry and the artifact it came from normalize the same.
+
+    :param message: An artifact message or a collected entry
+    :return: The normalized text
+    """
+    return " ".join(message.replace("--r", "new RELEASE version").split()).casefold()
+
+
+def content_hash(a_type: str, message: str) -> str:
+    """
+    Returns the hash an entry is indexed by.
+
+    :param a_type: The artifact type
+    :param message: The artifact message
+    :return: 20 hex digits
+    """
+    text = f"{a_type.upper()}\0{normalize(message)}"
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=10).hexdigest()
+
+
+def _alive(origin: str) -> bool:
+    # a pending artifact removed by hand is no longer a duplicate
+    path = origin[len(PENDING):]
+    if "#" not in path:
+        return os.path.exists(path)
+    # a spool, or the same spool rotated by a collect that's under way
+    live = Path(path.rsplit("#", 1)[0])
+    writer = live.name[: -len(spool.SPOOL_SUFFIX)]
+    return live.exists() or any(live.parent.glob(f"{writer}.*{spool.ROTATED_SUFFIX}"))
+
+
+class Index:
+    """
+    The hash index, loaded one shard at a time.
+    """
+
+    def __init__(self, data: dict, recent: list = ()):
+        self.data = data
+        self.folder = _dedup_dir(data)
+        # the versions within the window, older ones aren't duplicated
+        self.recent = list(recent)
+        self.shards = {}
+        self.dirty = set()
+
+    def _shard(self, digest: str) -> dict:
+        name = digest[:SHARD_DIGITS]
+        if name not in self.shards:
+            try:
+                self.shards[name] = json.loads((self.folder / f"{name}.json").read_text(encoding="utf-8"))
+            except FileNotFoundError:
+                self.shards[name] = {}
+        return self.shards[name]
+
+    def get(self, digest: str, verify: bool = True):
+        """
+        Returns where an entry already is.
+
+        :param digest: A content_hash()
+        :param verify: Check that a pending artifact is still there
+        :return: A version "v1.2.3" within the window, "futures",
+            "pending:<artifact>", or None
+        """
+        origin = self._shard(digest).get(digest)
+        if origin is None:
+            return None
+        if origin.startswith("v") and origin not in self.recent:
+            return None
+        if verify and origin.startswith(PENDING) and not _alive(origin):
+            return None
+        return origin
+
+    def stored(self, digest: str):
+        """
+        :param digest: A content_hash()
+        :return: What the index holds for it, whatever the window
+        """
+        return self._shard(digest).get(digest)
+
+    def put(self, digest: str, origin: str) -> None:
+        self._shard(digest)[digest] = origin
+        self.dirty.add(digest[:SHARD_DIGITS])
+
+    def drop(self, digest: str) -> None:
+        if self._shard(digest).pop(digest, None) is not None:
+            self.dirty.add(digest[:SHARD_DIGITS])
+
+    def _texts(self):
+        for name in sorted(self.dirty):
+            yield self.folder / f"{name}.json", json.dumps(self.shards[name], sort_keys=True)
+
+    def save(self) -> None:
+        """
+        Writes the changed shards now.
+
+        :return: None
+        """
+        self.folder.mkdir(parents=True, exist_ok=True)
+        for target, text in self._texts():
+            tmp = target.with_name(target.name + ".tmp")
+            tmp.write_text(text, encoding="utf-8")
+            os.replace(tmp, target)
+        self.dirty.clear()
+
+    def stage(self, txn: dict, versions: int, generation) -> None:
+        """
+        Queues the changed shards and the meta into a collect.
+
+        :param txn: The collect's journal transaction
+        :param versions: Collected versions the index covers once it commits
+        :param generation: The store generation, see store.load_manifest
+        :return: None
+        """
+        self.folder.mkdir(parents=True, exist_ok=True)
+        for target, text in self._texts():
+            stage(txn, target, text)
+        stage(txn, self.folder / META, json.dumps(_meta(versions, generation, self.recent, window(self.data))))
+        self.dirty.clear()
+
+
+def _dedup_dir(data: dict) -> Path:
+    # glog's DIR_STORE rule, without importing the store
+    if "DIR_STORE" in data["paths"]:
+        return Path(data["paths"]["DIR_STORE"]) / DEDUP_DIR
+    return Path(data["paths"]["DIR_OUTPUT"]) / "store" / DEDUP_DIR
+
+
+def _meta(versions: int, generation, recent: list, keep: int) -> dict:
+    return {"format": FORMAT, "versions": versions, "generation": generation, "recent": recent, "window": keep}
+
+
+def _covered(data: dict):
+    # the meta of a usable index, or None
+    try:
+        meta = json.loads((_dedup_dir(data) / META).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get("format") == FORMAT else None
+
+
+def rebuild(data: dict, manifest: dict) -> Index:
+    """
+    Indexes the whole history, the first time or when the store was
+    changed without the index (an import, an older glog).
+
+    :param data: The running configuration
+    :param manifest: The store manifest
+    :return: The new index
+    """
+    try:
+        import store
+    except ImportError:
+        from . import store
+
+    shards, recent = {}, []
+    keep = window(data)
+    with span("dedup_rebuild"):
+        # newest first, so the newest version holding an entry is the one kept
+        for record in store.iter_versions(data, manifest):
+            origin = _tag(record["version_number"])
+            if len(recent) < keep:
+                recent.append(origin)
+            for a_type, entries in record.get("logs", {}).items():
+                for entry in entries:
+                    digest = content_hash(a_type, entry)
+                    shards.setdefault(digest[:SHARD_DIGITS], {}).setdefault(digest, origin)
+        for future in records(manifest["doc_parts"].get("futures")):
+            if future["status"] == OPEN:
+                digest = content_hash("FUTURE UPDATES", future["text"])
+                shards.setdefault(digest[:SHARD_DIGITS], {})[digest] = "futures"
+
+    index = Index(data, recent)
+    index.shards, index.dirty = shards, set(shards)
+    # shards that no longer hold anything go too
+    index.folder.mkdir(parents=True, exist_ok=True)
+    for old in index.folder.glob("*.json"):
+        if old.name != META and old.stem not in index.shards:
+            old.unlink()
+    index.save()
+    meta = _meta(manifest["count"], manifest.get("generation"), recent, keep)
+    (index.folder / META).write_text(json.dumps(meta), encoding="utf-8")
+    log.info(f"DEDUP: indexed {manifest['count']} versions")
+    return index
+
+
+def open_index(data: dict, manifest: dict = None, build: bool = True):
+    """
+    Returns the index, building it when it's missing or behind the store.
+
+    :param data: The running configuration
+    :param manifest: The store manifest when the caller has it; without one
+        (the writers) an existing index is trusted as is and a missing one
+        is left for the next collect to build. A collect also rebuilds it
+        for a changed app.dedup_window
+    :param build: False for readers outside the collect lease, which get
+        None instead of a rebuilt index
+    :return: An Index, None for a writer or a reader when there is none yet
+    """
+    covered = _covered(data)
+    keep = window(data)
+    if covered is not None and (
+        manifest is None
+        or (
+            covered["versions"] == manifest["count"]
+            and covered.get("generation") == manifest.get("generation")
+            and covered["window"] == keep
+        )
+    ):
+        return Index(data, covered["recent"][:keep])
+    if manifest is None or not build:
+        return None
+    return rebuild(data, manifest)
+
+
+@contextlib.contextmanager
+def _locked(folder: Path):
+    folder.mkdir(parents=True, exist_ok=True)
+    fd = os.open(folder / LOCK, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
+
+
+def check_new(index: Index, artifacts: list) -> list:
+    """
+    Looks up artifacts about to be written, for the writers.
+
+    :param index: From open_index(), None when there is no index yet
+    :param artifacts: (type, message) pairs
+    :return: For each, where it already is ("v1.2.3", "futures",
+        "pending:<artifact>", or "this batch"), None when it's new
+    """
+    if index is None:
+        return [None] * len(artifacts)
+    seen = set()
+    found = []
+    for a_type, a_msg in artifacts:
+        digest = content_hash(a_type, a_msg)
+        found.append("this batch" if digest in seen else index.get(digest))
+        seen.add(digest)
+    return found
+
+
+def note_pending(index: Index, written: list) -> None:
+    """
+    Adds artifacts just written to the index, so a retry is caught before
+    the next collect.
+
+    :param index: The index check_new() used
+    :param written: (path, type, message), path as write_artifact returns it
+    :return: None
+    """
+    if index is None or not written:
+        return
+    with _locked(index.folder):
+        # read again under the lock, other writers may have noted theirs
+        index.shards.clear()
+        for path, a_type, a_msg in written:
+            index.put(content_hash(a_type, a_msg), PENDING + path)
+        index.save()
+
+
+class Collect:
+    """
+    Sorts one collect's artifacts into new entries and duplicates.
+    """
+
+    def __init__(self, data: dict, manifest: dict, build: bool = True):
+        self.policy = policy(data)
+        self.window = window(data)
+        # None when not built (build=False), only repeats within the batch are found
+        self.index = open_index(data, manifest, build)
+        self.versions = manifest["count"]
+        self.generation = manifest.get("generation")
+        self.batch = {}
+        self.repeated = 0
+        self.collected = 0
+
+    def check(self, a_type: str, a_msg: str) -> bool:
+        """
+        Sees one artifact, in collect order.
+
+        :param a_type: The artifact type
+        :param a_msg: The artifact message
+        :return: True when it's a duplicate the policy keeps out of the version
+        """
+        digest = content_hash(a_type, a_msg)
+        if digest in self.batch:
+            self.repeated += 1
+        else:
+            # pending means this very artifact, no need to look for it
+            origin = self.index.get(digest, verify=False) if self.index is not None else None
+            if origin is None or origin.startswith(PENDING):
+                self.batch[digest] = (a_type, True)
+                return False
+            self.batch[digest] = (a_type, self.policy == "keep")
+            self.collected += 1
+        return self.policy != "keep"
+
+    @property
+    def duplicates(self) -> int:
+        return self.repeated + self.collected
+
+    def report(self) -> None:
+        """
+        Logs the duplicates found, if any.
+
+        :return: None
+        """
+        if not self.duplicates:
+            return
+        action = {"skip": "skipped", "merge": "merged", "keep": "kept"}[self.policy]
+        log.info(
+            f"DEDUP: {self.duplicates} duplicate artifacts {action} "
+            f"({self.collected} already collected, {self.repeated} repeated in this collect)"
+        )
+
+    def stage(self, txn: dict, origin: str = None, futures: list = None) -> None:
+        """
+        Queues the index update into the collect's journal.
+
+        :param txn: The collect's journal transaction
+        :param origin: The version collected, e.g. "v1.2.3", None when there was none
+        :param futures: doc_parts["futures"] as this collect leaves them, None when unchanged
+        :return: None
+        """
+        for digest, (a_type, stored) in self.batch.items():
+            if a_type.upper() == "FUTURE UPDATES":
+                if stored:
+                    self.index.put(digest, "futures")
+            elif origin is not None and stored:
+                # the newest version holding it, where the window starts
+                self.index.put(digest, origin)
+
+        if futures is not None:
+            # a resolved future may be planned again
+            futures = records(futures)
+            open_ = {content_hash("FUTURE UPDATES", f["text"]) for f in futures if f["status"] == OPEN}
+            for future in futures:
+                digest = content_hash("FUTURE UPDATES", future["text"])
+                if digest not in open_ and self.index.stored(digest) == "futures":
+                    self.index.drop(digest)
+
+        if origin is not None:
+            self.index.recent = _newest(self.index.recent + [origin], self.window)
+        self.index.stage(txn, self.versions + (origin is not None), self.generation)
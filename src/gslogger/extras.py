@@ -1,6 +1,16 @@
 from pathlib import Path
+import copy
 import json
 import datetime
+import os
+
+try:
+    from instrument import log
+except ImportError:
+    from .instrument import log
+
+# parsed config files, keyed by path: (mtime_ns, size, data)
+_CONFIG_CACHE = {}
 
 
 def date(reporting=None) -> str:
@@ -18,6 +28,31 @@ def date(reporting=None) -> str:
 
 
 
+def contributor_names(record: dict) -> list:
+    """
+    Returns the contributors of a version record as a list.
+
+    collect_changelogs stores them comma-joined, older stores kept a list.
+
+    :param record: A version record from the log store
+    :return: A list of "name <email>" strings
+    """
+    contributors = record.get("contributors") or ""
+    if isinstance(contributors, str):
+        contributors = contributors.split(", ")
+    return [c.strip() for c in contributors if c.strip()]
+
+
+def dump_json(data) -> str:
+    """
+    Serializes data the way every glog json file is written.
+
+    :param data: The data to serialize
+    :return: The JSON text
+    """
+    return json.dumps(data, indent=4, sort_keys=True)
+
+
 def save_json(data, target) -> None:
     """
     Saves the configuration to a file named "glog.json".
@@ -28,9 +63,9 @@ def save_json(data, target) -> None:
     """
     try:
         with open(target, "w") as fs:
-            fs.write(json.dumps(data, indent=4, sort_keys=True))
+            fs.write(dump_json(data))
 
-        print(f"SAVE_JSON: {target} saved successfully.")
+        log.debug(f"SAVE_JSON: {target} saved successfully.")
 
     except Exception as e:
         raise Exception(f"SAVE_JSON: Error saving {target}: {e}")
@@ -46,9 +81,31 @@ def load_json(src) -> dict:
     try:
         with open(src, "r", encoding="utf-8") as fs:
             config_data = json.loads(fs.read())
-            print(f"LOAD_JSON: successfully loaded {src}")
+            log.debug(f"LOAD_JSON: successfully loaded {src}")
             return dict(config_data)
 
     except Exception as e:
         raise Exception(f"LOAD_JSON: Error loading {src}: {e}")
         # print(f"LOAD_JSON: Error loading {src}: {e}")
+
+
+def load_config(src) -> dict:
+    """
+    Loads a config file through a cache checked against its mtime and size.
+
+    version.py and start_up both ask for glog.json, it is only read and
+    parsed once per process unless it changes on disk. Each caller gets its
+    own copy, so changes to it don't leak into the cache.
+
+    :param src: The config file path
+    :return: The configuration data
+    """
+    key = os.path.abspath(src)
+    stat = os.stat(key)
+    cached = _CONFIG_CACHE.get(key)
+
+    if cached is None or cached[:2] != (stat.st_mtime_ns, stat.st_size):
+        cached = (stat.st_mtime_ns, stat.st_size, load_json(key))
+        _CONFIG_CACHE[key] = cached
+
+    return copy.deepcopy(cached[2])
@@ -0,0 +1,163 @@
+# glog --from-git: backfill changelog artifacts from git history.
+#
+# One `git log` process is streamed, oldest commit first, and each commit
+# message is mapped to a changelog type by its prefix ("fix: ...",
+# "feat(cli)!: ...", "ADDED: ..."). Only one read buffer of git output is
+# held at a time, so 100k+ commit histories are fine.
+#
+# Prefixes can be set in glog.json under app.git_prefixes, e.g.
+#   "git_prefixes": {"feat": "ADDED", "fix": "FIXED", "todo": "FUTURE UPDATES"}
+# Commits without a known prefix are skipped, unless app.git_default_type
+# names a type to file them under.
+
+import re
+import subprocess
+
+GIT_PREFIXES = {
+    "feat": "ADDED",
+    "feature": "ADDED",
+    "add": "ADDED",
+    "change": "CHANGED",
+    "refactor": "CHANGED",
+    "perf": "CHANGED",
+    "remove": "REMOVED",
+    "fix": "FIXED",
+    "bugfix": "FIXED",
+    "security": "SECURITY",
+    "todo": "FUTURE UPDATES",
+}
+
+# "type(scope)!: subject"
+PREFIX_RE = re.compile(r"^\s*([A-Za-z][\w ]*?)\s*(\([^)]*\))?\s*(!)?\s*:\s*(.+)$")
+
+FIELD = "\x1f"
+RECORD = "\x1e"
+LOG_FORMAT = f"%H{FIELD}%ad{FIELD}%an <%ae>{FIELD}%B{RECORD}"
+
+
+def iter_commits(rev_range: str, cwd=None, chunk_size: int = 1 << 16):
+    """
+    Streams commits from one `git log` process, oldest first.
+
+    :param rev_range: Anything `git log` accepts, e.g. "v0.1.0..HEAD"
+    :param cwd: The repository folder, defaults to the current one
+    :param chunk_size: Characters read from git per step
+    :return: A generator of (sha, "YYYY-MM-DD-HH-MM-SS", "name <email>", message)
+    """
+    cmd = [
+        "git",
+        "log",
+        "--reverse",
+        f"--format={LOG_FORMAT}",
+        "--date=format:%Y-%m-%d-%H-%M-%S",
+        rev_range,
+    ]
+    proc = subprocess.Popen(
+        cmd, cwd=cwd, stdout=subprocess.PIPE, text=True, encoding="utf-8", errors="replace"
+    )
+    finished = False
+    try:
+        pending = ""
+        while True:
+            chunk = proc.stdout.read(chunk_size)
+            if not chunk:
+                break
+            pending += chunk
+            *records, pending = pending.split(RECORD)
+            for record in records:
+                sha, stamp, author, message = record.lstrip("\n").split(FIELD, 3)
+                yield sha, stamp, author, message
+        finished = True
+    finally:
+        proc.stdout.close()
+        if not finished:
+            # the caller stopped early, don't wait on the rest of the history
+            proc.kill()
+        if proc.wait() != 0 and finished:
+            raise Exception(f"GIT: `{' '.join(cmd)}` exited with {proc.returncode}")
+
+
+def classify(data: dict, message: str):
+    """
+    Maps a commit message to a changelog artifact.
+
+    The subject line after the prefix becomes the artifact message. A "!"
+    after the prefix (a breaking change) adds --r, and --r / --f anywhere
+    in the commit body are carried over so collect versions it the same
+    way as a hand written artifact.
+
+    :param data: The running configuration
+    :param message: The full commit message
+    :return: (artifact type, artifact message) or None to skip the commit
+    """
+    prefixes = {k.lower(): v for k, v in data["app"].get("git_prefixes", GIT_PREFIXES).items()}
+    types = {t.lower(): t for t in data["CHTYPES"]}
+
+    subject, _, body = message.strip().partition("\n")
+    match = PREFIX_RE.match(subject)
+    a_type = None
+    if match:
+        key = match.group(1).lower()
+        a_type = prefixes.get(key) or types.get(key)
+
+    if a_type is None:
+        a_type = data["app"].get("git_default_type")
+        if a_type is None:
+            return None
+        text = subject.strip()
+    else:
+        text = match.group(4).strip()
+        if match.group(3):
+            text += " --r"
+
+    lowered = body.lower()
+    if "--r" in lowered and "--r" not in text.lower():
+        text += " --r"
+    elif "--f" in lowered and "--f" not in text.lower():
+        text += " --f"
+
+    # same rule as create_artifact
+    if len(text) < 10:
+        return None
+
+    return a_type, text
+
+
+def iter_artifacts(data: dict, rev_range: str, cwd=None):
+    """
+    Streams the commits of rev_range as artifact tuples, skipping unmapped ones.
+
+    :param data: The running configuration
+    :param rev_range: The git revision range
+    :param cwd: The repository folder
+    :return: A generator of (date, type, message, contributor)
+    """
+    for _, stamp, author, message in iter_commits(rev_range, cwd):
+        artifact = classify(data, message)
+        if artifact is not None:
+            yield stamp, artifact[0], artifact[1], author
+
+
+def batch_versions(artifacts, batch_size: int):
+    """
+    Splits an artifact stream into the groups that become collected versions.
+
+    A new group starts at every --r or --f artifact (the release or feature
+    it opens is its own version) and once a group holds batch_size artifacts.
+
+    :param artifacts: An iterable of artifact tuples
+    :param batch_size: The largest group, 0 for no limit
+    :return: A generator of lists of artifact tuples
+    """
+    batch = []
+    for artifact in artifacts:
+        lowered = artifact[2].lower()
+        if batch and ("--r" in lowered or "--f" in lowered):
+            yield batch
+            batch = []
+        batch.append(artifact)
+        if batch_size and len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
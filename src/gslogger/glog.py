@@ -2,13 +2,38 @@ import os
 # import pathlib
 from pathlib import Path
 import argparse
+import datetime
+import heapq
+import importlib
+import json
+import sys
+import time
 
 try:
-    from jin import build_report
-    from extras import load_json, save_json, date
+    from extras import load_json, load_config, save_json, dump_json, date
+    from instrument import log, span, timed
+    import instrument
+    import journal
 except:
-    from .jin import build_report
-    from .extras import load_json, save_json, date
+    from .extras import load_json, load_config, save_json, dump_json, date
+    from .instrument import log, span, timed
+    from . import instrument
+    from . import journal
+
+
+def _module(name: str):
+    """
+    Imports one of the gslogger modules the first time a command needs it.
+
+    glog runs from pre-commit hooks, so each command only pays for the
+    subsystems it touches (store, ingest, jin, query ...).
+
+    :param name: The module name, e.g. "store"
+    :return: The module
+    """
+    if __package__:
+        return importlib.import_module(f"{__package__}.{name}")
+    return importlib.import_module(name)
 
 
 def create_artifact(data: dict) -> None:
@@ -45,24 +70,272 @@ def create_artifact(data: dict) -> None:
     artifact_message = input(a_msg.strip())
 
     # Check commit message for minimum length
+    check_artifact(data, artifact_type, artifact_message)
+
+    write_artifact(data, artifact_type, artifact_message)
+
+
+def check_artifact(data: dict, artifact_type: str, artifact_message: str) -> str:
+    """
+    Applies the rules create_artifact enforces to an artifact from anywhere else.
+
+    :param data: The running configuration
+    :param artifact_type: A CHTYPES name, any case
+    :param artifact_message: The changelog message
+    :return: The type as spelled in data["CHTYPES"]
+    """
+    types = {t.upper(): t for t in data["CHTYPES"]}
+    a_type = types.get(str(artifact_type).strip().upper())
+    if a_type is None:
+        raise ValueError(f"Unknown log type {artifact_type!r}, expected one of {', '.join(data['CHTYPES'])}")
+
+    # artifact files are one field per line
+    if "\n" in artifact_message or "\r" in artifact_message:
+        raise ValueError("Entry must be a single line")
+
     if len(artifact_message) < 10:
         raise ValueError("Entry must be at least 10 characters long")
 
+    return a_type
+
+
+def write_artifact(
+    data: dict,
+    artifact_type: str,
+    artifact_message: str,
+    contributor: str = None,
+    stamp: str = None,
+    seq: str = None,
+) -> str:
+    """
+    Writes one changelog artifact without prompting.
+
+    The artifact is written to a hidden temp file first and then published
+    under its real name in one step, so a collect running at the same time
+    sees the whole artifact or nothing. An artifact that would land on an
+    existing name (same type, same second) gets a "-1", "-2" ... suffix
+    instead of overwriting it.
+
+    :param data: The running configuration
+    :param artifact_type: One of data["CHTYPES"]
+    :param artifact_message: The changelog message, may hold --r / --f
+    :param contributor: "name <email>", defaults to the configured developer
+    :param stamp: The artifact date "YYYY-MM-DD-HH-MM-SS", defaults to now
+    :param seq: A sort key put after the stamp, keeps artifacts written in one second in order
+    :return: The artifact file path, None when it duplicates an artifact and app.dedup_policy is "skip"
+    """
+    stamp = stamp or date()
+    contrib_line = contributor or f"{data['dev']['developer']} <{data['dev']['dev_email']}>"
+    return _write_artifacts(data, [(artifact_type, artifact_message, contrib_line, stamp)], [seq])[0]
+
+
+def _write_artifacts(data: dict, items: list, seqs: list) -> list:
+    # what write_artifact and add_artifacts share: duplicates are looked up
+    # first, and the dedup and --status indexes told what was written
+    dedup = _module("dedup")
+    spool = _module("spool")
+    status = _module("status")
+
+    policy = dedup.policy(data)
+    index = dedup.open_index(data)
+    found = dedup.check_new(index, [(a_type, a_msg) for a_type, a_msg, _, _ in items])
+    for (a_type, a_msg, _, _), origin in zip(items, found):
+        if origin is not None:
+            skipped = ", not written" if policy == "skip" else ""
+            log.warning(f"DEDUP: {a_type} {a_msg!r} duplicates {origin}{skipped}")
+    todo = [i for i, origin in enumerate(found) if origin is None or policy != "skip"]
+
+    before = status.begin(data)
+    paths = [None] * len(items)
+    if spool.enabled(data):
+        if todo:
+            # the whole batch is one append
+            appended = spool.append(data, [(items[i][3], items[i][0], items[i][1], items[i][2]) for i in todo])
+            for i, path in zip(todo, appended):
+                paths[i] = path
+    else:
+        for i in todo:
+            a_type, a_msg, a_dev, a_date = items[i]
+            paths[i] = _write_artifact(data, a_type, a_msg, a_dev, a_date, seqs[i])
+
+    new = [i for i in todo if found[i] is None]
+    dedup.note_pending(index, [(paths[i], items[i][0], items[i][1]) for i in new])
+    if len(new) < len(todo):
+        # collect drops or merges written duplicates, --status has to rescan
+        status.invalidate(data)
+    else:
+        # keeps `glog --status` current
+        status.record(data, before, [(paths[i], items[i][3], items[i][0], items[i][1], items[i][2]) for i in todo])
+    return paths
+
+
+def _write_artifact(data: dict, artifact_type: str, artifact_message: str, contrib_line: str, stamp: str, seq) -> str:
     # Create the changelog file name
-    artifact_file = f"{data['paths']['DIR_OUTPUT']}/{date()}-{artifact_type}{data["app"]["atf_pattern"]}"
-    contrib_line = f"{data["dev"]['developer']} <{data["dev"]['dev_email']}>"
+    artifact_base = f"{data['paths']['DIR_OUTPUT']}/{stamp}-{artifact_type}"
+    if seq is not None:
+        artifact_base = f"{data['paths']['DIR_OUTPUT']}/{stamp}-{seq}-{artifact_type}"
+    artifact_file = f"{artifact_base}{data['app']['atf_pattern']}"
+
     # Create the changelog file
+    tmp = None
     try:
-        with open(artifact_file, "w") as f:
-            f.write(date() + "\n")
+        tmp, fd = _temp_artifact(data["paths"]["DIR_OUTPUT"])
+        with open(fd, "w") as f:
+            f.write(stamp + "\n")
             f.write(artifact_type + "\n")
             f.write(artifact_message + "\n")
             f.write(contrib_line + "\n")
 
-        print(f"Changelog Artifact created: {artifact_file}")
+        n = 0
+        while True:
+            try:
+                _publish(tmp, artifact_file)
+                break
+            except FileExistsError:
+                n += 1
+                artifact_file = f"{artifact_base}-{n}{data['app']['atf_pattern']}"
+
+        log.info(f"Changelog Artifact created: {artifact_file}")
 
     except Exception as e:
-        print(f"Error creating Artifact: [{artifact_file}]\n{e}")
+        log.error(f"Error creating Artifact: [{artifact_file}]\n{e}")
+
+    finally:
+        if tmp is not None and os.path.exists(tmp):
+            os.unlink(tmp)
+
+    return artifact_file
+
+
+def _temp_artifact(folder: str) -> tuple:
+    # hidden and without atf_pattern, so scan_artifacts never lists it
+    n = 0
+    while True:
+        tmp = os.path.join(folder, f".{os.getpid()}-{time.time_ns()}-{n}.part")
+        try:
+            return tmp, os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        except FileExistsError:
+            n += 1
+
+
+def _publish(tmp: str, target: str) -> None:
+    """
+    Gives a finished temp file its artifact name, never replacing a file.
+
+    :param tmp: The temp file, still there afterwards when linked
+    :param target: The artifact file name
+    :return: None, raises FileExistsError when target is taken
+    """
+    try:
+        # atomic, and fails instead of overwriting
+        os.link(tmp, target)
+    except FileExistsError:
+        raise
+    except (AttributeError, OSError):
+        # no hard links here (FAT, some network shares): windows rename
+        # refuses to overwrite as well, elsewhere check first
+        if os.name != "nt" and os.path.exists(target):
+            raise FileExistsError(target)
+        os.rename(tmp, target)
+
+
+def add_artifacts(data: dict, entries) -> list:
+    """
+    Writes many artifacts in one go, for release tooling and `glog add`.
+
+    Every entry is checked before anything is written, so a bad entry
+    leaves no half written batch behind. Entries keep their order through
+    the next collect, --r / --f in a message version it as usual.
+
+        add_artifacts(start_up(Path.cwd()), [
+            {"type": "ADDED", "message": "bulk artifact creation --f"},
+            ("FIXED", "empty stores no longer crash -g"),
+        ])
+
+    :param data: The running configuration
+    :param entries: dicts with "type", "message" and optional "contributor"
+        and "date" keys, or (type, message) tuples
+    :return: The artifact file paths (spool ids with the spool format), in entry order,
+        None for duplicates app.dedup_policy "skip" left out
+    """
+    checked = []
+    for n, entry in enumerate(entries, start=1):
+        try:
+            checked.append(check_entry(data, entry))
+        except ValueError as e:
+            raise ValueError(f"ADD: entry {n}: {e}") from None
+
+    # one clock reading for the stamp and the microseconds into that second,
+    # then position: a later batch sorts after an earlier one
+    now = time.time_ns()
+    stamp = time.strftime("%Y-%m-%d-%H-%M-%S", time.localtime(now // 1_000_000_000))
+    usec = now // 1000 % 1_000_000
+    developer = f"{data['dev']['developer']} <{data['dev']['dev_email']}>"
+    checked = [(a_type, a_msg, a_dev or developer, a_date or stamp) for a_type, a_msg, a_dev, a_date in checked]
+    with span("add", items=len(checked)):
+        files = _write_artifacts(data, checked, [f"{usec:06d}{i:09d}" for i in range(len(checked))])
+
+    if not _module("spool").enabled(data):
+        log.info(f"ADD: {sum(f is not None for f in files)} artifacts created.")
+    return files
+
+
+def check_entry(data: dict, entry) -> tuple:
+    """
+    Checks one entry for add_artifacts, as it came from --bulk JSON or code.
+
+    :param data: The running configuration
+    :param entry: A dict with "type", "message" and optional "contributor"
+        and "date" strings, or a (type, message) pair
+    :return: (type as spelled in CHTYPES, message, contributor or None, date or None)
+    """
+    if isinstance(entry, (list, tuple)) and len(entry) == 2:
+        entry = dict(zip(("type", "message"), entry))
+    if not isinstance(entry, dict):
+        raise ValueError(f'Expected an object with "type" and "message", got {entry!r}')
+    for key in ("type", "message"):
+        if not isinstance(entry.get(key), str):
+            raise ValueError(f'"{key}" must be a string, got {entry.get(key)!r}')
+    for key in ("contributor", "date"):
+        if entry.get(key) is not None and not isinstance(entry[key], str):
+            raise ValueError(f'"{key}" must be a string, got {entry[key]!r}')
+    # one line of the artifact file each, and the date names the file too
+    if entry.get("contributor") is not None and ("\n" in entry["contributor"] or "\r" in entry["contributor"]):
+        raise ValueError("Contributor must be a single line")
+    if entry.get("date") is not None:
+        try:
+            datetime.datetime.strptime(entry["date"], "%Y-%m-%d-%H-%M-%S")
+        except ValueError:
+            raise ValueError(f'"date" must be YYYY-MM-DD-HH-MM-SS, got {entry["date"]!r}') from None
+
+    a_type = check_artifact(data, entry["type"], entry["message"])
+    return a_type, entry["message"], entry.get("contributor"), entry.get("date")
+
+
+def read_bulk(src) -> list:
+    """
+    Reads artifact entries for add_artifacts from a JSON Lines file.
+
+    One object per line, e.g. {"type": "FIXED", "message": "..."}, blank
+    lines are skipped.
+
+    :param src: The file path, or "-" for stdin
+    :return: A list of entry dicts
+    """
+    fs = sys.stdin if src == "-" else open(src, "r", encoding="utf-8")
+    entries = []
+    try:
+        for n, line in enumerate(fs, start=1):
+            if not line.strip():
+                continue
+            try:
+                entries.append(json.loads(line))
+            except ValueError as e:
+                raise ValueError(f"ADD: {src} line {n}: {e}") from None
+    finally:
+        if fs is not sys.stdin:
+            fs.close()
+    return entries
 
 
 def semantic_versioning(build, version, content):
@@ -85,114 +358,225 @@ def semantic_versioning(build, version, content):
     return build, version
 
 
-def collect_changelogs(data):
+def collect_changelogs(data) -> bool:
+    """
+    Collects every waiting artifact (files and spools) into one new version.
 
-    # Get the current build and version numbers
-    build_number: int = data["app"]["build_number"]  # int
-    version_number: list = data["app"]["version_number"]  # [0, 0, 0]
+    Runs under the collect lease: one collect at a time per DIR_OUTPUT, and
+    only artifacts published before the scan are read and removed.
+    Artifacts written meanwhile wait for the next collect.
+
+    :param data: The running configuration
+    :return: True when a version was stored, False when nothing was waiting
+    """
+    try:
+        with journal.collect_lease(data):
+            # another collect may have finished while we waited, build on its config
+            if os.path.exists(data["paths"].get("FILE_CONFIG", "")):
+                data.update(load_config(data["paths"]["FILE_CONFIG"]))
+            return _collect_changelogs(data)
+    except TimeoutError as e:
+        log.error(str(e))
+        return False
+
+
+def _collect_changelogs(data) -> bool:
+    ingest = _module("ingest")
+    spool = _module("spool")
+
+    started = time.perf_counter()
+    workers = data["app"].get("ingest_workers")
+
+    # Get the list of changelog files, sorted by date
+    with span("scan"):
+        changelog_files = ingest.scan_artifacts(
+            data["paths"]["DIR_OUTPUT"], data["app"]["atf_pattern"]
+        )
+        # spools are read whatever the artifact_format, so switching loses nothing
+        spooled = spool.rotate(data)
+
+    if len(changelog_files) == 0 and len(spooled) == 0:
+        log.info("No changelog files found. Exiting without changes.")
+        return False
 
-    # Get the list of changelog files
-    changelog_files = [
-        f
-        for f in os.listdir(data["paths"]["DIR_OUTPUT"])
-        if f.endswith(data["app"]["atf_pattern"])
-    ]
+    with span("parse"):
+        records = spool.read_records(data, spooled)
 
-    if len(changelog_files) == 0:
-        print("No changelog files found. Exiting without changes.")
-        exit(0)
+    # files are read concurrently but come back in sorted order
+    artifacts = ingest.read_artifacts(
+        data["paths"]["DIR_OUTPUT"], changelog_files, workers
+    )
+    if records:
+        artifacts = heapq.merge(artifacts, records, key=lambda a: a[0])
+
+    if collect_artifacts(data, artifacts, archived=changelog_files, spooled=spooled):
+        ingest.report_throughput(len(changelog_files) + len(records), started)
+        return True
+    return False
+
+
+def collect_artifacts(
+    data: dict, artifacts, archived: list = None, release_date: str = None, spooled: list = None
+) -> bool:
+    """
+    Collects a stream of artifacts into one new version in the log store.
+
+    :param data: The running configuration
+    :param artifacts: (date, type, message, contributor) tuples, oldest first
+    :param archived: Artifact file names in DIR_OUTPUT to remove with the collect
+    :param spooled: Rotated spool file names to remove with the collect
+    :param release_date: The version date "YYYY-MM-DD", defaults to today
+    :return: True when the version was stored
+    """
+    store = _module("store")
+    manifest = store.load_manifest(data)
+    duplicates = _module("dedup").Collect(data, manifest)
+    todo = _module("todo")
 
-    # Sort the changelog files by date
-    changelog_files.sort()
+    # Get the current build and version numbers
+    build_number: int = data["app"]["build_number"]  # int
+    version_number: list = data["app"]["version_number"]  # [0, 0, 0]
 
     # # Create the new changelog content
     context = {}
     changes = {x.upper(): [] for x in data["CHTYPES"][1:]}
     future_changes = []
+    resolved = []
     contributors = set()
 
-    # Iterate over the sorted changelog files
-    for file in changelog_files:
-        # Read the file content
-        with open(Path(data["paths"]["DIR_OUTPUT"]) / file, "r") as f:
-            _, a_type, a_msg, a_dev = f.read().splitlines()
+    # "version" includes the "parse" time spent reading lazily from artifacts
+    with span("version"):
+        for _, a_type, a_msg, a_dev in timed("parse", artifacts):
+            if duplicates.check(a_type, a_msg):
+                # no entry and no version bump, "merge" still credits the contributor
+                if duplicates.policy == "merge":
+                    contributors.add(a_dev.strip())
+                continue
 
-        build_number, version_number = semantic_versioning(
-            build_number, version_number, a_msg
-        )
+            build_number, version_number = semantic_versioning(
+                build_number, version_number, a_msg
+            )
 
-        replaced_content = a_msg.replace("--f", "new FEATURE version")
-        replaced_content = a_msg.replace("--r", "new RELEASE version")
+            replaced_content = a_msg.replace("--f", "new FEATURE version")
+            replaced_content = a_msg.replace("--r", "new RELEASE version")
 
-        if a_type == "FUTURE UPDATES":
-            future_changes.append(replaced_content.strip().capitalize())
-        else:
-            changes[a_type.upper()].append(replaced_content.strip().capitalize())
+            if a_type == "FUTURE UPDATES":
+                future_changes.append(replaced_content.strip().capitalize())
+            else:
+                changes[a_type.upper()].append(replaced_content.strip().capitalize())
 
-        contributors.add(a_dev.strip())  # add this dev to the set of contributors
+            contributors.add(a_dev.strip())  # add this dev to the set of contributors
+            resolved.extend(todo.done_ids(a_msg))  # futures this closes, "--done 12"
+
+    duplicates.report()
+    if duplicates.duplicates and not (future_changes or any(changes.values())):
+        # nothing new, the duplicates still go
+        log.info("DEDUP: every artifact was a duplicate, no new version.")
+        txn = journal.begin()
+        duplicates.stage(txn)
+        _remove_collected(data, txn, archived, spooled)
+        journal.commit(data, txn)
+        return False
 
     # updatate the changelog config
     data["app"]["build_number"] = build_number
     data["app"]["version_number"] = version_number
 
-    # refresh_config data
-    save_json(data, data["paths"]["FILE_CONFIG"])
+    # config, store and artifact removal all land together, or not at all
+    txn = journal.begin()
 
     # gather the header and metadata for the changelog
     try:
         context = {
-            "version_number": version_number,
-            "date": date(reporting=True),
+            "version_number": list(version_number),
+            "date": release_date or date(reporting=True),
             "build_number": build_number,
             "contributors": ", ".join(sorted(contributors)),
             "logs": {x: y for x, y in changes.items() if y},
         }
 
-        # with open(data["paths"]["FILE_LOG"], "r", encoding="utf-8") as fs:
-        #     log_store = dict(json.loads(fs.read()))
-        log_store = load_json(data["paths"]["FILE_LOG"])
-
-        # collect future updates and store in log store
-        if len(future_changes) > 0:
-            f_count = data["app"]["f_count"] + 1
-            future_changes = [
-                f"{f} - {x}" for f, x in enumerate(future_changes, start=f_count)
-            ]
-            data["app"]["f_count"] = f_count + len(future_changes)
-
-            # refresh_config data
-            save_json(data, data["paths"]["FILE_CONFIG"])
-
-            if (
-                "futures" not in log_store["doc_parts"]
-                or log_store["doc_parts"]["futures"] is None
-            ):
-                log_store["doc_parts"]["futures"] = sorted(future_changes)
-            else:
-                future_changes.extend(log_store["doc_parts"]["futures"])
-                log_store["doc_parts"]["futures"] = sorted(future_changes)
+        version_tag = "v" + ".".join(map(str, version_number))
+        futures = None
 
-        old_logs = log_store["details"]
-        old_logs.append(context)
+        # new futures get the next ids, and the ones resolved are marked so
+        if future_changes or resolved:
+            futures, data["app"]["f_count"], unknown = todo.collect(
+                manifest["doc_parts"].get("futures"),
+                future_changes,
+                resolved,
+                version_tag,
+                data["app"].get("f_count", 0),
+            )
+            for n in unknown:
+                log.warning(f"TODO: --done {n}, there is no future {n}")
 
-        sorted_logs = sorted(old_logs, key=lambda x: x["version_number"], reverse=True)
+        with span("store_write"):
+            # append only, the store keeps newest-first order without a re-sort
+            store.append_version(data, context, futures, txn)
 
-        log_store["details"] = sorted_logs
+            # refresh_config data, once
+            journal.stage(txn, data["paths"]["FILE_CONFIG"], dump_json(data))
 
-        # with open(data["paths"]["FILE_LOG"], "w", encoding="utf-8") as fs:
-        #     json.dump(log_store, fs, indent=4)
-        save_json(log_store, data["paths"]["FILE_LOG"])
+            # the dedup index, the stats view and the search index land with
+            # the version they now cover
+            duplicates.stage(txn, version_tag, futures)
+            _module("stats").stage(data, txn, manifest, context)
+            _module("search").stage(data, txn, manifest, context)
 
-        print(f"{data['paths']['FILE_LOG']} successfully updated.")
+            # remove old changelogs
+            _remove_collected(data, txn, archived, spooled)
 
-        # remove old changelogs
-        for file in changelog_files:
-            # TODO: replace os.path with pathlib
-            os.remove(Path(data["paths"]["DIR_OUTPUT"]) / file)
-            print(f"Archived artifact {file} successfully removed.")
+            journal.commit(data, txn)
+        return True
 
     except Exception as e:
-        print(f"Error updating {data['paths']['FILE_LOG']}:", e)
+        log.error(f"Error updating {data['paths']['FILE_LOG']}: {e}")
+        return False
+
+
+def _remove_collected(data: dict, txn: dict, archived: list, spooled: list) -> None:
+    if archived:
+        journal.remove(txn, data["paths"]["DIR_OUTPUT"], archived)
+    if spooled:
+        journal.remove(txn, _module("spool").spool_dir(data), spooled, "INGEST: {} collected spools removed.")
+
+
+def backfill_from_git(data: dict, rev_range: str, collect: bool = False) -> int:
+    """
+    Turns the commits of a git revision range into changelog entries.
+
+    By default every mapped commit is written as an artifact, ready for the
+    next collect. With collect=True they go straight into the log store
+    instead, split into versions at every --r / --f commit and at most
+    app.git_batch (default 1000) commits per version.
+
+    :param data: The running configuration
+    :param rev_range: The git revision range, e.g. "v0.1.0..HEAD"
+    :param collect: Store collected versions instead of writing artifacts
+    :return: The number of commits used
+    """
+    gitlog = _module("gitlog")
+    started = time.perf_counter()
+    artifacts = gitlog.iter_artifacts(data, rev_range, data["paths"].get("CWD"))
+    count = 0
+
+    if collect:
+        batch_size = data["app"].get("git_batch", 1000)
+        with journal.collect_lease(data):
+            for batch in gitlog.batch_versions(artifacts, batch_size):
+                # the version is dated by its newest commit
+                if not collect_artifacts(data, batch, release_date=batch[-1][0][:10]):
+                    break
+                count += len(batch)
+    else:
+        for stamp, a_type, a_msg, a_dev in artifacts:
+            # commits of one second are collected in commit order, not by type
+            write_artifact(data, a_type, a_msg, a_dev, stamp, seq=f"{count:09d}")
+            count += 1
+
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    log.info(f"GIT: {count} commits from {rev_range} in {elapsed:.3f}s ({count / elapsed:.0f} commits/sec)")
+    return count
 
 
 def build_initial(config: dict) -> dict:
@@ -297,10 +681,10 @@ def build_initial(config: dict) -> dict:
 def start_up(working_dir):
     # load the running configuration
     try:
-        data = load_json(working_dir / "glog.json")
+        data = load_config(working_dir / "glog.json")
 
     except Exception as e:
-        print(f"Error loading glog.json: {e}")
+        log.error(f"Error loading glog.json: {e}")
         data = build_initial(
             {
                 "paths": {
@@ -312,14 +696,42 @@ def start_up(working_dir):
         # refresh or backup the config
         save_json(data, data["paths"]["FILE_CONFIG"])
 
+    # finish or undo a collect that was interrupted last time
+    if journal.recover(data):
+        data = load_config(data["paths"]["FILE_CONFIG"])
+
     return data
 
 
-def main():
-    data = start_up(Path.cwd())
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Changelog generator")
+    parser.add_argument(
+        "command",
+        nargs="?",
+        choices=["add", "serve", "stop"],
+        help="add: create artifacts without prompting, from -m or --bulk. "
+        "serve: run the glog daemon on a socket in the output folder. stop: stop it.",
+    )
 
+    parser.add_argument(
+        "--no-daemon",
+        action="store_true",
+        help="Work on the files directly even when a glog daemon is running.",
+    )
+
+    parser.add_argument(
+        "-m",
+        "--message",
+        action="append",
+        help="add: an artifact message, may be repeated. Needs one --type.",
+    )
+
+    parser.add_argument(
+        "--bulk",
+        metavar="FILE",
+        help="add: read artifacts from a JSON Lines file, or - for stdin.",
+    )
 
-    parser = argparse.ArgumentParser(description="Changelog generator")
     parser.add_argument(
         "-c",
         "--collect",
@@ -327,11 +739,48 @@ def main():
         help="Collect existing changelogs and update the main changelog file.",
     )
 
+    parser.add_argument(
+        "-w",
+        "--watch",
+        action="store_true",
+        help="Keep running: collect and generate whenever new artifacts arrive in the output folder.",
+    )
+
+    parser.add_argument(
+        "--status",
+        "--dry-run",
+        dest="status",
+        action="store_true",
+        help="Show what the next collect would do: pending artifacts by type, contributors, next version and build.",
+    )
+
+    parser.add_argument(
+        "--all",
+        nargs="?",
+        const=".",
+        metavar="ROOT",
+        help="Collect and generate every project (every glog.json) under ROOT, default the current folder, "
+        "in parallel. With -c or -g only that step.",
+    )
+
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        help="--all: how many projects to run at once, default the CPU count.",
+    )
+
     parser.add_argument(
         "-t",
         "--todo",
         action="store_true",
-        help="Create a TODO list from existing FUTURES changelog artifacts.",
+        help='List the open futures (FUTURE UPDATES). "--done N" in an artifact message resolves future N.',
+    )
+
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="Release metrics: entries per type, contributors and release cadence.",
     )
 
     parser.add_argument(
@@ -341,20 +790,305 @@ def main():
         help="Generate Changelog file from collected data.",
     )
 
+    parser.add_argument(
+        "--export-store",
+        metavar="FILE",
+        help="Write the log store out in the log_store.json layout.",
+    )
+
+    parser.add_argument(
+        "--import-store",
+        metavar="FILE",
+        help="Replace the log store with the contents of a log_store.json layout file.",
+    )
+
+    parser.add_argument(
+        "--compact",
+        nargs="?",
+        const="",
+        metavar="CUTOFF",
+        help="Move versions older than CUTOFF (e.g. v0.2.40) into compressed archive segments. "
+        "Without CUTOFF, all but the newest app.compact_keep (default 1024) versions.",
+    )
+
+    parser.add_argument(
+        "--from-git",
+        metavar="REV_RANGE",
+        help="Create artifacts from the commits in a git revision range, e.g. v0.1.0..HEAD. "
+        "Combine with -c to store them as collected versions directly.",
+    )
+
+    parser.add_argument(
+        "-q",
+        "--query",
+        action="store_true",
+        help="List collected versions matching the filters below.",
+    )
+
+    parser.add_argument(
+        "--search",
+        metavar="TEXT",
+        help='Find the collected entries holding every word of TEXT, as word prefixes, e.g. "frob crash". '
+        "Takes the --versions and --type filters.",
+    )
+
+    parser.add_argument(
+        "--versions",
+        metavar="LOW..HIGH",
+        help="Query (and --search) filter: version range, e.g. v0.2.40..v0.2.72 (either end optional).",
+    )
+
+    parser.add_argument(
+        "--type",
+        action="append",
+        metavar="TYPE",
+        help="Query (and --search) filter: artifact type from CHTYPES, may be repeated. "
+        "For add, the type of the -m messages.",
+    )
+
+    parser.add_argument(
+        "--dates",
+        metavar="FROM..TO",
+        help="Query filter: date range, e.g. 2024-09-01..2024-09-30.",
+    )
+
+    parser.add_argument(
+        "--contributor",
+        help="Query filter: part of a contributor's name or email.",
+    )
+
+    parser.add_argument(
+        "--format",
+        choices=["md", "json"],
+        default="md",
+        help="Query (and --all summary, --search, --status, --todo, --stats) output format.",
+    )
+
+    parser.add_argument(
+        "--log-level",
+        choices=instrument.LEVELS,
+        default="info",
+        help="How much glog reports while it works, debug shows every file and version.",
+    )
+
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="-",
+        metavar="FILE",
+        help="Write a JSON report of the time spent in each phase to FILE (stderr if left out).",
+    )
+
+    parser.add_argument(
+        "--cprofile",
+        metavar="FILE",
+        help="Run under cProfile and dump the stats to FILE, for `python -m pstats FILE`.",
+    )
+
+    return parser
+
+
+def main():
+    # flags first: a bad flag or --help never touches the config or the store
+    parser = build_parser()
     args = parser.parse_args()
+    instrument.setup_logging(args.log_level)
+
+    if args.command == "add":
+        if not (args.message or args.bulk):
+            parser.error("add needs -m MESSAGE or --bulk FILE")
+        if args.message and len(args.type or []) != 1:
+            parser.error("add -m needs exactly one --type")
+
+    with instrument.cprofile(args.cprofile):
+        try:
+            run(args)
+        finally:
+            if args.profile:
+                instrument.write_profile(args.profile)
+
+
+def _add_entries(args: argparse.Namespace) -> list:
+    entries = [{"type": args.type[0], "message": m} for m in args.message or []]
+    if args.bulk:
+        entries.extend(read_bulk(args.bulk))
+    return entries
 
 
-    if args.collect:
+def _via_daemon(args: argparse.Namespace, entries: list = None) -> bool:
+    """
+    Hands add, -c or -g to a running glog daemon.
+
+    :param args: The parsed command line
+    :param entries: For add, the entries from _add_entries()
+    :return: True when the daemon did the work, False to do it directly
+    """
+    try:
+        data = load_config(Path.cwd() / "glog.json")
+    except Exception:
+        return False
+
+    if args.command == "add":
+        message = {"cmd": "add", "entries": entries}
+    elif args.collect:
+        message = {"cmd": "collect"}
+    else:
+        message = {"cmd": "generate"}
+
+    with span("daemon"):
+        reply = _module("client").request(data, message)
+    if reply is None:
+        return False
+    if not reply["ok"]:
+        log.error(reply["error"])
+        exit(1)
+    log.info(reply["message"])
+    return True
+
+
+def run(args: argparse.Namespace) -> None:
+    # the daemon, when one is running, owns the files: don't even recover
+    if args.command == "stop":
+        reply = _module("client").request(load_config(Path.cwd() / "glog.json"), {"cmd": "stop"})
+        log.info(reply["message"] if reply else "DAEMON: not running")
+        return
+
+    # a monorepo root needn't be a project itself
+    if args.all is not None:
+        jin = _module("jin")
+        both = not (args.collect or args.generate)
+        ok = _module("monorepo").run_all(
+            args.all,
+            collect_changelogs if both or args.collect else None,
+            jin.write_report if both or args.generate else None,
+            args.jobs,
+            args.format,
+        )
+        if not ok:
+            exit(1)
+        return
+
+    direct_only = (
+        args.from_git
+        or args.query
+        or args.search
+        or args.export_store
+        or args.import_store
+        or args.compact is not None
+        or args.watch
+        or args.status
+        or args.todo
+        or args.stats
+    )
+    entries = None
+    if args.command == "add":
+        # read once, a --bulk - on stdin can't be read again when no daemon answers
+        try:
+            entries = _add_entries(args)
+        except (OSError, ValueError) as e:
+            log.error(str(e))
+            exit(1)
+
+    wants_daemon = args.command == "add" or (not direct_only and (args.collect or args.generate))
+    if wants_daemon and not args.no_daemon and _via_daemon(args, entries):
+        return
+
+    with span("start_up"):
+        data = start_up(Path.cwd())
+
+    if args.command == "serve":
+        jin = _module("jin")
+        _module("daemon").serve(data, check_entry, add_artifacts, collect_changelogs, jin.write_report)
+
+    elif args.command == "add":
+        try:
+            add_artifacts(data, entries)
+        except (OSError, ValueError) as e:
+            log.error(str(e))
+            exit(1)
+
+    elif args.from_git:
+        backfill_from_git(data, args.from_git, collect=args.collect)
+
+    elif args.query:
+        query = _module("query")
+        try:
+            records = query.run_query(
+                data,
+                versions=args.versions,
+                types=args.type,
+                dates=args.dates,
+                contributor=args.contributor,
+            )
+        except ValueError as e:
+            log.error(str(e))
+            exit(1)
+        print(query.format_results(records, args.format))
+
+    elif args.search:
+        query = _module("query")
+        search = _module("search")
+        try:
+            version_range = (None, None)
+            if args.versions:
+                version_range = tuple(query.parse_version(v) if v else None for v in query.parse_range(args.versions))
+            types = [t.upper() for t in args.type] if args.type else None
+            results = search.search(data, args.search, version_range, types)
+        except ValueError as e:
+            log.error(str(e))
+            exit(1)
+        print(search.format_results(results, args.search, args.format))
+
+    elif args.export_store:
+        _module("store").export_json(data, args.export_store)
+
+    elif args.import_store:
+        try:
+            # replaces the store, so not while a collect is appending to it
+            with journal.collect_lease(data):
+                _module("store").import_json(data, args.import_store)
+        except TimeoutError as e:
+            log.error(str(e))
+            exit(1)
+
+    elif args.compact is not None:
+        try:
+            cutoff = _module("query").parse_version(args.compact) if args.compact else None
+            # rewrites the manifest, so not while a collect is appending to it
+            with journal.collect_lease(data):
+                _module("store").compact(data, cutoff)
+        except (TimeoutError, ValueError) as e:
+            log.error(str(e))
+            exit(1)
+
+    elif args.todo:
+        todo = _module("todo")
+        items = todo.Todo(_module("store").open_futures(data)).open_items()
+        print(todo.format_todo(items, args.format))
+
+    elif args.stats:
+        stats = _module("stats")
+        print(stats.format_stats(stats.stats(data), args.format, data["CHTYPES"]))
+
+    elif args.status:
+        status = _module("status")
+        print(status.format_status(status.status(data), args.format))
+
+    elif args.watch:
+        jin = _module("jin")
+        _module("watch").watch(data, collect_changelogs, jin.write_report)
+
+    elif args.collect:
         collect_changelogs(data)
 
     elif args.generate:
         try:
-            target = Path(data["paths"]["CWD"])
-            # target.unlink()
-            (target / "changelog.md").write_text(build_report(data), encoding="utf-8")
-            print(f"Changelog generated: {target / 'changelog.md'}")
+            jin = _module("jin")
+            if jin.write_report(data):
+                targets = ", ".join(str(t) for t in jin.output_targets(data).values())
+                log.info(f"Changelog generated: {targets}")
         except Exception as e:
-            print(f"Error generating changelog: {e}")
+            log.error(f"Error generating changelog: {e}")
     else:
         create_artifact(data)
 
@@ -0,0 +1,127 @@
+# artifact ingestion for collect_changelogs.
+#
+# CI can drop tens of thousands of artifacts between releases, so they are
+# listed with a single os.scandir pass, read and parsed on a bounded thread
+# pool (results come back in name order, which semantic_versioning relies
+# on) and removed in batches once the collect has been stored.
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+try:
+    from instrument import log
+except ImportError:
+    from .instrument import log
+
+
+def default_workers() -> int:
+    """
+    Returns the thread pool size used when app.ingest_workers is not set.
+
+    :return: The number of reader threads
+    """
+    return min(32, (os.cpu_count() or 1) + 4)
+
+
+def scan_artifacts(folder, pattern: str) -> list:
+    """
+    Lists the artifact files in folder, sorted by name (and so by date).
+
+    :param folder: The artifact folder, usually paths.DIR_OUTPUT
+    :param pattern: The artifact file extension, usually app.atf_pattern
+    :return: A sorted list of file names
+    """
+    with os.scandir(folder) as entries:
+        names = [
+            e.name for e in entries if e.name.endswith(pattern) and e.is_file()
+        ]
+    names.sort()
+    return names
+
+
+def parse_artifact(path) -> tuple:
+    """
+    Reads one artifact file.
+
+    :param path: The artifact file
+    :return: (date, artifact type, message, contributor)
+    """
+    with open(path, "r") as f:
+        a_date, a_type, a_msg, a_dev = f.read().splitlines()
+    return a_date, a_type, a_msg, a_dev
+
+
+def read_artifacts(folder, names: list, workers: int = None):
+    """
+    Reads and parses artifacts concurrently, yielding them in the given order.
+
+    Files are handed to the pool a chunk at a time so memory stays bounded
+    no matter how many artifacts are waiting.
+
+    :param folder: The artifact folder
+    :param names: File names as returned by scan_artifacts
+    :param workers: Thread pool size, defaults to default_workers()
+    :return: A generator of parse_artifact tuples
+    """
+    workers = workers or default_workers()
+    chunk = workers * 64
+    folder = Path(folder)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for start in range(0, len(names), chunk):
+            paths = [folder / n for n in names[start : start + chunk]]
+            yield from pool.map(parse_artifact, paths)
+
+
+def _unlink_batch(folder: str, names: list) -> int:
+    removed = 0
+    fd = None
+    if os.unlink in os.supports_dir_fd:
+        # resolve the folder once per batch instead of once per file
+        fd = os.open(folder, os.O_RDONLY)
+    try:
+        for name in names:
+            try:
+                if fd is not None:
+                    os.unlink(name, dir_fd=fd)
+                else:
+                    os.unlink(os.path.join(folder, name))
+                removed += 1
+            except FileNotFoundError:
+                # already gone, e.g. a collect being rolled forward
+                pass
+    finally:
+        if fd is not None:
+            os.close(fd)
+    return removed
+
+
+def remove_artifacts(folder, names: list, batch_size: int = 512, workers: int = None) -> int:
+    """
+    Removes archived artifacts in batches spread over a thread pool.
+
+    :param folder: The artifact folder
+    :param names: File names to remove
+    :param batch_size: Number of files unlinked per task
+    :param workers: Thread pool size, defaults to default_workers()
+    :return: The number of files removed
+    """
+    folder = str(folder)
+    batches = [names[i : i + batch_size] for i in range(0, len(names), batch_size)]
+
+    with ThreadPoolExecutor(max_workers=workers or default_workers()) as pool:
+        return sum(pool.map(lambda b: _unlink_batch(folder, b), batches))
+
+
+def report_throughput(count: int, started: float) -> None:
+    """
+    Logs how fast artifacts were ingested.
+
+    :param count: Number of artifacts processed
+    :param started: time.perf_counter() value taken before scanning
+    :return: None
+    """
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    log.info(f"INGEST: {count} artifacts in {elapsed:.3f}s ({count / elapsed:.0f} files/sec)")
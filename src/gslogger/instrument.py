@@ -0,0 +1,166 @@
+# logging and timing for glog.
+#
+# Every module reports through the "gslogger" logger instead of print, so
+# how chatty a run is comes down to one level: per-version and per-file
+# detail is DEBUG, a line or two per command is INFO, failures are ERROR.
+#
+# Phases are timed with span(), which adds to a per-process table:
+#
+#   with span("render", items=len(misses)):
+#       ...
+#
+# Spans may nest and each one counts its full wall time, children included
+# (like cumulative time in a profiler). timing_report() returns the table,
+# `glog --profile` writes it out as JSON, and `glog --cprofile FILE` dumps
+# cProfile stats for the whole command.
+
+import contextlib
+import json
+import logging
+import os
+import sys
+import time
+
+log = logging.getLogger("gslogger")
+
+# span name -> {"calls": n, "total_s": seconds, "items": n}
+_SPANS = {}
+_STARTED = time.perf_counter()
+
+LEVELS = ["debug", "info", "warning", "error"]
+
+
+def setup_logging(level: str = "info", stream=None) -> None:
+    """
+    Sends gslogger messages to stream (stdout by default) as plain lines.
+
+    Calling it again only changes the level and stream.
+
+    :param level: One of LEVELS
+    :param stream: A text stream
+    :return: None
+    """
+    for handler in list(log.handlers):
+        log.removeHandler(handler)
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    log.addHandler(handler)
+    log.setLevel(level.upper())
+    log.propagate = False
+
+
+def _add(name: str, elapsed: float, items: int) -> None:
+    entry = _SPANS.get(name)
+    if entry is None:
+        entry = _SPANS[name] = {"calls": 0, "total_s": 0.0, "items": 0}
+    entry["calls"] += 1
+    entry["total_s"] += elapsed
+    entry["items"] += items
+
+
+@contextlib.contextmanager
+def span(name: str, items: int = 0):
+    """
+    Times the enclosed block under name.
+
+    :param name: The phase, e.g. "scan" or "render"
+    :param items: How many things the block handles, for items/sec
+    :return: A context manager
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        _add(name, elapsed, items)
+        log.debug(f"SPAN: {name} {elapsed:.4f}s")
+
+
+def timed(name: str, iterable):
+    """
+    Times a lazy iterable, counting only the time spent producing its items.
+
+    For generators like ingest.read_artifacts, whose work happens while the
+    caller loops over them.
+
+    :param name: The phase the production time is added to
+    :param iterable: Any iterable
+    :return: A generator of the same items
+    """
+    it = iter(iterable)
+    total, count = 0.0, 0
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                total += time.perf_counter() - started
+                break
+            total += time.perf_counter() - started
+            count += 1
+            yield item
+    finally:
+        _add(name, total, count)
+
+
+def timing_report() -> dict:
+    """
+    Returns the spans timed so far in this process.
+
+    :return: {"total_s": ..., "spans": {name: {calls, total_s, items, items_per_sec}}}
+    """
+    spans = {}
+    for name, entry in _SPANS.items():
+        spans[name] = dict(entry, total_s=round(entry["total_s"], 6))
+        if entry["items"] and entry["total_s"]:
+            spans[name]["items_per_sec"] = round(entry["items"] / entry["total_s"], 1)
+    return {
+        "argv": sys.argv[1:],
+        "pid": os.getpid(),
+        "total_s": round(time.perf_counter() - _STARTED, 6),
+        "spans": spans,
+    }
+
+
+def write_profile(target: str = "-") -> None:
+    """
+    Writes timing_report() as JSON to a file, or to stderr for "-".
+
+    :param target: A file path or "-"
+    :return: None
+    """
+    text = json.dumps(timing_report(), indent=4)
+    if target == "-":
+        sys.stderr.write(text + "\n")
+    else:
+        with open(target, "w", encoding="utf-8") as fs:
+            fs.write(text)
+        log.info(f"PROFILE: timings written to {target}")
+
+
+@contextlib.contextmanager
+def cprofile(target=None):
+    """
+    Runs the enclosed block under cProfile and dumps the stats to target.
+
+    Read the dump with `python -m pstats FILE` or snakeviz. Does nothing
+    when target is empty.
+
+    :param target: The stats file
+    :return: A context manager
+    """
+    if not target:
+        yield
+        return
+
+    import cProfile
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(target)
+        log.info(f"PROFILE: cProfile stats written to {target}")
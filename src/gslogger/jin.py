@@ -1,21 +1,203 @@
 # for the sake of my dumb ass not able to build my packages if they have
 # external dependencies. i am replaceing jinja2 as my templating engine
 # with this personalized hack of a package.
+#
+# The templates use a small jinja-like syntax:
+#
+#   {{ ver.date }}  {{ app.app_title | upper }}  {{ items | join(", ") }}
+#   {% for a_type, items in ver.logs %} ... {% endfor %}    (loop.first, loop.last, loop.index)
+#   {% if ver.contributors %} ... {% elif x == "y" %} ... {% else %} ... {% endif %}
+#   {# a comment #}     {%- and -%} trim the whitespace next to them
+#
+# A template is compiled once into a Python function. The compiled code is
+# cached in memory and on disk (store/templates/), keyed by a hash of the
+# template, so a changed template is recompiled and an unchanged one never is.
+#
+# An output format is a head, a version and a foot template plus a separator
+# put between version blocks. md, html, json and atom are built in; any of
+# their parts can be replaced, and new formats added, under "templates" in
+# glog.json:
+#
+#   "templates": {"html": {"head": "@docs/head.html"}, "txt": {"ext": ".txt", ...}}
+#
+# ("@" reads a file relative to the project folder). app.output_formats lists
+# the formats `glog -g` writes, all from one pass over the log store.
+#
+# With app.output_split set to "major" or "minor" each format is written as
+# an index page plus one page per version line (changelog/v0.2.md, ...), and
+# a run only reads, renders and writes the pages with new versions.
+
+import ast
+import hashlib
+import html
+import json
+import marshal
+import os
+import re
+import sys
+from pathlib import Path
 
 try:
-    from extras import load_json
-    from version import __version__
+    from extras import date
+    from instrument import log, span, timed
+    from store import is_archived, load_manifest, iter_versions, iter_raw_versions, read_raw_segment, store_dir
+    from todo import rendered
 except:
-    from .extras import load_json
-    from .version import __version__
+    from .extras import date
+    from .instrument import log, span, timed
+    from .store import is_archived, load_manifest, iter_versions, iter_raw_versions, read_raw_segment, store_dir
+    from .todo import rendered
+
+
+RENDER_CACHE = "render_cache.json"
+RENDER_CACHE_FORMAT = 2
+# new versions read on the first pass over the store and kept for the
+# second, more than this and their segments are read again instead
+MISS_BUFFER = 4096
+TEMPLATE_CACHE = "templates"
+SPLIT_CACHE = "render_split.json"
+SHARD_CACHE = "render_shards"
+
+# bump when the generated code changes, old compiled templates are then ignored
+ENGINE_VERSION = "1"
+
+MARKDOWN = {
+    "ext": ".md",
+    "head": (
+        "# CHANGELOG: {{ app.app_title | upper }}\n"
+        "\n## [ ISSUES & FUTURE CHANGES ]\n"
+        "\n{% for f in futures %}- {{ f | strip | capitalize }}\n{% endfor %}"
+    ),
+    "version": (
+        "\n## VERSION: {{ ver.version_number | version }} | {{ ver.date }} | BUILD: {{ ver.build_number }}\n"
+        "{% for a_type, items in ver.logs %}"
+        "\n### [ {{ a_type }} ]\n"
+        "\n{% for i in items %}- {{ i | strip | capitalize }}\n{% endfor %}"
+        "{% endfor %}"
+    ),
+    "sep": "",
+    "foot": "\n\n***This Changelog Maintained by [Greg's Simple Changelogger](https://github.com/friargregarious/glogger)***",
+}
+
+HTML = {
+    "ext": ".html",
+    "head": (
+        '<!DOCTYPE html>\n<html lang="en">\n<head>\n<meta charset="utf-8">\n'
+        "<title>Changelog: {{ app.app_title | escape }}</title>\n</head>\n<body>\n"
+        "<h1>Changelog: {{ app.app_title | escape }}</h1>\n"
+        "{% if futures %}<h2>Issues &amp; future changes</h2>\n<ul>\n"
+        "{% for f in futures %}<li>{{ f | strip | capitalize | escape }}</li>\n{% endfor %}"
+        "</ul>\n{% endif %}"
+    ),
+    "version": (
+        '<section id="{{ ver.version_number | version }}">\n'
+        "<h2>{{ ver.version_number | version }} <small>{{ ver.date }} | build {{ ver.build_number }}</small></h2>\n"
+        "{% for a_type, items in ver.logs %}<h3>{{ a_type | escape }}</h3>\n<ul>\n"
+        "{% for i in items %}<li>{{ i | strip | capitalize | escape }}</li>\n{% endfor %}</ul>\n{% endfor %}"
+        "{% if ver.contributors %}<p>Contributors: {{ ver.contributors | escape }}</p>\n{% endif %}"
+        "</section>\n"
+    ),
+    "sep": "",
+    "foot": (
+        '<footer>This changelog is maintained by <a href="https://github.com/friargregarious/glogger">'
+        "Greg's Simple Changelogger</a></footer>\n</body>\n</html>\n"
+    ),
+}
+
+JSON = {
+    "ext": ".json",
+    "head": '{"app_title": {{ app.app_title | json }}, "futures": {{ futures | json }}, "versions": [\n',
+    "version": "{{ ver | json }}",
+    "sep": ",\n",
+    "foot": "\n]}\n",
+}
+
+ATOM = {
+    "ext": ".atom",
+    "head": (
+        '<?xml version="1.0" encoding="utf-8"?>\n<feed xmlns="http://www.w3.org/2005/Atom">\n'
+        "<title>{{ app.app_title | escape }} changelog</title>\n"
+        "<id>urn:glog:{{ app.app_title | escape }}</id>\n"
+        "<updated>{{ latest.date | default(today) | rfc3339 }}</updated>\n"
+        '{% if dev.dev_link %}<link href="{{ dev.dev_link | escape }}"/>\n{% endif %}'
+        "<author><name>{{ dev.developer | escape }}</name></author>\n"
+    ),
+    "version": (
+        "<entry>\n<title>{{ ver.version_number | version }}</title>\n"
+        "<id>urn:glog:{{ app.app_title | escape }}:{{ ver.version_number | version }}:{{ ver.build_number }}</id>\n"
+        "<updated>{{ ver.date | rfc3339 }}</updated>\n"
+        '<content type="html">'
+        "{% for a_type, items in ver.logs %}&lt;h3&gt;{{ a_type | escape | escape }}&lt;/h3&gt;&lt;ul&gt;"
+        "{% for i in items %}&lt;li&gt;{{ i | strip | capitalize | escape | escape }}&lt;/li&gt;{% endfor %}"
+        "&lt;/ul&gt;{% endfor %}</content>\n</entry>\n"
+    ),
+    "sep": "",
+    "foot": "</feed>\n",
+}
+
+# split output (app.output_split): an index page listing the shards, and
+# one page per shard made of shard_head, the version blocks and shard_foot
+MARKDOWN.update(
+    index=(
+        MARKDOWN["head"] + "\n## [ VERSIONS ]\n"
+        "\n{% for s in shards %}- [{{ s.name }}]({{ s.link }}) | {{ s.oldest | version }} - {{ s.newest | version }}"
+        " | {{ s.count }} versions | {{ s.date }}\n{% endfor %}" + MARKDOWN["foot"]
+    ),
+    shard_head="# CHANGELOG: {{ app.app_title | upper }} {{ shard.name }}\n\n[All versions]({{ shard.index }})\n",
+    shard_foot=MARKDOWN["foot"],
+)
+
+HTML.update(
+    index=(
+        HTML["head"] + "<h2>Versions</h2>\n<ul>\n"
+        '{% for s in shards %}<li><a href="{{ s.link | escape }}">{{ s.name }}</a> '
+        "{{ s.oldest | version }} - {{ s.newest | version }}, {{ s.count }} versions, {{ s.date }}</li>\n"
+        "{% endfor %}</ul>\n" + HTML["foot"]
+    ),
+    shard_head=(
+        '<!DOCTYPE html>\n<html lang="en">\n<head>\n<meta charset="utf-8">\n'
+        "<title>Changelog: {{ app.app_title | escape }} {{ shard.name }}</title>\n</head>\n<body>\n"
+        "<h1>Changelog: {{ app.app_title | escape }} {{ shard.name }}</h1>\n"
+        '<p><a href="{{ shard.index | escape }}">All versions</a></p>\n'
+    ),
+    shard_foot=HTML["foot"],
+)
+
+JSON.update(
+    index='{"app_title": {{ app.app_title | json }}, "futures": {{ futures | json }}, "shards": {{ shards | json }}}\n',
+    shard_head='{"app_title": {{ app.app_title | json }}, "shard": {{ shard.name | json }}, "versions": [\n',
+    shard_foot=JSON["foot"],
+)
+
+ATOM.update(
+    index=(
+        ATOM["head"] + "{% for s in shards %}<entry>\n<title>{{ s.name }}</title>\n"
+        "<id>urn:glog:{{ app.app_title | escape }}:{{ s.name }}</id>\n"
+        "<updated>{{ s.date | rfc3339 }}</updated>\n"
+        '<link href="{{ s.link | escape }}"/>\n'
+        "<summary>{{ s.oldest | version }} - {{ s.newest | version }}, {{ s.count }} versions</summary>\n"
+        "</entry>\n{% endfor %}" + ATOM["foot"]
+    ),
+    shard_head=(
+        '<?xml version="1.0" encoding="utf-8"?>\n<feed xmlns="http://www.w3.org/2005/Atom">\n'
+        "<title>{{ app.app_title | escape }} {{ shard.name }} changelog</title>\n"
+        "<id>urn:glog:{{ app.app_title | escape }}:{{ shard.name }}</id>\n"
+        "<updated>{{ shard.date | rfc3339 }}</updated>\n"
+        "<author><name>{{ dev.developer | escape }}</name></author>\n"
+    ),
+    shard_foot=ATOM["foot"],
+)
+
+FORMATS = {"md": MARKDOWN, "html": HTML, "json": JSON, "atom": ATOM}
+PARTS = ["head", "version", "sep", "foot"]
+SHARD_PARTS = ["index", "shard_head", "shard_foot"]
+
+# app.output_split -> how many parts of the version number name a shard
+SPLITS = {"none": 0, "major": 1, "minor": 2}
 
 
-HEADER_DOC = "# CHANGELOG: {app_title}\n"
-HEADER_FUTURES = "\n## [ ISSUES & FUTURE CHANGES ]\n"
-HEADER_VERSION = "\n## VERSION: {version_number} | {date} | BUILD: {build_number}\n"
-CONTRIBUTORS = "\nCONTRIBUTORS: {contributors}\n"
-HEADER_SECTION = "\n### [ {artifact_type} ]\n"
-FOOTER = "\n\n***This Changelog Maintained by [Greg's Simple Changelogger](https://github.com/friargregarious/glogger)***"
+class TemplateError(ValueError):
+    pass
 
 
 def fmt_det_lst(det_list: list) -> str:
@@ -35,71 +217,1028 @@ def fmt_det_lst(det_list: list) -> str:
     return det_txt
 
 
-def build_report(data: dict) -> str:
+##########################################################################
+# TEMPLATE ENGINE ########################################################
+
+
+def _s(value) -> str:
+    if value is None:
+        return ""
+    return value if isinstance(value, str) else str(value)
+
+
+def _rfc3339(value) -> str:
+    value = _s(value)
+    # "YYYY-MM-DD" release dates become midnight UTC
+    return value + "T00:00:00Z" if len(value) == 10 else value
+
+
+FILTERS = {
+    "upper": lambda v: _s(v).upper(),
+    "lower": lambda v: _s(v).lower(),
+    "capitalize": lambda v: _s(v).capitalize(),
+    "strip": lambda v: _s(v).strip(),
+    "escape": lambda v: html.escape(_s(v)),
+    "json": lambda v: json.dumps(v, sort_keys=True),
+    "version": lambda v: "v" + ".".join(map(str, v or [])),
+    "join": lambda v, sep=", ": sep.join(map(_s, v or [])),
+    "default": lambda v, fallback="": fallback if v in (None, "", [], {}) else v,
+    "length": lambda v: len(v or ()),
+    "rfc3339": _rfc3339,
+}
+
+
+class _Loop:
+    __slots__ = ("index", "first", "last", "length")
+
+    def __init__(self, index, length):
+        self.index = index + 1
+        self.first = index == 0
+        self.last = index == length - 1
+        self.length = length
+
+
+def _get(obj, key):
+    if isinstance(obj, dict):
+        return obj.get(key)
+    if isinstance(obj, (list, tuple)) and isinstance(key, int):
+        return obj[key] if -len(obj) <= key < len(obj) else None
+    if isinstance(obj, _Loop) and key in _Loop.__slots__:
+        return getattr(obj, key)
+    return None
+
+
+def _iter(value, pairs: bool):
+    if value is None:
+        return ()
+    if pairs and isinstance(value, dict):
+        return value.items()
+    return value
+
+
+def _looped(value, pairs: bool):
+    items = list(_iter(value, pairs))
+    for i, item in enumerate(items):
+        yield _Loop(i, len(items)), item
+
+
+_RUNTIME = {"_f": FILTERS, "_get": _get, "_s": _s, "_iter": _iter, "_looped": _looped}
+
+_TAG_RE = re.compile(r"\{#.*?#\}|(\{\{-?|\{%-?)(.*?)(-?\}\}|-?%\})", re.S)
+_EXPR_TOKEN_RE = re.compile(
+    r"\s*(?:(?P<num>\d+(?:\.\d+)?)"
+    r"|(?P<str>\"(?:[^\"\\]|\\.)*\"|'(?:[^'\\]|\\.)*')"
+    r"|(?P<name>[A-Za-z_]\w*)"
+    r"|(?P<op>==|!=|<=|>=|[<>|.,()\[\]]))"
+)
+_FOR_RE = re.compile(r"for\s+([A-Za-z_]\w*)(?:\s*,\s*([A-Za-z_]\w*))?\s+in\s+(.+)$", re.S)
+_CONSTANTS = {"true": "True", "false": "False", "none": "None"}
+
+
+def _lex(source: str, name: str) -> list:
+    tokens, pos, trim = [], 0, False
+    for m in _TAG_RE.finditer(source):
+        text = source[pos : m.start()]
+        pos = m.end()
+        if m.group(1) is None:  # a comment
+            tokens.append(("text", text))
+            continue
+        if trim:
+            text = text.lstrip()
+        if m.group(1).endswith("-"):
+            text = text.rstrip()
+        tokens.append(("text", text))
+
+        expr = m.group(1).startswith("{{")
+        if expr != m.group(3).endswith("}}"):
+            raise TemplateError(f"TEMPLATE {name}: mismatched tag {m.group(0)!r}")
+        tokens.append(("expr" if expr else "stmt", m.group(2).strip()))
+        trim = m.group(3).startswith("-")
+
+    text = source[pos:]
+    tokens.append(("text", text.lstrip() if trim else text))
+    return [t for t in tokens if t != ("text", "")]
+
+
+class _Expr:
     """
-    Builds a changelog report based on the provided data and configuration.
+    Compiles one template expression into Python source.
+
+    Only names, literals, ".attr" / "[key]" lookups, comparisons, and / or /
+    not and filters exist, a template can't call anything else.
+    """
+
+    def __init__(self, text: str, resolve, name: str):
+        self.tokens = []
+        self.name = name
+        self.resolve = resolve
+        pos = 0
+        while pos < len(text):
+            m = _EXPR_TOKEN_RE.match(text, pos)
+            if not m or m.end() == pos:
+                if text[pos:].strip():
+                    raise TemplateError(f"TEMPLATE {name}: can't read {text[pos:]!r}")
+                break
+            kind = m.lastgroup
+            self.tokens.append((kind, m.group(kind)))
+            pos = m.end()
+        self.i = 0
+
+    def _peek(self, value=None):
+        if self.i >= len(self.tokens):
+            return None
+        token = self.tokens[self.i]
+        if value is None or token[1] == value:
+            return token
+        return None
+
+    def _take(self, value=None):
+        token = self._peek(value)
+        if token is None:
+            raise TemplateError(f"TEMPLATE {self.name}: expected {value or 'more'} in expression")
+        self.i += 1
+        return token
+
+    def compile(self) -> str:
+        code = self._or()
+        if self.i != len(self.tokens):
+            raise TemplateError(f"TEMPLATE {self.name}: unexpected {self.tokens[self.i][1]!r}")
+        return code
+
+    def _or(self):
+        code = self._and()
+        while self._peek("or"):
+            self.i += 1
+            code = f"({code} or {self._and()})"
+        return code
+
+    def _and(self):
+        code = self._not()
+        while self._peek("and"):
+            self.i += 1
+            code = f"({code} and {self._not()})"
+        return code
+
+    def _not(self):
+        if self._peek("not"):
+            self.i += 1
+            return f"(not {self._not()})"
+        return self._compare()
+
+    def _compare(self):
+        code = self._filtered()
+        token = self._peek()
+        if token and token[1] in ("==", "!=", "<", ">", "<=", ">=", "in"):
+            self.i += 1
+            code = f"({code} {token[1]} {self._filtered()})"
+        return code
+
+    def _filtered(self):
+        code = self._primary()
+        while self._peek("|"):
+            self.i += 1
+            kind, name = self._take()
+            if kind != "name" or name not in FILTERS:
+                raise TemplateError(f"TEMPLATE {self.name}: unknown filter {name!r}")
+            args = [code]
+            if self._peek("("):
+                self.i += 1
+                while not self._peek(")"):
+                    args.append(self._or())
+                    if not self._peek(")"):
+                        self._take(",")
+                self._take(")")
+            code = f"_f[{name!r}]({', '.join(args)})"
+        return code
+
+    def _primary(self):
+        kind, value = self._take()
+        if kind == "num":
+            code = value
+        elif kind == "str":
+            code = repr(ast.literal_eval(value))
+        elif kind == "name" and value in _CONSTANTS:
+            code = _CONSTANTS[value]
+        elif kind == "name":
+            code = self.resolve(value)
+        elif value == "(":
+            code = self._or()
+            self._take(")")
+        else:
+            raise TemplateError(f"TEMPLATE {self.name}: unexpected {value!r}")
+
+        while True:
+            if self._peek("."):
+                self.i += 1
+                kind, attr = self._take()
+                if kind != "name":
+                    raise TemplateError(f"TEMPLATE {self.name}: bad attribute {attr!r}")
+                code = f"_get({code}, {attr!r})"
+            elif self._peek("["):
+                self.i += 1
+                code = f"_get({code}, {self._or()})"
+                self._take("]")
+            else:
+                return code
+
+
+def _codegen(source: str, name: str) -> str:
+    """
+    Turns a template into the Python source of a render(ctx) -> str function.
+    """
+    tokens = _lex(source, name)
+    body, free, loops = [], set(), []
+
+    def resolve(var):
+        if var == "loop" and loops:
+            loops[-1]["used"] = True
+            return loops[-1]["var"]
+        free.add(var)
+        return f"v_{var}"
+
+    def block(i, depth, ends):
+        pad = "    " * depth
+        start = len(body)
+        while i < len(tokens):
+            kind, value = tokens[i]
+            i += 1
+            if kind == "text":
+                body.append(f"{pad}_o({value!r})")
+            elif kind == "expr":
+                body.append(f"{pad}_o(_s({_Expr(value, resolve, name).compile()}))")
+            else:
+                word = value.split(None, 1)[0] if value else ""
+                if word in ends:
+                    if len(body) == start:
+                        body.append(f"{pad}pass")
+                    return i, word, value
+                if word == "for":
+                    m = _FOR_RE.match(value)
+                    if not m:
+                        raise TemplateError(f"TEMPLATE {name}: bad loop {value!r}")
+                    first, second, iterable = m.groups()
+                    iterable = _Expr(iterable, resolve, name).compile()
+                    target = f"v_{first}, v_{second}" if second else f"v_{first}"
+                    pairs = second is not None
+
+                    loop = {"var": f"_loop{len(loops)}", "used": False}
+                    loops.append(loop)
+                    header = len(body)
+                    i, word, _ = block(i, depth + 1, {"endfor"})
+                    loops.pop()
+                    if word != "endfor":
+                        raise TemplateError(f"TEMPLATE {name}: {value!r} is never closed")
+                    if loop["used"]:
+                        # only loops that ask for loop.* pay for it
+                        body.insert(header, f"{pad}for {loop['var']}, ({target}) in _looped({iterable}, {pairs}):")
+                    else:
+                        body.insert(header, f"{pad}for {target} in _iter({iterable}, {pairs}):")
+                elif word == "if":
+                    body.append(f"{pad}if {_Expr(value[2:], resolve, name).compile()}:")
+                    while True:
+                        i, word, stmt = block(i, depth + 1, {"elif", "else", "endif"})
+                        if word == "elif":
+                            body.append(f"{pad}elif {_Expr(stmt[4:], resolve, name).compile()}:")
+                        elif word == "else":
+                            body.append(f"{pad}else:")
+                        elif word == "endif":
+                            break
+                        else:
+                            raise TemplateError(f"TEMPLATE {name}: {value!r} is never closed")
+                else:
+                    raise TemplateError(f"TEMPLATE {name}: unknown tag {value!r}")
+        if len(body) == start:
+            body.append(f"{pad}pass")
+        return i, None, None
+
+    block(0, 1, set())
+    lines = ["def render(_ctx):", "    _out = []", "    _o = _out.append"]
+    lines += [f"    v_{var} = _ctx.get({var!r})" for var in sorted(free)]
+    lines += body
+    lines.append("    return ''.join(_out)")
+    return "\n".join(lines) + "\n"
+
+
+# compiled code objects by template hash, for this process
+_CODE_CACHE = {}
+
+
+def compile_template(source: str, name: str = "template", cache_dir=None):
+    """
+    Compiles a template into a render(ctx) -> str function.
+
+    :param source: The template text
+    :param name: Used in error messages
+    :param cache_dir: A folder for compiled templates, None for memory only
+    :return: The render function
+    """
+    key = _digest(ENGINE_VERSION, source)
+    code = _CODE_CACHE.get(key)
+
+    cached = None
+    tag = sys.implementation.cache_tag
+    if code is None and cache_dir is not None and tag:
+        cached = Path(cache_dir) / f"{key}.{tag}.bin"
+        try:
+            code = marshal.loads(cached.read_bytes())
+        except Exception:
+            code = None
 
-    :param data: the changelog data previously collected from artifacts
-    :param cfg: the configuration for the application
-    :return: a string containing the MD formatted changelog report
+    if code is None:
+        code = compile(_codegen(source, name), f"<template {name}>", "exec")
+        if cached is not None:
+            try:
+                cached.parent.mkdir(parents=True, exist_ok=True)
+                stage = cached.with_name(cached.name + f".{os.getpid()}.tmp")
+                stage.write_bytes(marshal.dumps(code))
+                os.replace(stage, cached)
+            except OSError:
+                pass
+    _CODE_CACHE[key] = code
+
+    namespace = dict(_RUNTIME)
+    exec(code, namespace)
+    return namespace["render"]
+
+
+##########################################################################
+# OUTPUT FORMATS #########################################################
+
+
+def output_formats(data: dict) -> list:
+    """
+    Returns the formats `glog -g` writes, app.output_formats or just md.
+
+    :param data: the running configuration
+    :return: a list of format names
     """
-    output = ""
+    return data["app"].get("output_formats") or ["md"]
+
+
+def format_spec(data: dict, fmt: str) -> dict:
+    """
+    Returns the templates of a format, built in ones overlaid with glog.json's.
+
+    :param data: the running configuration
+    :param fmt: a format name
+    :return: {"ext", "head", "version", "sep", "foot"}
+    """
+    spec = dict(FORMATS.get(fmt, {}))
+    for part, text in (data.get("templates") or {}).get(fmt, {}).items():
+        if isinstance(text, str) and text.startswith("@"):
+            src = Path(data["paths"].get("CWD", ".")) / text[1:]
+            text = src.read_text(encoding="utf-8")
+        spec[part] = text
+
+    missing = [p for p in PARTS if p not in spec and p != "sep"]
+    if missing:
+        raise TemplateError(f"TEMPLATE {fmt}: no {', '.join(missing)} template")
+    spec.setdefault("sep", "")
+    spec.setdefault("ext", f".{fmt}")
+    return spec
+
 
-    log_store = load_json(data["paths"]["FILE_LOG"])
+def _output_base(data: dict) -> Path:
+    return Path(data["paths"].get("FILE_OUTPUT") or Path(data["paths"]["CWD"]) / "changelog.md")
+
+
+def output_split(data: dict) -> int:
+    """
+    Returns how many parts of the version number name a shard page, from
+    app.output_split: 0 for one file ("none", the default), 1 for one page
+    per major version ("major"), 2 per minor version ("minor").
+
+    :param data: the running configuration
+    :return: 0, 1 or 2
+    """
+    split = data["app"].get("output_split") or "none"
+    if split not in SPLITS:
+        raise TemplateError(f"app.output_split must be one of {', '.join(SPLITS)}, not {split!r}")
+    return SPLITS[split]
+
+
+def shard_dir(data: dict) -> Path:
+    """
+    Returns the folder holding the shard pages, named after the output file
+    and next to it: changelog.md -> changelog/.
+
+    :param data: the running configuration
+    :return: A Path
+    """
+    return _output_base(data).with_suffix("")
+
+
+def shard_name(version_number: list, depth: int) -> str:
+    """
+    Names the shard a version belongs to, e.g. "v0.2" for v0.2.72 split by minor.
+
+    :param version_number: [major, minor, patch]
+    :param depth: from output_split()
+    :return: str
+    """
+    return "v" + ".".join(map(str, list(version_number)[:depth]))
+
+
+def output_targets(data: dict, formats: list = None) -> dict:
+    """
+    Maps each output format to its file: md is paths.FILE_OUTPUT, the others
+    sit next to it with their own extension.
+
+    :param data: the running configuration
+    :param formats: format names, defaults to output_formats(data)
+    :return: {format: Path}
+    """
+    base = _output_base(data)
+    targets = {}
+    for fmt in formats or output_formats(data):
+        targets[fmt] = base if fmt == "md" else base.with_suffix(format_spec(data, fmt)["ext"])
+    return targets
+
+
+def _version_globals(data: dict) -> dict:
+    # what a version block may use besides the record, part of its cache key
+    return {"app": {"app_title": data["app"].get("app_title")}, "dev": data.get("dev") or {}}
+
+
+def compile_format(data: dict, fmt: str, spec: dict = None) -> dict:
+    """
+    Compiles the templates of one format.
+
+    :param data: the running configuration, None for the built in templates only
+    :param fmt: a format name
+    :param spec: the templates, defaults to format_spec(data, fmt)
+    :return: {"head", "version", "foot" and any SHARD_PARTS: render functions, "sep", "ext", "hash": str}
+    """
+    if spec is None:
+        spec = format_spec(data, fmt)
+    cache_dir = store_dir(data) / TEMPLATE_CACHE if data else None
 
-    print(f"Generating Changelog Text.")
+    compiled = {"sep": spec["sep"], "ext": spec["ext"]}
+    for part in ("head", "version", "foot", *SHARD_PARTS):
+        if part in spec:
+            compiled[part] = compile_template(spec[part], f"{fmt}.{part}", cache_dir)
+
+    globals_ = json.dumps(_version_globals(data) if data else {}, sort_keys=True)
+    compiled["hash"] = _digest(ENGINE_VERSION, *(spec[p] for p in PARTS), globals_)
+    return compiled
+
+
+def _doc_context(data: dict, futures: list, latest: dict) -> dict:
+    return {
+        "app": data["app"],
+        "dev": data.get("dev") or {},
+        # the open ones, as "<id> - text"
+        "futures": rendered(futures),
+        "latest": latest,
+        "today": date(reporting=True),
+    }
+
+
+_MARKDOWN = None
+
+
+def fmt_version(ver: dict) -> str:
+    """
+    Formats one collected version record into its markdown block.
+
+    :param ver: A version record from the log store
+    :return: The version header followed by one section per artifact type
+    """
+    global _MARKDOWN
+    if _MARKDOWN is None:
+        _MARKDOWN = compile_template(MARKDOWN["version"], "md.version")
+    return _MARKDOWN({"ver": ver})
+
+
+def render_report(data: dict, fmt: str = "md"):
+    """
+    Renders the changelog report one piece at a time.
+
+    Yields the document head, each version block (newest first, read one
+    store segment at a time) and the foot, so nothing larger than a single
+    version is ever held in memory.
+
+    :param data: the running configuration
+    :param fmt: the output format
+    :return: a generator of formatted text chunks
+    """
+    manifest = load_manifest(data)
+    compiled = compile_format(data, fmt)
+    version_ctx = _version_globals(data)
+
+    log.debug("Generating Changelog Text.")
+
+    versions = timed("store_read", iter_versions(data, manifest))
+    latest = next(versions, None)
+    ctx = _doc_context(data, manifest["doc_parts"]["futures"], latest)
 
     # build the header and metadata portion of the changelog
     try:
-        output += HEADER_DOC.format(app_title=data["app"]["app_title"]).upper()
-        print(f"Changelog formatting HEADER: Success!")
+        yield compiled["head"](ctx)
+        log.debug("Changelog formatting HEADER: Success!")
     except Exception as e:
-        print(
-            f"Changelog formatting HEADER: Error: {e} app_title: {data['app']['app_title']}"
-        )
+        log.error(f"Changelog formatting HEADER: Error: {e} app_title: {data['app']['app_title']}")
+
+    # assemble the versions data & template of the changelog
+    first = True
+    for ver in _chain(latest, versions) if latest is not None else ():
+        try:
+            with span("render", items=1):
+                block = compiled["version"](dict(version_ctx, ver=ver))
+            if not first:
+                yield compiled["sep"]
+            first = False
+            yield block
+            log.debug(f"Changelog formatting Versions {ver['version_number']} Success!")
+
+        except Exception as e:
+            log.error(f"Changelog formatting Versions: Error: {e}")
+
+    # last line of the changelog
+    yield compiled["foot"](ctx)
+
+    log.debug("Changelog Text: Successfully Completed!")
+
+
+def _chain(first, rest):
+    yield first
+    yield from rest
+
 
-    # FUTURES are details only found under the main heading
+def _digest(*parts: str) -> str:
+    sha = hashlib.sha256()
+    for part in parts:
+        sha.update(part.encode("utf-8"))
+        sha.update(b"\0")
+    return sha.hexdigest()
+
+
+def template_hash(data: dict = None, fmt: str = "md") -> str:
+    """
+    Returns a hash of every template used to render a format.
+
+    Cached blocks rendered under a different template are never reused.
+
+    :return: A hex digest
+    """
+    return compile_format(data, fmt, None if data else FORMATS[fmt])["hash"]
+
+
+def _load_json(target: Path):
     try:
-        output += HEADER_FUTURES
-        output += fmt_det_lst(log_store["doc_parts"]["futures"])
-        print(f"Changelog formatting FUTURES: Success!")
+        return json.loads(target.read_text(encoding="utf-8"))
+    except Exception:
+        return None
+
+
+def _load_render_cache(target: Path) -> dict:
+    cache = _load_json(target)
+    if isinstance(cache, dict) and cache.get("format") == RENDER_CACHE_FORMAT:
+        return cache
+    return {"format": RENDER_CACHE_FORMAT, "keys": [], "formats": {}, "archives": {}}
+
+
+def _block_key(line: str) -> str:
+    # short, the cache keeps one per stored version
+    return hashlib.blake2b(line.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _encode(text: str) -> bytes:
+    # what a text mode write puts on disk
+    if os.linesep != "\n":
+        text = text.replace("\n", os.linesep)
+    return text.encode("utf-8")
 
+
+def _reusable(section: dict, template: str, target: Path) -> bool:
+    # the last document of a format can lend its blocks when it was written
+    # from the same templates and nobody touched it since
+    if not section or section.get("template") != template or section.get("file") != str(target):
+        return False
+    try:
+        st = target.stat()
+    except OSError:
+        return False
+    return section.get("stat") == [st.st_size, st.st_mtime_ns]
+
+
+def _write_document(target: Path, head: str, keys: list, blocks: dict, sep: str, foot: str, buffer_size: int) -> None:
+    # streamed through a buffered writer into a temp file that atomically
+    # replaces the target
+    target.parent.mkdir(parents=True, exist_ok=True)
+    stage = target.with_name(target.name + ".tmp")
+    with open(stage, "w", encoding="utf-8", buffering=buffer_size) as fs:
+        fs.write(head)
+        for n, key in enumerate(keys):
+            if n and sep:
+                fs.write(sep)
+            fs.write(blocks[key])
+        fs.write(foot)
+    os.replace(stage, target)
+
+
+def _render_block(compiled: dict, ver: dict, version_ctx: dict) -> str:
+    try:
+        block = compiled["version"](dict(version_ctx, ver=ver))
+        log.debug(f"Changelog formatting Versions {ver['version_number']} Success!")
+        return block
     except Exception as e:
-        print(f"Changelog formatting FUTURES: Error: {e}")
+        log.error(f"Changelog formatting Versions: Error: {e}")
+        return ""
 
-    # assemble the versions data & template of the changelog
-    # append the version header to the changelog
-    for ver in log_store["details"]:
-        ver_headers = {
-            "version_number": "v" + ".".join(map(str, ver["version_number"])),
-            "date": ver["date"],
-            "build_number": ver["build_number"],
-            "contributors": ver["contributors"],
+
+def _render_blocks(compiled: dict, blocks: dict, records, version_ctx: dict) -> int:
+    # renders the records that have no block yet, returns how many did
+    rendered = 0
+    for key, ver in records:
+        if key in blocks:
+            continue
+        blocks[key] = _render_block(compiled, ver, version_ctx)
+        rendered += 1
+    return rendered
+
+
+def write_report(data: dict, target=None, buffer_size: int = 1 << 16, formats: list = None) -> bool:
+    """
+    Writes the changelog in every output format, re-rendering only what changed.
+
+    The store is read once for all formats, hashing each stored record.
+    The render cache keeps those hashes and, per format, where each
+    version block sits in the last document written. Blocks of unchanged
+    versions are copied from that document into the new one, as long as
+    the format's templates are unchanged and the file wasn't edited;
+    new or changed versions are rendered. When a whole document hashes
+    the same as the last run and its file is still there, the write is
+    skipped.
+
+    With app.output_split the changelog is written as pages instead, see
+    write_split.
+
+    :param data: the running configuration
+    :param target: write only markdown, as one file, to this file
+    :param buffer_size: size in bytes of the write buffer
+    :param formats: formats to write, defaults to app.output_formats
+    :return: True when any file was rewritten, False when all were up to date
+    """
+    if target is None and output_split(data):
+        return write_split(data, buffer_size, formats)
+
+    targets = {"md": Path(target)} if target is not None else output_targets(data, formats)
+    # pages left over from an earlier split output
+    removed = _drop_split(data) if target is None else False
+
+    manifest = load_manifest(data)
+    compiled = {fmt: compile_format(data, fmt) for fmt in targets}
+    cache_file = store_dir(data) / RENDER_CACHE
+    cache = _load_render_cache(cache_file)
+
+    # where each block of the last documents is, by record hash
+    reused = [fmt for fmt in targets if _reusable(cache["formats"].get(fmt), compiled[fmt]["hash"], targets[fmt])]
+    old_at = {key: n for n, key in enumerate(cache["keys"])} if reused else {}
+
+    def hit(key: str) -> bool:
+        return key in old_at and len(reused) == len(targets)
+
+    # one pass over the store for every format: hash each record, keep the
+    # first MISS_BUFFER ones some format can't copy
+    order, parts, kept, latest = [], [], {}, None
+    known, archives = cache.get("archives", {}), {}
+    with span("store_read"):
+        for fingerprint, lines in _raw_segments(data, manifest):
+            keys = known.get(fingerprint) if fingerprint and latest is not None else None
+            if keys is None or not all(hit(key) for key in keys):
+                keys = []
+                for line in lines():
+                    key = _block_key(line)
+                    if latest is None:
+                        latest = line
+                    keys.append(key)
+                    if not hit(key) and len(kept) < MISS_BUFFER:
+                        kept[key] = line
+            # otherwise an archived segment rendered before is not decoded again
+            parts.append((lines, keys))
+            order.extend(keys)
+            if fingerprint:
+                archives[fingerprint] = keys
+
+    ctx = _doc_context(data, manifest["doc_parts"]["futures"], json.loads(latest) if latest else None)
+
+    stale = {}
+    for fmt, c in compiled.items():
+        head, foot = c["head"](ctx), c["foot"](ctx)
+        document = _digest(c["hash"], head, foot, *order)
+        section = cache["formats"].get(fmt) or {}
+        hits = sum(1 for key in order if key in old_at) if fmt in reused else 0
+        if document == section.get("document") and targets[fmt].exists() and not removed:
+            log.info(f"RENDER_CACHE: {hits} hits, {len(order) - hits} misses, {targets[fmt]} unchanged.")
+            continue
+        stale[fmt] = (head, foot, document, hits)
+
+    if not stale:
+        if archives != known:
+            # first run since a compact, remember what the archives hold
+            cache["archives"] = archives
+            cache_file.write_text(json.dumps(cache), encoding="utf-8")
+        return removed
+
+    with span("render", items=len(order) * len(stale)):
+        _write_documents(data, cache, targets, compiled, stale, parts, kept, old_at, reused, buffer_size)
+
+    for fmt, (head, foot, document, hits) in stale.items():
+        cache["formats"][fmt]["document"] = document
+        log.info(f"RENDER_CACHE: {hits} hits, {len(order) - hits} misses, {targets[fmt]} written.")
+    if order != cache["keys"]:
+        # the spans of formats not written this time belong to the old order
+        cache["formats"] = {fmt: cache["formats"][fmt] for fmt in targets if fmt in cache["formats"]}
+    cache["keys"] = order
+    cache["archives"] = archives
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    cache_file.write_text(json.dumps(cache), encoding="utf-8")
+    return True
+
+
+def _write_documents(data, cache, targets, compiled, stale, parts, kept, old_at, reused, buffer_size) -> None:
+    # streams every stale format's document into a temp file, a version at
+    # a time: copied from the last document where it can, rendered where not
+    version_ctx = _version_globals(data)
+    outs, sources, spans, sizes = {}, {}, {}, {}
+    try:
+        for fmt, (head, *_) in stale.items():
+            targets[fmt].parent.mkdir(parents=True, exist_ok=True)
+            outs[fmt] = open(targets[fmt].with_name(targets[fmt].name + ".tmp"), "wb", buffering=buffer_size)
+            if fmt in reused:
+                sources[fmt] = (open(targets[fmt], "rb"), cache["formats"][fmt]["spans"])
+            spans[fmt] = []
+            sizes[fmt] = outs[fmt].write(_encode(head))
+        seps = {fmt: _encode(compiled[fmt]["sep"]) for fmt in stale}
+
+        n = 0
+        for lines, keys in parts:
+            misses = [key for key in keys if any(fmt not in sources or key not in old_at for fmt in stale)]
+            raw = None
+            if any(key not in kept for key in misses):
+                raw = lines()
+                raw = raw if isinstance(raw, list) else list(raw)
+            for i, key in enumerate(keys):
+                ver = None
+                for fmt in stale:
+                    out = outs[fmt]
+                    if n and seps[fmt]:
+                        sizes[fmt] += out.write(seps[fmt])
+                    if fmt in sources and key in old_at:
+                        src, old_spans = sources[fmt]
+                        start, end = old_spans[2 * old_at[key]], old_spans[2 * old_at[key] + 1]
+                        src.seek(start)
+                        block = src.read(end - start)
+                    else:
+                        if ver is None:
+                            ver = json.loads(kept[key] if key in kept else raw[i])
+                        block = _encode(_render_block(compiled[fmt], ver, version_ctx))
+                    spans[fmt] += [sizes[fmt], sizes[fmt] + len(block)]
+                    sizes[fmt] += out.write(block)
+                n += 1
+
+        for fmt, (head, foot, *_) in stale.items():
+            outs[fmt].write(_encode(foot))
+    finally:
+        for fs in list(outs.values()) + [src for src, _ in sources.values()]:
+            fs.close()
+
+    for fmt in stale:
+        os.replace(targets[fmt].with_name(targets[fmt].name + ".tmp"), targets[fmt])
+        st = targets[fmt].stat()
+        cache["formats"][fmt] = {
+            "template": compiled[fmt]["hash"],
+            "file": str(targets[fmt]),
+            "stat": [st.st_size, st.st_mtime_ns],
+            "spans": spans[fmt],
         }
-        version_logs = ver["logs"]
 
+
+def _fingerprint(folder: Path, segment: dict) -> str:
+    # a segment is only rewritten when a version is added to it, so its
+    # stat tells whether it changed
+    st = (folder / segment["name"]).stat()
+    return f"{segment['name']}:{segment['count']}:{st.st_size}:{st.st_mtime_ns}"
+
+
+def _raw_segments(data: dict, manifest: dict):
+    # (fingerprint, lines) newest first, lines() reading the segment's raw
+    # lines newest first. Only archived segments have a fingerprint, the
+    # others are cheap enough to hash on every run.
+    if manifest.get("engine") == "sqlite":
+        yield None, lambda: iter_raw_versions(data, manifest)
+        return
+    folder = store_dir(data)
+    for segment in reversed(manifest["segments"]):
+        fingerprint = _fingerprint(folder, segment) if is_archived(segment["name"]) else None
+        yield fingerprint, lambda name=segment["name"]: read_raw_segment(data, name)
+
+
+def _store_sources(data: dict, manifest: dict) -> list:
+    # the store as (fingerprint, segment) pairs, oldest first. A sqlite
+    # store is one source with no fingerprint and is read on every run.
+    if manifest.get("engine") == "sqlite":
+        return [(None, None)]
+    folder = store_dir(data)
+    return [(_fingerprint(folder, segment), segment["name"]) for segment in manifest["segments"]]
+
+
+def _read_source(data: dict, manifest: dict, source: tuple, depth: int) -> dict:
+    # {shard name: [(hash, record), ...]}, newest first within and across shards
+    lines = iter_raw_versions(data, manifest) if source[1] is None else read_raw_segment(data, source[1])
+    groups = {}
+    for line in lines:
+        ver = json.loads(line)
+        groups.setdefault(shard_name(ver["version_number"], depth), []).append((_digest(line), ver))
+    return groups
+
+
+def _drop_split(data: dict) -> bool:
+    # removes every split page and its caches
+    state_file = store_dir(data) / SPLIT_CACHE
+    state = _load_json(state_file)
+    if state is None:
+        return False
+
+    for fmt_state in state.get("formats", {}).values():
+        for page in fmt_state.get("pages", {}).values():
+            Path(page[0]).unlink(missing_ok=True)
+    for name in state.get("shards", {}):
+        (store_dir(data) / SHARD_CACHE / f"{name}.json").unlink(missing_ok=True)
+    state_file.unlink()
+    for folder in (shard_dir(data), store_dir(data) / SHARD_CACHE):
         try:
-            output += HEADER_VERSION.format(**ver_headers)
-            print(
-                f"Changelog version header {ver['version_number']}: Successfully appended."
-            )
+            folder.rmdir()
+        except OSError:
+            pass
+    log.info(f"RENDER_CACHE: pages in {shard_dir(data)} removed.")
+    return True
 
-            for a_type, a_list in version_logs.items():
-                output += HEADER_SECTION.format(artifact_type=a_type)
-                output += fmt_det_lst(a_list)
 
-        except Exception as e:
-            print(f"Changelog formatting Versions: Error: {e}")
+def write_split(data: dict, buffer_size: int = 1 << 16, formats: list = None) -> bool:
+    """
+    Writes the changelog as an index page plus one page per version line.
 
-        print(f"Changelog formatting Versions {ver['version_number']} Success!")
+    app.output_split picks the lines, "major" or "minor". The pages go in
+    shard_dir, the index pages replace the usual output files.
 
-    try:
-        # last line of the changelog
-        output += FOOTER
+    The work follows what changed, not the size of the history: store
+    segments that are unchanged since the last run are not read, a page
+    is only rendered when a segment holding its versions changed (or its
+    templates did), and only written when its content hashes differently.
+    Each page keeps its own block cache in store/render_shards/.
 
-        print(f"Changelog Text: Successfully Completed!")
+    :param data: the running configuration
+    :param buffer_size: size in bytes of the write buffer
+    :param formats: formats to write, defaults to app.output_formats
+    :return: True when any file was rewritten, False when all were up to date
+    """
+    depth = output_split(data)
+    targets = output_targets(data, formats)
+    manifest = load_manifest(data)
+    compiled = {fmt: compile_format(data, fmt) for fmt in targets}
+    for fmt, c in compiled.items():
+        if any(part not in c for part in SHARD_PARTS):
+            raise TemplateError(f"TEMPLATE {fmt}: app.output_split needs {', '.join(SHARD_PARTS)} templates")
 
-    except Exception as e:
-        print(f"Error adding footer: {e}")
+    state_file = store_dir(data) / SPLIT_CACHE
+    state = _load_json(state_file) or {}
+    written = False
+    if state.get("depth") != depth:
+        # split another way, none of the pages or caches are of use
+        written = _drop_split(data)
+        state = {}
+    known = state.get("sources", {})
+    shards = state.get("shards", {})
+    fmt_states = {fmt: state.get("formats", {}).get(fmt) or {"pages": {}} for fmt in compiled}
+
+    sources = _store_sources(data, manifest)
+    read = {}
+
+    def records(i: int) -> dict:
+        if i not in read:
+            with span("store_read"):
+                read[i] = _read_source(data, manifest, sources[i], depth)
+        return read[i]
+
+    # the sources of each shard, oldest first; only new or changed sources are read
+    members = {}
+    for i, (fp, _) in enumerate(sources):
+        names = known.get(fp) if fp is not None else None
+        for name in records(i) if names is None else names:
+            members.setdefault(name, []).append(i)
+
+    version_ctx = _version_globals(data)
+    folder = shard_dir(data)
+
+    for name, indexes in members.items():
+        fps = [sources[i][0] for i in indexes]
+        # render a page when a source of its versions changed, or its templates, or it's gone
+        fmts = []
+        for fmt, c in compiled.items():
+            page = fmt_states[fmt]["pages"].get(name)
+            if (
+                None in fps
+                or name not in shards
+                or not page
+                or page[2] != fps
+                or fmt_states[fmt].get("template") != c["hash"]
+                or not Path(page[0]).exists()
+            ):
+                fmts.append(fmt)
+        if not fmts:
+            continue
+
+        shard = [record for i in reversed(indexes) for record in records(i).get(name, [])]
+        keys = [key for key, _ in shard]
+        versions = sorted((ver["version_number"], ver["date"]) for _, ver in shard)
+        shards[name] = {
+            "name": name,
+            "oldest": versions[0][0],
+            "newest": versions[-1][0],
+            "count": len(shard),
+            "date": versions[-1][1],
+        }
 
-    return output
+        block_file = store_dir(data) / SHARD_CACHE / f"{name}.json"
+        block_cache = _load_json(block_file) or {}
+        for fmt in fmts:
+            c = compiled[fmt]
+            cached = block_cache.get(fmt) or {}
+            blocks = cached.get("blocks", {}) if cached.get("template") == c["hash"] else {}
+            with span("render", items=len(shard)):
+                misses = _render_blocks(c, blocks, shard, version_ctx)
+            block_cache[fmt] = {"template": c["hash"], "blocks": {key: blocks[key] for key in keys}}
+
+            path = folder / (name + c["ext"])
+            shard_ctx = dict(version_ctx, shard=dict(shards[name], index=f"../{targets[fmt].name}"))
+            head, foot = c["shard_head"](shard_ctx), c["shard_foot"](shard_ctx)
+            digest = _digest(c["hash"], head, foot, *keys)
+            page = fmt_states[fmt]["pages"].get(name)
+            if not page or page[:2] != [str(path), digest] or not path.exists():
+                with span("file_write", items=len(keys)):
+                    _write_document(path, head, keys, blocks, c["sep"], foot, buffer_size)
+                log.info(f"RENDER_CACHE: {len(keys) - misses} hits, {misses} misses, {path} written.")
+                written = True
+            fmt_states[fmt]["pages"][name] = [str(path), digest, fps]
+
+        block_file.parent.mkdir(parents=True, exist_ok=True)
+        block_file.write_text(json.dumps(block_cache), encoding="utf-8")
+
+    # version lines no longer in the store
+    for name in [n for n in shards if n not in members]:
+        for fmt_state in fmt_states.values():
+            page = fmt_state["pages"].pop(name, None)
+            if page:
+                Path(page[0]).unlink(missing_ok=True)
+        (store_dir(data) / SHARD_CACHE / f"{name}.json").unlink(missing_ok=True)
+        del shards[name]
+        log.info(f"RENDER_CACHE: {name} pages removed.")
+        written = True
+
+    # the index pages are always rendered, they're one line per shard
+    newest = records(len(sources) - 1) if sources else {}
+    latest = next(iter(newest.values()))[0][1] if newest else None
+    ctx = _doc_context(data, manifest["doc_parts"]["futures"], latest)
+    listed = sorted(shards.values(), key=lambda s: s["newest"][:depth], reverse=True)
+    for fmt, c in compiled.items():
+        target = targets[fmt]
+        text = c["index"](dict(ctx, shards=[dict(s, link=f"{folder.name}/{s['name']}{c['ext']}") for s in listed]))
+        digest = _digest(c["hash"], text)
+        fmt_states[fmt]["template"] = c["hash"]
+        if fmt_states[fmt].get("index") == digest and target.exists():
+            continue
+        with span("file_write"):
+            _write_document(target, text, [], {}, "", "", buffer_size)
+        fmt_states[fmt]["index"] = digest
+        log.info(f"RENDER_CACHE: {target} written.")
+        written = True
+
+    sources_state = {}
+    for name, indexes in members.items():
+        for i in indexes:
+            if sources[i][0] is not None:
+                sources_state.setdefault(sources[i][0], []).append(name)
+    state.update(depth=depth, sources=sources_state, shards=shards)
+    state["formats"] = dict(state.get("formats", {}), **fmt_states)
+    state_file.parent.mkdir(parents=True, exist_ok=True)
+    state_file.write_text(json.dumps(state), encoding="utf-8")
+
+    if not written:
+        log.info(f"RENDER_CACHE: {', '.join(str(t) for t in targets.values())} unchanged.")
+    return written
+
+
+def build_report(data: dict, fmt: str = "md") -> str:
+    """
+    Builds a changelog report based on the provided data and configuration.
+
+    Prefer write_report for large stores, this joins every chunk of
+    render_report into one string.
+
+    :param data: the running configuration
+    :param fmt: the output format
+    :return: a string containing the formatted changelog report
+    """
+    return "".join(render_report(data, fmt))
@@ -0,0 +1,286 @@
+# write-ahead journal for collect_changelogs.
+#
+# A collect touches glog.json, the log store and every artifact it read.
+# To keep those in step, everything is gathered into one transaction and
+# committed in this order:
+#
+#   1. the journal is written as "pending", listing every staged file
+#   2. each output is written once to "<target>.stage" and all are fsynced
+#   3. the journal is flipped to "committed" (the commit point)
+#   4. stages are renamed over their targets, queued sqlite records are
+#      inserted (idempotently), artifacts are removed
+#   5. the journal is deleted
+#
+# recover() runs at start up: a pending journal is rolled back (stages
+# deleted, nothing changed), a committed one is rolled forward.
+#
+# Only one process collects at a time. collect_lease() holds an OS lock on
+# DIR_OUTPUT/.glog-collect.lock for the whole collect, from the artifact
+# scan to the commit, and recover() leaves a journal alone while another
+# process holds the lease (that collect is alive, not interrupted). The OS
+# drops the lock when its process dies, so a crashed collect never blocks
+# the next one. Artifact writers never take the lease.
+
+import contextlib
+import json
+import os
+import socket
+import time
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # windows
+    fcntl = None
+    import msvcrt
+
+try:
+    from instrument import log
+except ImportError:
+    from .instrument import log
+
+JOURNAL = ".glog-journal.json"
+REMOVED = "INGEST: {} archived artifacts removed."
+STAGE_SUFFIX = ".stage"
+LEASE = ".glog-collect.lock"
+
+
+def journal_path(data: dict) -> Path:
+    """
+    Returns the journal file location, inside paths.DIR_OUTPUT.
+
+    :param data: The running configuration
+    :return: A Path to the journal
+    """
+    return Path(data["paths"]["DIR_OUTPUT"]) / JOURNAL
+
+
+def _try_lock(fd: int) -> bool:
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+@contextlib.contextmanager
+def file_lock(target, wait: float, busy: str):
+    """
+    Holds an OS lock on a file for the enclosed block.
+
+    The lock file itself is never removed, only locked. The OS drops the
+    lock when its process dies.
+
+    :param target: The lock file, created when missing
+    :param wait: Seconds to wait for another process holding it
+    :param busy: The TimeoutError message when it stays taken
+    :return: A context manager giving the lock file's descriptor
+    """
+    deadline = time.monotonic() + wait
+    fd = os.open(target, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        while not _try_lock(fd):
+            if time.monotonic() >= deadline:
+                raise TimeoutError(busy)
+            time.sleep(0.05)
+        yield fd
+    finally:
+        os.close(fd)
+
+
+@contextlib.contextmanager
+def collect_lease(data: dict, wait: float = None):
+    """
+    Holds the collect lease of DIR_OUTPUT for the enclosed block.
+
+    :param data: The running configuration
+    :param wait: Seconds to wait for another collect, app.collect_lease_wait
+        (default 30) when None
+    :return: A context manager, raises TimeoutError when the lease stays taken
+    """
+    if wait is None:
+        wait = data["app"].get("collect_lease_wait", 30)
+    target = Path(data["paths"]["DIR_OUTPUT"]) / LEASE
+
+    with file_lock(target, wait, f"JOURNAL: another collect holds {target}") as fd:
+        # who holds it, for anyone looking at a stuck collect
+        os.ftruncate(fd, 0)
+        os.write(fd, f"{socket.gethostname()} {os.getpid()} {time.time():.0f}\n".encode())
+        yield
+
+
+def begin() -> dict:
+    """
+    Starts an empty transaction.
+
+    :return: A transaction dict for stage() and remove()
+    """
+    return {"writes": {}, "records": [], "removes": []}
+
+
+def stage(txn: dict, target, text: str) -> None:
+    """
+    Queues the full new content of a file. The last call for a target wins,
+    so every file is written exactly once at commit.
+
+    :param txn: The transaction from begin()
+    :param target: The file to replace
+    :param text: Its new content
+    :return: None
+    """
+    txn["writes"][str(target)] = text
+
+
+def remove(txn: dict, folder, names: list, message: str = REMOVED) -> None:
+    """
+    Queues files to delete once the transaction is committed.
+
+    :param txn: The transaction from begin()
+    :param folder: The folder holding the files
+    :param names: File names inside folder
+    :param message: Logged once they're gone, "{}" is how many were removed
+    :return: None
+    """
+    txn["removes"].append({"folder": str(folder), "names": list(names), "message": message})
+
+
+def _fsync_dir(folder) -> None:
+    # not every platform can open a directory (windows), skip quietly there
+    try:
+        fd = os.open(folder, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _write_journal(target: Path, journal: dict) -> None:
+    tmp = target.with_name(target.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as fs:
+        fs.write(json.dumps(journal, indent=4))
+        fs.flush()
+        os.fsync(fs.fileno())
+    os.replace(tmp, target)
+    _fsync_dir(target.parent)
+
+
+def _apply(journal: dict) -> None:
+    # imported here, recover() runs on every start up and rarely gets this far
+    try:
+        from ingest import remove_artifacts
+        from sqlstore import apply_journal_record
+    except ImportError:
+        from .ingest import remove_artifacts
+        from .sqlstore import apply_journal_record
+
+    folders = set()
+    for target in journal["writes"]:
+        staged = target + STAGE_SUFFIX
+        if os.path.exists(staged):
+            os.replace(staged, target)
+        folders.add(os.path.dirname(target))
+
+    for entry in journal.get("records", []):
+        apply_journal_record(entry)
+
+    for entry in journal["removes"]:
+        removed = remove_artifacts(entry["folder"], entry["names"])
+        # journals from before the message was kept removed artifacts
+        log.info(entry.get("message", REMOVED).format(removed))
+        folders.add(entry["folder"])
+
+    for folder in folders:
+        _fsync_dir(folder)
+
+
+def commit(data: dict, txn: dict) -> None:
+    """
+    Commits a transaction, see the module notes for the steps.
+
+    :param data: The running configuration
+    :param txn: The transaction from begin()
+    :return: None
+    """
+    target = journal_path(data)
+    journal = {
+        "state": "pending",
+        "writes": sorted(txn["writes"]),
+        "records": txn["records"],
+        "removes": txn["removes"],
+    }
+    _write_journal(target, journal)
+
+    # stage every output, then fsync them as one group
+    handles = []
+    try:
+        for path, text in txn["writes"].items():
+            fs = open(path + STAGE_SUFFIX, "w", encoding="utf-8")
+            handles.append(fs)
+            fs.write(text)
+        for fs in handles:
+            fs.flush()
+            os.fsync(fs.fileno())
+    finally:
+        for fs in handles:
+            fs.close()
+
+    journal["state"] = "committed"
+    _write_journal(target, journal)
+
+    _apply(journal)
+    target.unlink()
+    log.info(f"JOURNAL: committed {len(journal['writes'])} files, {len(journal['records'])} records.")
+
+
+def recover(data: dict) -> bool:
+    """
+    Finishes or undoes a collect that was interrupted.
+
+    :param data: The running configuration
+    :return: True when files were rolled forward (and config should be reloaded)
+    """
+    if "DIR_OUTPUT" not in data.get("paths", {}):
+        return False
+
+    target = journal_path(data)
+    if not target.exists():
+        return False
+
+    try:
+        with collect_lease(data, wait=0):
+            # the collect that wrote it may have finished meanwhile
+            if not target.exists():
+                return False
+            return _recover(target)
+    except TimeoutError:
+        # a live collect owns the journal
+        return False
+
+
+def _recover(target: Path) -> bool:
+    try:
+        journal = json.loads(target.read_text(encoding="utf-8"))
+    except Exception:
+        # the journal itself is only ever swapped in whole, a broken one
+        # means the crash came before anything was staged
+        target.unlink()
+        return False
+
+    rolled_forward = journal.get("state") == "committed"
+    if rolled_forward:
+        _apply(journal)
+        log.warning("JOURNAL: interrupted collect rolled forward.")
+    else:
+        for path in journal.get("writes", []):
+            Path(path + STAGE_SUFFIX).unlink(missing_ok=True)
+        log.warning("JOURNAL: interrupted collect rolled back.")
+
+    target.unlink()
+    return rolled_forward
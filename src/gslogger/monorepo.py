@@ -0,0 +1,205 @@
+# glog --all: collect and generate every glog project under a root.
+#
+# Monorepos keep one glog.json (and ch-logs/) per package. discover_projects
+# walks the tree once, skipping hidden folders, ch-logs and the usual build
+# and environment folders, and run_all hands each project to a process
+# pool, so a slow or broken project neither holds up nor breaks the others:
+#
+#   glog --all              collect and generate everything under .
+#   glog --all packages -g  only generate, under packages/
+#
+# Every project runs in its own worker with its own config, journal
+# recovery and collect lease, and its log is captured rather than
+# interleaved with the others'. The results come back as one summary
+# table (or JSON with --format json) with each project's timings.
+
+import io
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+try:
+    from extras import load_config
+    from instrument import log, setup_logging, span
+    import journal
+except ImportError:
+    from .extras import load_config
+    from .instrument import log, setup_logging, span
+    from . import journal
+
+CONFIG = "glog.json"
+SKIP_DIRS = {"ch-logs", "node_modules", "__pycache__", "site-packages", "venv", "env", "build", "dist"}
+
+
+def discover_projects(root) -> list:
+    """
+    Finds every folder holding a glog.json under root, root included.
+
+    :param root: The folder to search
+    :return: Sorted Paths of the project folders
+    """
+    projects = []
+    for folder, dirs, files in os.walk(root):
+        # pruned in place, so os.walk never descends into them
+        dirs[:] = [d for d in dirs if not d.startswith(".") and d not in SKIP_DIRS]
+        if CONFIG in files:
+            projects.append(Path(folder))
+    return sorted(projects)
+
+
+def _result(folder: str) -> dict:
+    return {"project": folder, "ok": True, "collected": None, "version": None, "written": None,
+            "collect_ms": None, "generate_ms": None, "total_ms": 0.0, "error": None, "log": ""}
+
+
+def run_project(folder: str, collect, generate, level: str = "info") -> dict:
+    """
+    Collects and/or generates one project. Runs in a pool worker.
+
+    :param folder: The project folder
+    :param collect: collect_changelogs(data) -> bool, or None to skip collecting
+    :param generate: write_report(data) -> bool, or None to skip generating
+    :param level: The log level for the captured log
+    :return: {"project", "ok", "collected", "version", "written", "collect_ms",
+        "generate_ms", "total_ms", "error", "log"}
+    """
+    buffer, errors = io.StringIO(), io.StringIO()
+    setup_logging(level, stream=buffer)
+    # collect logs its failures rather than raising them
+    failures = logging.StreamHandler(errors)
+    failures.setLevel(logging.ERROR)
+    log.addHandler(failures)
+    result = _result(folder)
+
+    started = time.perf_counter()
+    try:
+        os.chdir(folder)
+        config_file = Path(folder) / CONFIG
+        data = load_config(config_file)
+        if journal.recover(data):
+            data = load_config(config_file)
+
+        if collect is not None:
+            mark = time.perf_counter()
+            result["collected"] = collect(data)
+            result["collect_ms"] = round((time.perf_counter() - mark) * 1000, 1)
+
+        if generate is not None:
+            mark = time.perf_counter()
+            result["written"] = generate(data)
+            result["generate_ms"] = round((time.perf_counter() - mark) * 1000, 1)
+
+        result["version"] = "v" + ".".join(map(str, data["app"]["version_number"]))
+    except Exception as e:
+        log.error(f"{type(e).__name__}: {e}")
+    finally:
+        log.removeHandler(failures)
+
+    if errors.getvalue():
+        result.update(ok=False, error=errors.getvalue().splitlines()[0])
+
+    result["total_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    result["log"] = buffer.getvalue()
+    return result
+
+
+def _cell(value, yes: str, no: str) -> str:
+    return "-" if value is None else (yes if value else no)
+
+
+def format_summary(results: list, wall: float, fmt: str = "md") -> str:
+    """
+    Formats run_all results as a markdown table, or JSON.
+
+    :param results: run_project results
+    :param wall: Seconds the whole run took
+    :param fmt: "md" or "json"
+    :return: The formatted text
+    """
+    if fmt == "json":
+        rows = [{k: v for k, v in r.items() if k != "log"} for r in results]
+        return json.dumps({"wall_ms": round(wall * 1000, 1), "projects": rows}, indent=4)
+
+    header = ["project", "status", "collect", "generate", "version", "collect ms", "generate ms", "total ms"]
+    rows = [
+        [
+            r["project"],
+            "ok" if r["ok"] else "FAILED",
+            _cell(r["collected"], "collected", "nothing"),
+            _cell(r["written"], "written", "unchanged"),
+            r["version"] or "-",
+            "-" if r["collect_ms"] is None else f"{r['collect_ms']:.1f}",
+            "-" if r["generate_ms"] is None else f"{r['generate_ms']:.1f}",
+            f"{r['total_ms']:.1f}",
+        ]
+        for r in results
+    ]
+    widths = [max(len(str(row[i])) for row in [header] + rows) for i in range(len(header))]
+
+    def line(cells):
+        return "| " + " | ".join(str(c).ljust(w) for c, w in zip(cells, widths)) + " |"
+
+    lines = [line(header), "|" + "|".join("-" * (w + 2) for w in widths) + "|"]
+    lines += [line(row) for row in rows]
+
+    failed = sum(1 for r in results if not r["ok"])
+    busy = sum(r["total_ms"] for r in results) / 1000
+    lines.append("")
+    lines.append(
+        f"{len(results)} projects, {sum(1 for r in results if r['collected'])} collected, "
+        f"{sum(1 for r in results if r['written'])} written, {failed} failed, "
+        f"{wall:.2f}s ({busy:.2f}s of project time)"
+    )
+    for r in results:
+        if r["error"]:
+            lines.append(f"{r['project']}: {r['error']}")
+    return "\n".join(lines)
+
+
+def run_all(root, collect, generate, jobs: int = None, fmt: str = "md") -> bool:
+    """
+    Runs every project under root on a process pool and prints the summary.
+
+    The commands are passed in by glog, so this module doesn't import it.
+
+    :param root: The folder to search for projects
+    :param collect: collect_changelogs(data) -> bool, or None to skip collecting
+    :param generate: write_report(data) -> bool, or None to skip generating
+    :param jobs: Worker processes, defaults to the CPU count
+    :param fmt: The summary format, "md" or "json"
+    :return: True when every project succeeded
+    """
+    root = Path(root).resolve()
+    with span("discover"):
+        projects = discover_projects(root)
+    if not projects:
+        log.info(f"ALL: no {CONFIG} found under {root}")
+        return True
+
+    level = "debug" if log.isEnabledFor(logging.DEBUG) else "info"
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(projects)))
+    log.info(f"ALL: {len(projects)} projects under {root}, {jobs} workers")
+
+    started = time.perf_counter()
+    results = []
+    with span("projects", items=len(projects)), ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(run_project, str(p), collect, generate, level): p for p in projects}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                # the worker itself died, e.g. killed
+                result = dict(_result(str(futures[future])), ok=False, error=f"{type(e).__name__}: {e}")
+            if result["log"] and (level == "debug" or not result["ok"]):
+                log.info(f"ALL: {result['project']}:\n{result['log'].rstrip()}")
+            results.append(result)
+    wall = time.perf_counter() - started
+
+    for result in results:
+        result["project"] = Path(result["project"]).relative_to(root).as_posix() or "."
+    results.sort(key=lambda r: r["project"])
+    print(format_summary(results, wall, fmt))
+    return all(r["ok"] for r in results)
@@ -0,0 +1,550 @@
+# glog --query: filter collected versions without rendering the changelog.
+#
+# Filters: a version range, artifact types, a date range and a contributor.
+#
+# With the segmented store, queries go through a persisted index kept in
+# store/query/, split up so that a query reads only the files its filters
+# point at. Versions are numbered by their position in the store (which is
+# version order):
+#
+#   ch-logs/store/query/
+#   ├── meta.json          # each segment seen (see below) with its first and
+#   │                      #   last version and dates, every type and
+#   │                      #   contributor name indexed
+#   ├── s000012.json       # one segment's records: version keys, locs
+#   │                      #   (byte offsets, lines in archived segments,
+#   │                      #   see archive.py) and release dates
+#   ├── t-<hash>.json      # an artifact type -> sorted positions
+#   └── c-<hash>.json      # a contributor -> sorted positions
+#
+# A version range reads the segment files at its two ends, a date range
+# those of the segments whose dates overlap it, a type or a contributor its
+# own postings, and the matches read the segment files holding them.
+#
+# The index remembers each segment it has seen: its name, line count and
+# size, and for a plain segment a hash of its first line and the offset
+# and hash of its last. New lines appended by collect are indexed on the
+# next query, rewriting only the files they touch, and a segment archived
+# by --compact only has its locs renumbered. Anything else (an out-of-order insert, an import, a
+# segment rewritten by hand) rebuilds it. The sqlite engine answers from
+# its own table indexes.
+
+import contextlib
+import hashlib
+import json
+import os
+from bisect import bisect_left, bisect_right, insort
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # windows, index updates are not serialized
+    fcntl = None
+
+try:
+    from extras import contributor_names
+    from instrument import log
+    from store import is_archived, load_manifest, store_dir, open_db
+    from jin import fmt_version
+    import sqlstore
+except ImportError:
+    from .extras import contributor_names
+    from .instrument import log
+    from .store import is_archived, load_manifest, store_dir, open_db
+    from .jin import fmt_version
+    from . import sqlstore
+
+QUERY_DIR = "query"
+# the single file index of earlier versions, removed by the first update
+QUERY_INDEX = "query_index.json"
+META = "meta.json"
+LOCK = "query.lock"
+INDEX_FORMAT = 3
+
+
+def parse_version(text: str) -> list:
+    """
+    Parses "v1.2.3" or "1.2.3" into [1, 2, 3].
+
+    :param text: A version string
+    :return: The version as a list of ints
+    """
+    try:
+        parts = [int(p) for p in text.strip().lstrip("vV").split(".")]
+    except ValueError:
+        parts = []
+    if len(parts) != 3:
+        raise ValueError(f"QUERY: {text} is not a version like v0.2.40")
+    return parts
+
+
+def parse_range(text: str) -> tuple:
+    """
+    Parses a "low..high" range where either end may be left out.
+
+    A single value with no ".." matches just that value.
+
+    :param text: The range
+    :return: (low, high) strings, None for an open end
+    """
+    if ".." not in text:
+        return text, text
+    low, high = text.split("..", 1)
+    return low or None, high or None
+
+
+def _empty_meta() -> dict:
+    return {"format": INDEX_FORMAT, "segments": [], "types": [], "contributors": []}
+
+
+def _archive():
+    try:
+        import archive
+    except ImportError:
+        from . import archive
+    return archive
+
+
+def _line_hash(raw: bytes) -> str:
+    return hashlib.blake2b(raw, digest_size=8).hexdigest()
+
+
+def _query_dir(data: dict) -> Path:
+    return store_dir(data) / QUERY_DIR
+
+
+def _read_json(target: Path):
+    try:
+        return json.loads(target.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(target: Path, value) -> None:
+    stage = target.with_name(target.name + f".{os.getpid()}.tmp")
+    stage.write_text(json.dumps(value), encoding="utf-8")
+    os.replace(stage, target)
+
+
+@contextlib.contextmanager
+def _locked(folder: Path):
+    folder.mkdir(parents=True, exist_ok=True)
+    fd = os.open(folder / LOCK, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
+
+
+class Index:
+    """
+    The query index, loaded one file at a time.
+    """
+
+    def __init__(self, folder: Path, meta: dict = None):
+        self.folder = folder
+        self.meta = meta or _empty_meta()
+        self.shards = {}
+        self.postings = {}
+        self.dirty = set()
+        # positions below this are indexed, an update only appends above it
+        self.indexed = self.count
+
+    @property
+    def count(self) -> int:
+        return sum(s["count"] for s in self.meta["segments"])
+
+    def start(self, seg_no: int) -> int:
+        """
+        :param seg_no: A segment number
+        :return: The position of its first record
+        """
+        return sum(s["count"] for s in self.meta["segments"][:seg_no])
+
+    def _file(self, key: tuple) -> Path:
+        if key[0] == "segment":
+            return self.folder / f"s{key[1]:06d}.json"
+        # type and contributor names aren't always file names
+        return self.folder / f"{key[0][0]}-{_line_hash(key[1].encode('utf-8'))}.json"
+
+    def segment(self, seg_no: int) -> dict:
+        """
+        :param seg_no: A segment number
+        :return: {"keys", "locs", "dates"} of its records, in store order
+        """
+        if seg_no not in self.shards:
+            shard = _read_json(self._file(("segment", seg_no)))
+            self.shards[seg_no] = shard or {"keys": [], "locs": [], "dates": []}
+        return self.shards[seg_no]
+
+    def positions(self, table: str, name: str) -> list:
+        """
+        :param table: "types" or "contributors"
+        :param name: An artifact type or a contributor
+        :return: The sorted positions of the records holding it
+        """
+        key = (table, name)
+        if key not in self.postings:
+            found = _read_json(self._file(key)) or {}
+            self.postings[key] = found.get(name, [])
+        return self.postings[key]
+
+    def add(self, table: str, name: str, pos: int) -> None:
+        key = (table, name)
+        found = self.positions(table, name)
+        if key not in self.dirty:
+            # left over from an update that didn't get to write the meta
+            del found[bisect_left(found, self.indexed) :]
+            self.dirty.add(key)
+        if not _contains(self.meta[table], name):
+            insort(self.meta[table], name)
+        found.append(pos)
+
+    def save(self) -> None:
+        """
+        Writes the changed files, the meta last: until it names the new
+        records, readers don't look for them.
+
+        :return: None
+        """
+        self.folder.mkdir(parents=True, exist_ok=True)
+        for key in self.dirty:
+            value = self.shards[key[1]] if key[0] == "segment" else {key[1]: self.postings[key]}
+            _write_json(self._file(key), value)
+        _write_json(self.folder / META, self.meta)
+        self.dirty.clear()
+        self.indexed = self.count
+
+
+def _segment_lines(folder: Path, name: str):
+    # (loc, raw line) of each record, oldest first
+    if is_archived(name):
+        with _archive().Archive(folder, name) as arc:
+            yield from enumerate(arc.lines())
+        return
+    with open(folder / name, "rb") as fs:
+        offset = 0
+        for raw in fs:
+            if raw.strip():
+                yield offset, raw
+            offset += len(raw)
+
+
+def _index_lines(index: Index, folder: Path, seg_no: int, name: str, skip: int) -> dict:
+    """
+    Indexes the lines of one segment after the first `skip`, returns what
+    the segment looked like (see _unchanged).
+    """
+    start = index.start(seg_no)
+    shard = index.segment(seg_no)
+    for column in shard.values():
+        del column[skip:]
+    index.dirty.add(("segment", seg_no))
+
+    state = {"name": name, "count": 0, "size": (folder / name).stat().st_size}
+    for loc, raw in _segment_lines(folder, name):
+        if not is_archived(name):
+            if not state["count"]:
+                state["head"] = _line_hash(raw)
+            state["tail_at"], state["tail"] = loc, _line_hash(raw)
+        if state["count"] >= skip:
+            record = json.loads(raw)
+            pos = start + state["count"]
+            shard["keys"].append(record["version_number"])
+            shard["locs"].append(loc)
+            shard["dates"].append(record.get("date", ""))
+            for a_type in record.get("logs", {}):
+                index.add("types", a_type, pos)
+            for name_ in contributor_names(record):
+                index.add("contributors", name_, pos)
+        state["count"] += 1
+    if shard["keys"]:
+        # what a range has to overlap for the segment's shard to be read
+        state["first"], state["last"] = shard["keys"][0], shard["keys"][-1]
+        state["dates"] = [min(shard["dates"]), max(shard["dates"])]
+    return state
+
+
+def _unchanged(folder: Path, state: dict, segment: dict, last: bool) -> bool:
+    """
+    Tells whether a segment still holds every line the index saw in it.
+
+    Archives are never rewritten in place. A plain segment has to start
+    with the same line and still have its last seen line where it was;
+    only the last one may have grown, and only past that line.
+    """
+    name = segment["name"]
+    if state["count"] == 0:
+        return last
+    try:
+        size = (folder / name).stat().st_size
+    except FileNotFoundError:
+        return False
+    if is_archived(name):
+        return state["count"] == segment["count"] and state["size"] == size
+    if last:
+        if segment["count"] < state["count"] or size < state["size"]:
+            return False
+    elif segment["count"] != state["count"] or size != state["size"]:
+        return False
+    with open(folder / name, "rb") as fs:
+        head = fs.readline()
+        fs.seek(state["tail_at"])
+        tail = fs.readline()
+    return _line_hash(head) == state["head"] and _line_hash(tail) == state["tail"]
+
+
+def _follow_archive(index: Index, folder: Path, seg_no: int, segment: dict) -> bool:
+    """
+    Renumbers the locs of a segment archived since the index was written,
+    False when it was renamed any other way.
+    """
+    state = index.meta["segments"][seg_no]
+    if is_archived(state["name"]) or not is_archived(segment["name"]) or state["count"] != segment["count"]:
+        return False
+    # compact copies the lines in the same order, a record's loc is now its line
+    index.segment(seg_no)["locs"] = list(range(state["count"]))
+    index.dirty.add(("segment", seg_no))
+    kept = {k: state[k] for k in ("first", "last", "dates") if k in state}
+    index.meta["segments"][seg_no] = dict(
+        kept, name=segment["name"], count=segment["count"], size=(folder / segment["name"]).stat().st_size
+    )
+    return True
+
+
+def load_index(data: dict, manifest: dict = None) -> Index:
+    """
+    Opens the query index of the segmented store, bringing it up to date.
+
+    Only the meta is read here, and whatever new records touch; a query
+    then reads the files its filters point at.
+
+    :param data: The running configuration
+    :param manifest: An already loaded manifest
+    :return: The index
+    """
+    manifest = manifest or load_manifest(data)
+    folder = store_dir(data)
+    segments = manifest["segments"]
+
+    with _locked(_query_dir(data)):
+        meta = _read_json(_query_dir(data) / META)
+        if meta is None or meta.get("format") != INDEX_FORMAT:
+            meta = None
+        index = Index(_query_dir(data), meta)
+
+        # only ever appended to at the end? then pick up where the index left off
+        seen = index.meta["segments"] if meta is not None else None
+        if seen is not None and len(seen) <= len(segments):
+            for seg_no, state in enumerate(seen):
+                segment = segments[seg_no]
+                if state["name"] != segment["name"]:
+                    if not _follow_archive(index, folder, seg_no, segment):
+                        seen = None
+                        break
+                elif not _unchanged(folder, state, segment, seg_no == len(seen) - 1):
+                    seen = None
+                    break
+        else:
+            seen = None
+        if seen is None:
+            for old in index.folder.glob("*.json"):
+                old.unlink()
+            # the single file index of earlier versions
+            (folder / QUERY_INDEX).unlink(missing_ok=True)
+            index = Index(index.folder)
+            seen = index.meta["segments"]
+
+        if [s["count"] for s in seen] == [s["count"] for s in segments] and not index.dirty:
+            return index
+
+        for seg_no in range(max(len(seen) - 1, 0), len(segments)):
+            skip = seen[seg_no]["count"] if seg_no < len(seen) else 0
+            if seg_no == len(seen):
+                seen.append({"name": segments[seg_no]["name"], "count": 0})
+            seen[seg_no] = _index_lines(index, folder, seg_no, segments[seg_no]["name"], skip)
+        index.save()
+    log.info(f"QUERY: index updated, {index.count} versions.")
+    return index
+
+
+def _contains(sorted_list: list, value) -> bool:
+    i = bisect_left(sorted_list, value)
+    return i < len(sorted_list) and sorted_list[i] == value
+
+
+def _postings(index: Index, table: str, wanted) -> list:
+    hits = set()
+    for name in wanted:
+        hits.update(index.positions(table, name))
+    return sorted(hits)
+
+
+def _match_contributors(names, contributor: str) -> list:
+    needle = contributor.lower()
+    return [n for n in names if needle in n.lower()]
+
+
+def _version_bound(index: Index, version: list, after: bool) -> int:
+    # the position a version range starts (or ends after) at, reading the
+    # one segment shard it falls in
+    for seg_no, state in enumerate(index.meta["segments"]):
+        if state["count"] and (state["last"] > version if after else state["last"] >= version):
+            keys = index.segment(seg_no)["keys"]
+            return index.start(seg_no) + (bisect_right if after else bisect_left)(keys, version)
+    return index.count
+
+
+def _date_positions(index: Index, date_range: tuple) -> list:
+    # only segments whose dates overlap the range are read
+    low, high = date_range
+    found, start = [], 0
+    for seg_no, state in enumerate(index.meta["segments"]):
+        first, last = state.get("dates") or (None, None)
+        if state["count"] and (not low or last >= low) and (not high or first <= high):
+            for n, day in enumerate(index.segment(seg_no)["dates"]):
+                if (not low or day >= low) and (not high or day <= high):
+                    found.append(start + n)
+        start += state["count"]
+    return found
+
+
+def _segment_positions(index: Index, version_range, date_range, types, contributor) -> list:
+    low, high = version_range
+    lo = _version_bound(index, low, False) if low else 0
+    hi = _version_bound(index, high, True) if high else index.count
+
+    # every filter as a sorted candidate list, the smallest one drives the scan
+    candidates = [range(lo, hi)]
+    if date_range != (None, None):
+        candidates.append(_date_positions(index, date_range))
+    if types:
+        candidates.append(_postings(index, "types", types))
+    if contributor:
+        names = _match_contributors(index.meta["contributors"], contributor)
+        candidates.append(_postings(index, "contributors", names))
+
+    candidates.sort(key=len)
+    driver, others = candidates[0], candidates[1:]
+    return [
+        p
+        for p in driver
+        if all((p in o) if isinstance(o, range) else _contains(o, p) for o in others)
+    ]
+
+
+def _read_positions(data: dict, manifest: dict, index: Index, positions: list):
+    folder = store_dir(data)
+    names = [s["name"] for s in manifest["segments"]]
+    starts = [index.start(seg_no) for seg_no in range(len(names))]
+    handles = {}
+    try:
+        # newest first, like the changelog
+        for pos in reversed(positions):
+            seg_no = bisect_right(starts, pos) - 1
+            loc = index.segment(seg_no)["locs"][pos - starts[seg_no]]
+            if seg_no not in handles:
+                if is_archived(names[seg_no]):
+                    # decoded a block at a time, only the blocks asked for
+                    handles[seg_no] = _archive().Archive(folder, names[seg_no])
+                else:
+                    handles[seg_no] = open(folder / names[seg_no], "rb")
+            fs = handles[seg_no]
+            if is_archived(names[seg_no]):
+                yield fs.line(loc)
+            else:
+                fs.seek(loc)
+                yield fs.readline()
+    finally:
+        for fs in handles.values():
+            fs.close()
+
+
+def _sqlite_lines(data, version_range, date_range, types, contributor):
+    where, params = [], []
+    if version_range[0]:
+        where.append("(v.major, v.minor, v.patch) >= (?, ?, ?)")
+        params.extend(version_range[0])
+    if version_range[1]:
+        where.append("(v.major, v.minor, v.patch) <= (?, ?, ?)")
+        params.extend(version_range[1])
+    if date_range[0]:
+        where.append("v.date >= ?")
+        params.append(date_range[0])
+    if date_range[1]:
+        where.append("v.date <= ?")
+        params.append(date_range[1])
+    if types:
+        marks = ", ".join("?" for _ in types)
+        where.append(
+            f"EXISTS (SELECT 1 FROM entries e WHERE e.version_id = v.id AND e.type IN ({marks}))"
+        )
+        params.extend(types)
+    if contributor:
+        where.append(
+            "EXISTS (SELECT 1 FROM contributors c WHERE c.version_id = v.id AND c.contributor LIKE ?)"
+        )
+        params.append(f"%{contributor}%")
+
+    con = open_db(data)
+    try:
+        yield from sqlstore.iter_raw_versions(con, " AND ".join(where), tuple(params))
+    finally:
+        con.close()
+
+
+def run_query(
+    data: dict,
+    versions: str = None,
+    types: list = None,
+    dates: str = None,
+    contributor: str = None,
+) -> list:
+    """
+    Finds the collected versions matching every given filter, newest first.
+
+    When types are given, each returned record only keeps those sections.
+
+    :param data: The running configuration
+    :param versions: A version range, e.g. "v0.2.40..v0.2.72"
+    :param types: Artifact types from CHTYPES, e.g. ["FIXED"]
+    :param dates: A date range, e.g. "2024-09-01..2024-09-30"
+    :param contributor: Part of a contributor's name or email
+    :return: A list of version records
+    """
+    version_range = (None, None)
+    if versions:
+        version_range = tuple(parse_version(v) if v else None for v in parse_range(versions))
+    date_range = parse_range(dates) if dates else (None, None)
+    types = [t.upper() for t in types] if types else []
+
+    manifest = load_manifest(data)
+    if manifest.get("engine") == "sqlite":
+        lines = _sqlite_lines(data, version_range, date_range, types, contributor)
+    else:
+        index = load_index(data, manifest)
+        positions = _segment_positions(index, version_range, date_range, types, contributor)
+        lines = _read_positions(data, manifest, index, positions)
+
+    results = []
+    for line in lines:
+        record = json.loads(line)
+        if types:
+            record["logs"] = {t: m for t, m in record["logs"].items() if t in types}
+        results.append(record)
+    return results
+
+
+def format_results(records: list, fmt: str = "md") -> str:
+    """
+    Formats query results as markdown (the changelog's version blocks) or JSON.
+
+    :param records: Records returned by run_query
+    :param fmt: "md" or "json"
+    :return: The formatted text
+    """
+    if fmt == "json":
+        return json.dumps(records, indent=4, sort_keys=True)
+    return "".join(fmt_version(r) for r in records)
@@ -0,0 +1,317 @@
+# glog --search: full-text search over collected entries.
+#
+# An inverted index kept next to the store, from every token of every
+# entry message to the versions and types it appears in:
+#
+#   ch-logs/store/search/
+#   ├── meta.json        # store generation and versions covered, the type
+#   │                    #   of each type number
+#   ├── 666f6f.json      # tokens starting "foo": {"foobar": [0, 2, 72, 3, ...]}
+#   └── ...
+#
+# Tokens are casefolded words of two or more characters. Shards are named
+# by the hex of their tokens' first SHARD_PREFIX characters, so a search
+# term reads one shard, or the few sharing a shorter prefix. Postings are
+# flat [major, minor, patch, type number, ...] runs, sorted.
+#
+# Every search term matches as a prefix ("frob" finds "frobnicator"), and
+# an entry matches when it has all of them. The index finds the versions
+# and types within the version range and types asked for, bisecting the
+# sorted postings. The entries themselves are read back from only the
+# segments holding those versions (store.read_versions).
+#
+# Collect stages the shards a new version touches into its journal, like
+# the dedup index. The index is rebuilt when it doesn't cover the store:
+# a different version count, or a different store generation (an import,
+# see store.load_manifest).
+
+import json
+import os
+import re
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+
+try:
+    from instrument import log, span
+    from journal import stage as stage_file
+except ImportError:
+    from .instrument import log, span
+    from .journal import stage as stage_file
+
+SEARCH_DIR = "search"
+SHARD_PREFIX = 3
+META = "meta.json"
+FORMAT = 1
+TOKEN = re.compile(r"\w{2,}")
+
+
+def tokenize(text: str) -> set:
+    """
+    :param text: An entry message or a search
+    :return: Its distinct casefolded tokens
+    """
+    return set(TOKEN.findall(text.casefold()))
+
+
+def _search_dir(data: dict) -> Path:
+    # glog's DIR_STORE rule, without importing the store
+    if "DIR_STORE" in data["paths"]:
+        return Path(data["paths"]["DIR_STORE"]) / SEARCH_DIR
+    return Path(data["paths"]["DIR_OUTPUT"]) / "store" / SEARCH_DIR
+
+
+def _shard_name(prefix: str) -> str:
+    # hex, so any token is a file name on any file system
+    return prefix.encode("utf-8").hex()
+
+
+class Index:
+    """
+    The inverted index, loaded one shard at a time.
+    """
+
+    def __init__(self, data: dict, meta: dict = None):
+        self.folder = _search_dir(data)
+        self.meta = meta or {"format": FORMAT, "versions": 0, "types": []}
+        self.shards = {}
+        self.dirty = set()
+
+    def _shard(self, name: str) -> dict:
+        if name not in self.shards:
+            try:
+                self.shards[name] = json.loads((self.folder / f"{name}.json").read_text(encoding="utf-8"))
+            except FileNotFoundError:
+                self.shards[name] = {}
+        return self.shards[name]
+
+    def add(self, record: dict, ordered: bool = True) -> None:
+        """
+        Indexes the entries of one version record.
+
+        :param record: A version record
+        :param ordered: Keep postings sorted, rebuild() sorts them once at the end instead
+        :return: None
+        """
+        types = self.meta["types"]
+        posted = set()
+        for a_type, entries in record.get("logs", {}).items():
+            if a_type not in types:
+                types.append(a_type)
+            type_no = types.index(a_type)
+            for entry in entries:
+                posted.update((token, type_no) for token in tokenize(entry))
+
+        posting = list(record["version_number"])
+        for token, type_no in sorted(posted):
+            name = _shard_name(token[:SHARD_PREFIX])
+            runs = self._shard(name).setdefault(token, [])
+            run = posting + [type_no]
+            # in version order, collect only ever appends unless backfilled
+            if ordered and runs[-4:] and runs[-4:] > run:
+                quads = sorted(runs[i : i + 4] for i in range(0, len(runs), 4))
+                quads.append(run)
+                quads.sort()
+                runs[:] = [n for quad in quads for n in quad]
+            else:
+                runs.extend(run)
+            self.dirty.add(name)
+        self.meta["versions"] += 1
+
+    def _texts(self):
+        for name in sorted(self.dirty):
+            yield self.folder / f"{name}.json", json.dumps(self.shards[name], separators=(",", ":"))
+        yield self.folder / META, json.dumps(self.meta)
+
+    def save(self) -> None:
+        """
+        Writes the changed shards and the meta now.
+
+        :return: None
+        """
+        self.folder.mkdir(parents=True, exist_ok=True)
+        for target, text in self._texts():
+            tmp = target.with_name(target.name + ".tmp")
+            tmp.write_text(text, encoding="utf-8")
+            os.replace(tmp, target)
+        self.dirty.clear()
+
+    def stage(self, txn: dict) -> None:
+        """
+        Queues the changed shards and the meta into a collect.
+
+        :param txn: The collect's journal transaction
+        :return: None
+        """
+        self.folder.mkdir(parents=True, exist_ok=True)
+        for target, text in self._texts():
+            stage_file(txn, target, text)
+        self.dirty.clear()
+
+    def postings(self, term: str, low: list = None, high: list = None, type_nos: set = None) -> set:
+        """
+        Returns where the tokens starting with a term are, within a version
+        range and among some types.
+
+        :param term: A casefolded search term
+        :param low: The oldest version to return, None for no limit
+        :param high: The newest version to return, None for no limit
+        :param type_nos: The type numbers to return, None for any
+        :return: {(major, minor, patch, type number), ...}
+        """
+        if len(term) >= SHARD_PREFIX:
+            names = [_shard_name(term[:SHARD_PREFIX])]
+        else:
+            names = [p.stem for p in self.folder.glob(f"{_shard_name(term)}*.json") if p.name != META]
+        found = set()
+        for name in names:
+            for token, runs in self._shard(name).items():
+                if not token.startswith(term):
+                    continue
+                # sorted runs, the version range is bisected rather than filtered
+                quads = range(0, len(runs), 4)
+                start = bisect_left(quads, low, key=lambda i: runs[i : i + 3]) if low else 0
+                end = bisect_right(quads, high, key=lambda i: runs[i : i + 3]) if high else len(quads)
+                for i in quads[start:end]:
+                    if type_nos is None or runs[i + 3] in type_nos:
+                        found.add(tuple(runs[i : i + 4]))
+        return found
+
+
+def rebuild(data: dict, manifest: dict) -> Index:
+    """
+    Indexes the whole history, the first time or when the store was
+    changed without the index (an import, an older glog).
+
+    :param data: The running configuration
+    :param manifest: The store manifest
+    :return: The new index
+    """
+    try:
+        import store
+    except ImportError:
+        from . import store
+
+    index = Index(data)
+    index.meta["generation"] = manifest.get("generation")
+    with span("search_rebuild"):
+        for record in store.iter_versions(data, manifest):
+            index.add(record, ordered=False)
+        # newest first above, every token's postings sorted once here
+        for shard in index.shards.values():
+            for token, runs in shard.items():
+                quads = sorted(runs[i : i + 4] for i in range(0, len(runs), 4))
+                shard[token] = [n for quad in quads for n in quad]
+
+    index.folder.mkdir(parents=True, exist_ok=True)
+    for old in index.folder.glob("*.json"):
+        if old.name != META and old.stem not in index.shards:
+            old.unlink()
+    index.dirty = set(index.shards)
+    index.save()
+    log.info(f"SEARCH: indexed {index.meta['versions']} versions")
+    return index
+
+
+def open_index(data: dict, manifest: dict) -> Index:
+    """
+    Returns the index, building it when it's missing or behind the store.
+
+    :param data: The running configuration
+    :param manifest: The store manifest
+    :return: An Index
+    """
+    try:
+        meta = json.loads((_search_dir(data) / META).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        meta = None
+    if (
+        meta is not None
+        and meta.get("format") == FORMAT
+        and meta["versions"] == manifest["count"]
+        and meta.get("generation") == manifest.get("generation")
+    ):
+        return Index(data, meta)
+    return rebuild(data, manifest)
+
+
+def stage(data: dict, txn: dict, manifest: dict, record: dict) -> None:
+    """
+    Queues the index with one more version into a collect.
+
+    :param data: The running configuration
+    :param txn: The collect's journal transaction
+    :param manifest: The store manifest from before the version was appended
+    :param record: The version record being stored
+    :return: None
+    """
+    index = open_index(data, manifest)
+    index.add(record)
+    index.stage(txn)
+
+
+def search(data: dict, text: str, version_range: tuple = (None, None), types: list = None) -> list:
+    """
+    Finds the entries holding every term of a search, newest first.
+
+    :param data: The running configuration
+    :param text: The search, e.g. "frob crash"
+    :param version_range: (low, high) version numbers, None for an open end
+    :param types: Artifact types to look in, e.g. ["FIXED"]
+    :return: {"version", "date", "type", "message"} dicts
+    """
+    try:
+        from store import load_manifest, read_versions
+    except ImportError:
+        from .store import load_manifest, read_versions
+
+    terms = sorted(tokenize(text), key=len, reverse=True)
+    if not terms:
+        raise ValueError(f"SEARCH: {text!r} has no words to search for")
+
+    manifest = load_manifest(data)
+    index = open_index(data, manifest)
+    low, high = version_range
+    type_nos = {n for n, t in enumerate(index.meta["types"]) if t in types} if types else None
+    with span("search_index"):
+        hits = None
+        # longest first, they have the fewest postings
+        for term in terms:
+            found = index.postings(term, low, high, type_nos)
+            hits = found if hits is None else hits & found
+            if not hits:
+                return []
+
+    results = []
+    wanted = {(h[:3], index.meta["types"][h[3]]) for h in hits}
+    for record in read_versions(data, [h[:3] for h in hits], manifest):
+        version = tuple(record["version_number"])
+        for a_type, entries in record.get("logs", {}).items():
+            if (version, a_type) not in wanted:
+                continue
+            for entry in entries:
+                tokens = tokenize(entry)
+                if all(any(token.startswith(term) for token in tokens) for term in terms):
+                    results.append(
+                        {"version": list(version), "date": record.get("date", ""), "type": a_type, "message": entry}
+                    )
+    return results
+
+
+def format_results(results: list, text: str, fmt: str = "md") -> str:
+    """
+    Formats search results as a markdown list, or JSON.
+
+    :param results: What search() returned
+    :param text: The search
+    :param fmt: "md" or "json"
+    :return: The formatted text
+    """
+    if fmt == "json":
+        return json.dumps(results, indent=4)
+    if not results:
+        return f'Nothing found for "{text}".'
+    lines = [f'## SEARCH: {len(results)} entries for "{text}"', ""]
+    lines += [
+        f"- v{'.'.join(map(str, r['version']))} ({r['date']}) {r['type']}: {r['message']}" for r in results
+    ]
+    return "\n".join(lines)
@@ -0,0 +1,226 @@
+# packed artifact spool, an alternative to one file per artifact.
+#
+# Selected with "artifact_format": "spool" under "app" in glog.json.
+# Artifacts are appended as JSON lines to one file per writer:
+#
+#   ch-logs/spool/
+#   ├── buildhost.spool                        # appended to by buildhost
+#   └── laptop.spool
+#
+# Every record carries an id made of the nanosecond clock, a per process
+# counter, the host and the pid, so records sort in the order they were
+# written and never collide, no matter how many land in one second.
+#
+# collect_changelogs rotates each spool (renames it to
+# "<writer>.<ns>.collecting"), reads the records sequentially and removes
+# the rotated files in its journal transaction. Writers take an flock while
+# appending and re-check that the file they locked is still the live spool,
+# so an append racing a rotation lands in the next spool, not in a file
+# that is about to be deleted.
+#
+# Windows has no flock, and none is needed there: a spool a writer has open
+# can't be renamed. rotate retries for ROTATE_TRIES * ROTATE_WAIT seconds
+# (an append is a single write) and otherwise leaves that spool for the
+# next collect.
+#
+# Loose artifact files are still read by collect in either format.
+
+import itertools
+import json
+import os
+import re
+import socket
+import time
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # windows, an open spool can't be renamed, see rotate
+    fcntl = None
+
+try:
+    from instrument import log
+except ImportError:
+    from .instrument import log
+
+SPOOL_DIR = "spool"
+SPOOL_SUFFIX = ".spool"
+ROTATED_SUFFIX = ".collecting"
+ROTATE_TRIES = 20
+ROTATE_WAIT = 0.05
+
+_COUNTER = itertools.count()
+_LAST_NS = 0
+
+
+def enabled(data: dict) -> bool:
+    """
+    True when new artifacts should go to the spool.
+
+    :param data: The running configuration
+    :return: bool
+    """
+    return data["app"].get("artifact_format", "files") == "spool"
+
+
+def spool_dir(data: dict) -> Path:
+    """
+    Returns the folder holding the spool files, inside paths.DIR_OUTPUT.
+
+    :param data: The running configuration
+    :return: A Path
+    """
+    return Path(data["paths"]["DIR_OUTPUT"]) / SPOOL_DIR
+
+
+def _safe(text: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", text) or "writer"
+
+
+def writer_name(data: dict) -> str:
+    """
+    Names this writer's spool file, app.spool_writer or the host name.
+
+    :param data: The running configuration
+    :return: A file name safe string
+    """
+    return _safe(data["app"].get("spool_writer") or socket.gethostname())
+
+
+def new_id() -> str:
+    """
+    Returns a unique id that sorts after every id this process made before.
+
+    :return: "<ns, 20 digits>-<counter>-<host>-<pid>"
+    """
+    global _LAST_NS
+    # never step back, even if the wall clock does
+    now = max(time.time_ns(), _LAST_NS + 1)
+    _LAST_NS = now
+    return f"{now:020d}-{next(_COUNTER) % 1_000_000:06d}-{_safe(socket.gethostname())}-{os.getpid()}"
+
+
+def _write_all(fd: int, payload: bytes) -> None:
+    view = memoryview(payload)
+    while view:
+        view = view[os.write(fd, view):]
+
+
+def append(data: dict, artifacts: list) -> list:
+    """
+    Appends artifacts to this writer's spool in one write.
+
+    :param data: The running configuration
+    :param artifacts: (date, type, message, contributor) tuples
+    :return: "<spool file>#<id>" for each artifact, in order
+    """
+    folder = spool_dir(data)
+    folder.mkdir(parents=True, exist_ok=True)
+    target = folder / (writer_name(data) + SPOOL_SUFFIX)
+
+    ids, lines = [], []
+    for a_date, a_type, a_msg, a_dev in artifacts:
+        ids.append(new_id())
+        record = {"id": ids[-1], "date": a_date, "type": a_type, "message": a_msg, "contributor": a_dev}
+        lines.append(json.dumps(record, sort_keys=True) + "\n")
+    payload = "".join(lines).encode("utf-8")
+
+    while True:
+        fd = os.open(target, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            # rotated away while we waited for the lock? start a new spool
+            try:
+                live = os.path.samestat(os.fstat(fd), os.stat(target))
+            except FileNotFoundError:
+                live = False
+            if live:
+                _write_all(fd, payload)
+                break
+        finally:
+            os.close(fd)
+
+    log.info(f"SPOOL: {len(ids)} artifacts appended to {target}")
+    return [f"{target}#{i}" for i in ids]
+
+
+def _wait_for_writers(path: Path) -> None:
+    # an append that locked the file before the rename finishes first
+    if fcntl is None:
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+    finally:
+        os.close(fd)
+
+
+def rotate(data: dict) -> list:
+    """
+    Moves every live spool aside for collecting.
+
+    Spools rotated by an earlier collect that never finished are picked up
+    again, they were not removed so they were not stored.
+
+    :param data: The running configuration
+    :return: Sorted names of the rotated files in spool_dir
+    """
+    folder = spool_dir(data)
+    try:
+        names = sorted(os.listdir(folder))
+    except FileNotFoundError:
+        return []
+
+    rotated = []
+    for name in names:
+        if name.endswith(SPOOL_SUFFIX):
+            new_name = _rotate(folder, name)
+            if new_name is not None:
+                _wait_for_writers(folder / new_name)
+                rotated.append(new_name)
+        elif name.endswith(ROTATED_SUFFIX):
+            rotated.append(name)
+    return sorted(rotated)
+
+
+def _rotate(folder: Path, name: str):
+    # the rotated name, None when the spool stays in use
+    for _ in range(ROTATE_TRIES):
+        new_name = f"{name[: -len(SPOOL_SUFFIX)]}.{time.time_ns()}{ROTATED_SUFFIX}"
+        try:
+            os.replace(folder / name, folder / new_name)
+            return new_name
+        except PermissionError:
+            # windows, a writer has it open for an append
+            time.sleep(ROTATE_WAIT)
+    log.warning(f"SPOOL: {folder / name} stays in use, left for the next collect")
+    return None
+
+
+def read_records(data: dict, names: list) -> list:
+    """
+    Reads rotated spools, one sequential pass per file.
+
+    :param data: The running configuration
+    :param names: Names returned by rotate()
+    :return: (date, type, message, contributor) tuples, in write order
+    """
+    folder = spool_dir(data)
+    records = []
+    for name in names:
+        with open(folder / name, "r", encoding="utf-8") as fs:
+            for n, line in enumerate(fs, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    r = json.loads(line)
+                except ValueError:
+                    # a writer killed mid append, the rest of the spool is fine
+                    log.error(f"SPOOL: skipping torn record, {name} line {n}")
+                    continue
+                records.append((r["date"], r["id"], r["type"], r["message"], r["contributor"]))
+
+    # date first, so records merge with artifact files by their date stamp
+    records.sort()
+    return [(a_date, a_type, a_msg, a_dev) for a_date, _, a_type, a_msg, a_dev in records]
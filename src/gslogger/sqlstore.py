@@ -0,0 +1,278 @@
+# SQLite storage engine for the log store.
+#
+# Selected with "store_engine": "sqlite" under "app" in glog.json. Versions,
+# their entries and contributors, and the futures list live in indexed
+# tables, so lookups by version, artifact type, date or contributor don't
+# need the whole history parsed. Records come back out as the same
+# canonical JSON the segmented store keeps on disk, so jin renders them
+# byte for byte the same.
+
+import json
+import sqlite3
+from pathlib import Path
+
+try:
+    from extras import contributor_names
+except ImportError:
+    from .extras import contributor_names
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS versions (
+    id INTEGER PRIMARY KEY,
+    record TEXT NOT NULL UNIQUE,
+    major INTEGER NOT NULL,
+    minor INTEGER NOT NULL,
+    patch INTEGER NOT NULL,
+    build_number INTEGER,
+    date TEXT,
+    contributors TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_versions_number ON versions (major, minor, patch);
+CREATE INDEX IF NOT EXISTS idx_versions_date ON versions (date);
+
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    version_id INTEGER NOT NULL REFERENCES versions (id),
+    type TEXT NOT NULL,
+    type_pos INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    message TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entries_version ON entries (version_id);
+CREATE INDEX IF NOT EXISTS idx_entries_type ON entries (type, version_id);
+
+CREATE TABLE IF NOT EXISTS contributors (
+    version_id INTEGER NOT NULL REFERENCES versions (id),
+    contributor TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_contributors_name ON contributors (contributor, version_id);
+
+CREATE TABLE IF NOT EXISTS futures (
+    position INTEGER PRIMARY KEY,
+    text TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS todo (
+    id INTEGER PRIMARY KEY,
+    text TEXT NOT NULL,
+    status TEXT NOT NULL,
+    added_in TEXT,
+    resolved_in TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_todo_status ON todo (status, id);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS store_info (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+NEWEST_FIRST = "v.major DESC, v.minor DESC, v.patch DESC, v.id DESC"
+
+
+def canonical(record: dict) -> str:
+    """
+    Returns the canonical JSON text of a version record.
+
+    :param record: A version record
+    :return: The record as sorted-key JSON, as stored in a segment line
+    """
+    return json.dumps(record, sort_keys=True)
+
+
+def connect(db_file) -> sqlite3.Connection:
+    """
+    Opens the database, creating the schema when needed.
+
+    :param db_file: Path to the SQLite file
+    :return: An open connection
+    """
+    Path(db_file).parent.mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(db_file)
+    con.executescript(SCHEMA)
+    return con
+
+
+def insert_version(con: sqlite3.Connection, record: dict) -> bool:
+    """
+    Inserts one version record and its entries and contributors.
+
+    Inserting the same record twice is a no-op, which lets a journal
+    replay it safely.
+
+    :param con: An open connection, the caller commits
+    :param record: A version record
+    :return: True when the record was new
+    """
+    major, minor, patch = record["version_number"]
+    cur = con.execute(
+        "INSERT OR IGNORE INTO versions "
+        "(record, major, minor, patch, build_number, date, contributors) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (
+            canonical(record),
+            major,
+            minor,
+            patch,
+            record.get("build_number"),
+            record.get("date"),
+            ", ".join(contributor_names(record)),
+        ),
+    )
+    if cur.rowcount == 0:
+        return False
+
+    version_id = cur.lastrowid
+    con.executemany(
+        "INSERT INTO entries (version_id, type, type_pos, position, message) "
+        "VALUES (?, ?, ?, ?, ?)",
+        [
+            (version_id, a_type, t, p, msg)
+            for t, (a_type, a_list) in enumerate(record.get("logs", {}).items())
+            for p, msg in enumerate(a_list)
+        ],
+    )
+    con.executemany(
+        "INSERT INTO contributors (version_id, contributor) VALUES (?, ?)",
+        [(version_id, name) for name in contributor_names(record)],
+    )
+    return True
+
+
+def save_doc_parts(con: sqlite3.Connection, doc_parts: dict) -> None:
+    """
+    Replaces the stored document parts, futures go to their own table.
+
+    Future records (see todo.py) go to the todo table, futures still held
+    as "<n> - text" strings to the futures table they were stored in.
+
+    :param con: An open connection, the caller commits
+    :param doc_parts: The doc_parts dict of the log store
+    :return: None
+    """
+    futures = doc_parts.get("futures") or []
+    con.execute("DELETE FROM futures")
+    con.execute("DELETE FROM todo")
+    con.executemany(
+        "INSERT INTO todo (id, text, status, added_in, resolved_in) VALUES (?, ?, ?, ?, ?)",
+        [(f["id"], f["text"], f["status"], f.get("added_in"), f.get("resolved_in")) for f in futures if isinstance(f, dict)],
+    )
+    con.executemany(
+        "INSERT INTO futures (position, text) VALUES (?, ?)",
+        list(enumerate(f for f in futures if not isinstance(f, dict))),
+    )
+    con.executemany(
+        "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+        [(k, json.dumps(v)) for k, v in doc_parts.items() if k != "futures"],
+    )
+
+
+def load_doc_parts(con: sqlite3.Connection) -> dict:
+    """
+    Reads the document parts back into the log store layout.
+
+    :param con: An open connection
+    :return: The doc_parts dict
+    """
+    doc_parts = {k: json.loads(v) for k, v in con.execute("SELECT key, value FROM meta")}
+    doc_parts["futures"] = [
+        {"id": i, "text": t, "status": s, "added_in": a, "resolved_in": r}
+        for i, t, s, a, r in con.execute("SELECT id, text, status, added_in, resolved_in FROM todo ORDER BY id")
+    ]
+    doc_parts["futures"] += [
+        t for (t,) in con.execute("SELECT text FROM futures ORDER BY position")
+    ]
+    return doc_parts
+
+
+def load_open_futures(con: sqlite3.Connection) -> list:
+    """
+    Reads the open futures only, through the status index.
+
+    :param con: An open connection
+    :return: Open future records by id, then any "<n> - text" strings still stored
+    """
+    futures = [
+        {"id": i, "text": t, "status": "open", "added_in": a, "resolved_in": None}
+        for i, t, a in con.execute("SELECT id, text, added_in FROM todo WHERE status = 'open' ORDER BY id")
+    ]
+    futures += [t for (t,) in con.execute("SELECT text FROM futures ORDER BY position")]
+    return futures
+
+
+def count_versions(con: sqlite3.Connection) -> int:
+    return con.execute("SELECT COUNT(*) FROM versions").fetchone()[0]
+
+
+def load_generation(con: sqlite3.Connection):
+    row = con.execute("SELECT value FROM store_info WHERE key = 'generation'").fetchone()
+    return row[0] if row else None
+
+
+def save_generation(con: sqlite3.Connection, generation: str) -> None:
+    """
+    Records the store's generation, see store.load_manifest.
+
+    :param con: An open connection, committed here
+    :param generation: A new generation id
+    :return: None
+    """
+    con.execute("INSERT OR REPLACE INTO store_info (key, value) VALUES ('generation', ?)", (generation,))
+    con.commit()
+
+
+def iter_raw_versions(con: sqlite3.Connection, where: str = "", params: tuple = ()):
+    """
+    Yields version records as canonical JSON, newest first.
+
+    :param con: An open connection
+    :param where: An optional SQL condition on the versions table (alias v)
+    :param params: Parameters for the condition
+    :return: A generator of JSON strings
+    """
+    sql = "SELECT v.record FROM versions v"
+    if where:
+        sql += " WHERE " + where
+    sql += " ORDER BY " + NEWEST_FIRST
+    for (line,) in con.execute(sql, params):
+        yield line
+
+
+def import_records(con: sqlite3.Connection, log_store: dict) -> int:
+    """
+    Loads a whole log store (log_store.json layout) into the database.
+
+    :param con: An open connection, committed here
+    :param log_store: {"doc_parts": {...}, "details": [...]}
+    :return: The number of new versions
+    """
+    # oldest first, like the segmented store, so ids follow collect order
+    records = sorted(log_store.get("details") or [], key=lambda x: x["version_number"])
+    with con:
+        added = sum(insert_version(con, r) for r in records)
+        save_doc_parts(con, log_store.get("doc_parts") or {})
+    return added
+
+
+def apply_journal_record(entry: dict) -> None:
+    """
+    Applies one sqlite record queued in a journal transaction.
+
+    :param entry: {"db": path, "record": {...}, "futures": [...] or None}
+    :return: None
+    """
+    con = connect(entry["db"])
+    try:
+        with con:
+            insert_version(con, entry["record"])
+            if entry.get("futures") is not None:
+                doc_parts = load_doc_parts(con)
+                doc_parts["futures"] = entry["futures"]
+                save_doc_parts(con, doc_parts)
+    finally:
+        con.close()
@@ -0,0 +1,240 @@
+# glog --stats: release metrics from a view kept beside the store.
+#
+# Counting entries per type, contributors and releases per month used to
+# mean parsing every stored version and splitting each comma-joined
+# contributors string. Collect keeps the totals in store/stats.json
+# instead, one version folded in per collect:
+#
+#   versions, entries    how many, and the version range they span
+#   types                entries and versions per artifact type
+#   contributors         versions per contributor, first and last version
+#   months               releases per "YYYY-MM"
+#   first_date, last_date
+#   by_version           entries per type of every version, in version
+#                        order; --stats shows the newest SHOWN of them
+#
+# The view lands in the collect's journal with the version it counts.
+# When it doesn't cover as many versions as the store (the first --stats,
+# an older glog), or was counted from another store generation (an
+# import, see store.load_manifest), it is rebuilt from the store, once.
+
+import datetime
+import json
+from bisect import insort
+from pathlib import Path
+
+try:
+    from extras import contributor_names
+    from instrument import log, span
+    from journal import stage as stage_file
+except ImportError:
+    from .extras import contributor_names
+    from .instrument import log, span
+    from .journal import stage as stage_file
+
+STATS = "stats.json"
+SHOWN = 10
+FORMAT = 2
+
+
+def _stats_file(data: dict) -> Path:
+    # glog's DIR_STORE rule, without importing the store
+    if "DIR_STORE" in data["paths"]:
+        return Path(data["paths"]["DIR_STORE"]) / STATS
+    return Path(data["paths"]["DIR_OUTPUT"]) / "store" / STATS
+
+
+def _empty(generation=None) -> dict:
+    return {
+        "format": FORMAT,
+        "generation": generation,
+        "versions": 0,
+        "entries": 0,
+        "first": None,
+        "last": None,
+        "types": {},
+        "contributors": {},
+        "months": {},
+        "first_date": None,
+        "last_date": None,
+        "by_version": [],
+    }
+
+
+def _fold(view: dict, record: dict) -> None:
+    # adds one version record, in any order
+    version = record["version_number"]
+    counts = {a_type: len(entries) for a_type, entries in record.get("logs", {}).items() if entries}
+
+    view["versions"] += 1
+    view["entries"] += sum(counts.values())
+    if view["first"] is None or version < view["first"]:
+        view["first"] = version
+    if view["last"] is None or version > view["last"]:
+        view["last"] = version
+
+    for a_type, n in counts.items():
+        totals = view["types"].setdefault(a_type, {"entries": 0, "versions": 0})
+        totals["entries"] += n
+        totals["versions"] += 1
+
+    for name in contributor_names(record):
+        seen = view["contributors"].get(name)
+        if seen is None:
+            view["contributors"][name] = {"versions": 1, "first": version, "last": version}
+            continue
+        seen["versions"] += 1
+        seen["first"] = min(seen["first"], version)
+        seen["last"] = max(seen["last"], version)
+
+    day = record.get("date") or ""
+    if len(day) >= 10:
+        view["months"][day[:7]] = view["months"].get(day[:7], 0) + 1
+        view["first_date"] = min(view["first_date"] or day[:10], day[:10])
+        view["last_date"] = max(view["last_date"] or day[:10], day[:10])
+
+    insort(view["by_version"], [version, day, counts], key=lambda r: r[0])
+
+
+def rebuild(data: dict, manifest: dict) -> dict:
+    """
+    Counts the whole history into a new view and saves it.
+
+    :param data: The running configuration
+    :param manifest: The store manifest
+    :return: The view
+    """
+    try:
+        import store
+    except ImportError:
+        from . import store
+
+    view = _empty(manifest.get("generation"))
+    with span("stats_rebuild"):
+        for record in store.iter_versions(data, manifest):
+            _fold(view, record)
+
+    target = _stats_file(data)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    target.write_text(json.dumps(view), encoding="utf-8")
+    log.info(f"STATS: counted {view['versions']} versions")
+    return view
+
+
+def open_view(data: dict, manifest: dict) -> dict:
+    """
+    Returns the view, rebuilt when it doesn't cover the store.
+
+    :param data: The running configuration
+    :param manifest: The store manifest
+    :return: The view
+    """
+    try:
+        view = json.loads(_stats_file(data).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        view = None
+    if (
+        view is not None
+        and view.get("format") == FORMAT
+        and view["versions"] == manifest["count"]
+        and view.get("generation") == manifest.get("generation")
+    ):
+        return view
+    return rebuild(data, manifest)
+
+
+def stage(data: dict, txn: dict, manifest: dict, record: dict) -> None:
+    """
+    Queues the view with one more version into a collect.
+
+    :param data: The running configuration
+    :param txn: The collect's journal transaction
+    :param manifest: The store manifest from before the version was appended
+    :param record: The version record being stored
+    :return: None
+    """
+    view = open_view(data, manifest)
+    _fold(view, record)
+    stage_file(txn, _stats_file(data), json.dumps(view))
+
+
+def stats(data: dict) -> dict:
+    """
+    Returns the release metrics, for `glog --stats`.
+
+    :param data: The running configuration
+    :return: The view, see the module notes
+    """
+    try:
+        from store import load_manifest
+    except ImportError:
+        from .store import load_manifest
+
+    return open_view(data, load_manifest(data))
+
+
+def _tag(version) -> str:
+    return "v" + ".".join(map(str, version)) if version else "-"
+
+
+def _table(header: list, rows: list) -> list:
+    lines = ["| " + " | ".join(header) + " |", "|" + "|".join("---" for _ in header) + "|"]
+    lines += ["| " + " | ".join(str(c) for c in row) + " |" for row in rows]
+    return lines
+
+
+def format_stats(view: dict, fmt: str = "md", chtypes: list = None) -> str:
+    """
+    Formats the view as markdown tables, or JSON.
+
+    :param view: What stats() returned
+    :param fmt: "md" or "json"
+    :param chtypes: CHTYPES, orders the type columns
+    :return: The formatted text
+    """
+    if fmt == "json":
+        return json.dumps(view, indent=4)
+    if not view["versions"]:
+        return "No versions collected yet."
+
+    types = [t for t in chtypes or () if t in view["types"]]
+    types += sorted(t for t in view["types"] if t not in types)
+
+    lines = [
+        f"## STATS: {view['versions']} versions, {view['entries']} entries "
+        f"({_tag(view['first'])} .. {_tag(view['last'])})",
+        "",
+    ]
+    lines += _table(
+        ["Type", "Entries", "Versions", "Per version"],
+        [
+            [t, view["types"][t]["entries"], view["types"][t]["versions"],
+             f"{view['types'][t]['entries'] / view['versions']:.2f}"]
+            for t in types
+        ],
+    )
+
+    lines += [""]
+    contributors = sorted(view["contributors"].items(), key=lambda c: (-c[1]["versions"], c[0]))
+    lines += _table(
+        ["Contributor", "Versions", "First", "Last"],
+        [[name, c["versions"], _tag(c["first"]), _tag(c["last"])] for name, c in contributors],
+    )
+
+    if view["first_date"]:
+        first = datetime.date.fromisoformat(view["first_date"])
+        last = datetime.date.fromisoformat(view["last_date"])
+        dated = sum(view["months"].values())
+        lines += ["", f"Cadence: {view['first_date']} .. {view['last_date']}"]
+        if dated > 1:
+            lines[-1] += f", a release every {(last - first).days / (dated - 1):.1f} days"
+        lines += [""]
+        months = sorted(view["months"].items())[-12:]
+        lines += _table(["Month", "Releases"], months)
+
+    lines += [""]
+    lines += _table(
+        ["Version", "Date"] + types,
+        [[_tag(v), day] + [counts.get(t, 0) for t in types] for v, day, counts in reversed(view["by_version"][-SHOWN:])],
+    )
+    return "\n".join(lines)
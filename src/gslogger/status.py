@@ -0,0 +1,360 @@
+# glog --status: what the next collect would do, without collecting.
+#
+# semantic_versioning only runs inside collect, so the next version used to
+# be known only after collecting. Instead every artifact writer folds what
+# it wrote into a small index, store/pending.json:
+#
+#   count, types, contributors   what is waiting
+#   bumps                        [releases, features, fixes] since the base,
+#                                semantic_versioning folded over the backlog
+#   base                         build / version the bumps apply to
+#   dir_mtime, spools            DIR_OUTPUT's mtime and each spool's size
+#                                when the index was last brought up to date
+#
+# so --status is answered from the index in constant time. The index is
+# trusted only while base matches glog.json and DIR_OUTPUT and the spools
+# look exactly as it last saw them: a collect, a deleted artifact, a
+# written duplicate (see dedup.py), or a writer that found the index out of
+# date all lead to one full rescan, which leaves duplicates out as collect
+# would. The rescan only reads the dedup index, it's collect's to build:
+# while it's missing or behind the store, only duplicates within the
+# backlog are found, and --status says so.
+#
+# Collect applies artifacts in name (date) order, and bumps don't commute
+# (a fix before a --f is reset by it, after it isn't), so a writer only
+# folds in an artifact that sorts after everything it could be reordered
+# with. Anything else marks the index for a rescan.
+#
+# Writers import this module on every artifact, so the store (and sqlite)
+# and ingest are only imported once an index is found or rebuilt.
+
+import contextlib
+import heapq
+import json
+import os
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # windows, updates are not serialized
+    fcntl = None
+
+try:
+    from instrument import log, span
+    import spool
+except ImportError:
+    from .instrument import log, span
+    from . import spool
+
+PENDING = "pending.json"
+PENDING_LOCK = "pending.lock"
+FORMAT = 1
+
+
+def _store_dir(data: dict) -> Path:
+    # glog's DIR_STORE rule, without importing the store
+    if "DIR_STORE" in data["paths"]:
+        return Path(data["paths"]["DIR_STORE"])
+    return Path(data["paths"]["DIR_OUTPUT"]) / "store"
+
+
+def snapshot(data: dict) -> dict:
+    """
+    Returns what the index compares DIR_OUTPUT and the spools against.
+
+    :param data: The running configuration
+    :return: {"dir_mtime": ns, "spools": {name: size}}
+    """
+    folder = spool.spool_dir(data)
+    spools = {}
+    try:
+        with os.scandir(folder) as entries:
+            for e in entries:
+                if e.name.endswith((spool.SPOOL_SUFFIX, spool.ROTATED_SUFFIX)):
+                    spools[e.name] = e.stat().st_size
+    except FileNotFoundError:
+        pass
+    return {"dir_mtime": os.stat(data["paths"]["DIR_OUTPUT"]).st_mtime_ns, "spools": spools}
+
+
+def _base(data: dict) -> dict:
+    return {"build_number": data["app"]["build_number"], "version_number": list(data["app"]["version_number"])}
+
+
+def _empty(data: dict) -> dict:
+    return {
+        "format": FORMAT,
+        "base": _base(data),
+        "count": 0,
+        "types": {},
+        "contributors": {},
+        "bumps": [0, 0, 0],
+        "duplicates": 0,
+        "last": None,
+        "last_bump": None,
+    }
+
+
+def _fold(index: dict, key: list, a_type: str, a_msg: str, a_dev: str) -> bool:
+    # folds one artifact in, False when its place in collect order is
+    # before artifacts whose effect it would change
+    last, last_bump = index["last"], index["last_bump"]
+    low = a_msg.lower()
+    resets = "--r" in low or "--f" in low
+    if last is not None and key < last:
+        # fixes commute with each other, not with the --r / --f after them
+        if resets or (last_bump is not None and key < last_bump):
+            return False
+
+    releases, features, fixes = index["bumps"]
+    if "--r" in low:
+        index["bumps"] = [releases + 1, 0, 0]
+    elif "--f" in low:
+        index["bumps"] = [releases, features + 1, 0]
+    else:
+        index["bumps"] = [releases, features, fixes + 1]
+    if resets:
+        index["last_bump"] = key
+    if last is None or key > last:
+        index["last"] = key
+
+    index["count"] += 1
+    index["types"][a_type] = index["types"].get(a_type, 0) + 1
+    index["contributors"][a_dev] = index["contributors"].get(a_dev, 0) + 1
+    return True
+
+
+def _key(path: str, stamp: str) -> list:
+    # where an artifact lands in collect order: by date, files before spool
+    # records of the same second, then by file name or spool id
+    if "#" in path:
+        return [stamp, 1, path.rsplit("#", 1)[1]]
+    return [stamp, 0, os.path.basename(path)]
+
+
+def _index_file(data: dict) -> Path:
+    return _store_dir(data) / PENDING
+
+
+@contextlib.contextmanager
+def _locked(data: dict):
+    folder = _store_dir(data)
+    folder.mkdir(parents=True, exist_ok=True)
+    fd = os.open(folder / PENDING_LOCK, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
+
+
+def _load(data: dict):
+    try:
+        index = json.loads(_index_file(data).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    return index if index.get("format") == FORMAT else None
+
+
+def _save(data: dict, index: dict) -> None:
+    target = _index_file(data)
+    stage = target.with_name(target.name + ".tmp")
+    stage.write_text(json.dumps(index), encoding="utf-8")
+    os.replace(stage, target)
+
+
+def begin(data: dict):
+    """
+    Called by writers before writing, see record().
+
+    :param data: The running configuration
+    :return: A snapshot() when there is an index to keep up to date, else None
+    """
+    if not _index_file(data).exists():
+        # the next --status builds it
+        return None
+    return snapshot(data)
+
+
+def record(data: dict, before, written: list) -> None:
+    """
+    Folds artifacts a writer just wrote into the index.
+
+    When DIR_OUTPUT or the spools changed since the index was updated other
+    than by this writer, or an artifact can't be folded in exactly, the
+    index is marked for a rescan instead.
+
+    :param data: The running configuration
+    :param before: What begin() returned
+    :param written: (path, date, type, message, contributor) tuples, path as
+        write_artifact returns it
+    :return: None
+    """
+    if before is None:
+        return
+    with _locked(data):
+        index = _load(data)
+        if index is None or index.get("stale"):
+            return
+        ok = index["base"] == _base(data) and index.get("dir_mtime") == before["dir_mtime"]
+        ok = ok and index.get("spools") == before["spools"]
+        for path, a_date, a_type, a_msg, a_dev in written if ok else ():
+            # write_artifact logs a failed write and returns the name anyway
+            if "#" not in path and not os.path.exists(path):
+                continue
+            if not _fold(index, _key(path, a_date), a_type, a_msg, a_dev):
+                ok = False
+                break
+        if ok:
+            index.update(snapshot(data))
+        else:
+            index = {"format": FORMAT, "stale": True}
+        _save(data, index)
+
+
+def invalidate(data: dict) -> None:
+    """
+    Marks the index for a rescan, for writes record() can't fold in.
+
+    :param data: The running configuration
+    :return: None
+    """
+    if not _index_file(data).exists():
+        return
+    with _locked(data):
+        _save(data, {"format": FORMAT, "stale": True})
+
+
+def rescan(data: dict) -> dict:
+    """
+    Rebuilds the index from every waiting artifact file and spool record.
+
+    Reads the whole backlog, in the order collect would, without collecting.
+
+    :param data: The running configuration
+    :return: The new index
+    """
+    try:
+        import dedup
+        import ingest
+        import store
+    except ImportError:
+        from . import dedup
+        from . import ingest
+        from . import store
+
+    with _locked(data):
+        # taken first, a write landing during the scan makes the index stale again
+        current = snapshot(data)
+        with span("status_rescan"):
+            folder = data["paths"]["DIR_OUTPUT"]
+            names = ingest.scan_artifacts(folder, data["app"]["atf_pattern"])
+            files = (
+                ([a_date, 0, name], a_type, a_msg, a_dev)
+                for name, (a_date, a_type, a_msg, a_dev) in zip(
+                    names, ingest.read_artifacts(folder, names, data["app"].get("ingest_workers"))
+                )
+            )
+            records = [
+                ([a_date, 1, ""], a_type, a_msg, a_dev)
+                for a_date, a_type, a_msg, a_dev in spool.read_records(data, sorted(current["spools"]))
+            ]
+
+            index = _empty(data)
+            # only collect builds the dedup index, under its lease
+            seen = dedup.Collect(data, store.load_manifest(data), build=False)
+            for key, a_type, a_msg, a_dev in heapq.merge(files, records, key=lambda a: a[0][0]):
+                if seen.check(a_type, a_msg):
+                    # what collect will do with it
+                    if seen.policy == "merge":
+                        index["contributors"].setdefault(a_dev, 0)
+                    continue
+                # in collect order, so every artifact folds in
+                _fold(index, key, a_type, a_msg, a_dev)
+            # "keep" collects them like any other artifact
+            index["duplicates"] = seen.duplicates if seen.policy != "keep" else 0
+            # without a dedup index, duplicates of collected history aren't found
+            index["history_checked"] = seen.index is not None
+            index.update(current)
+        _save(data, index)
+    log.debug(f"STATUS: rescanned {index['count']} pending artifacts")
+    return index
+
+
+def _project(version: list, bumps: list) -> list:
+    # semantic_versioning's effect, folded
+    releases, features, fixes = bumps
+    major, minor, patch = version
+    if releases:
+        return [major + releases, features, fixes]
+    if features:
+        return [major, minor + features, fixes]
+    return [major, minor, patch + fixes]
+
+
+def status(data: dict) -> dict:
+    """
+    Returns what the next collect would store, from the index when it's current.
+
+    :param data: The running configuration
+    :return: {"pending", "duplicates", "types", "contributors", "build_number", "version_number",
+        "current_build", "current_version", "rescanned", "history_checked"}
+    """
+    index = _load(data)
+    current = snapshot(data)
+    rescanned = (
+        index is None
+        or index.get("stale")
+        or index["base"] != _base(data)
+        or index["dir_mtime"] != current["dir_mtime"]
+        or index["spools"] != current["spools"]
+    )
+    if rescanned:
+        index = rescan(data)
+
+    base = index["base"]
+    return {
+        "pending": index["count"],
+        "duplicates": index["duplicates"],
+        "types": {t: index["types"][t] for t in data["CHTYPES"] if t in index["types"]},
+        "contributors": sorted(index["contributors"]),
+        "current_build": base["build_number"],
+        "current_version": base["version_number"],
+        "build_number": base["build_number"] + index["count"],
+        "version_number": _project(base["version_number"], index["bumps"]),
+        "rescanned": bool(rescanned),
+        "history_checked": index.get("history_checked", True),
+    }
+
+
+def format_status(result: dict, fmt: str = "md") -> str:
+    """
+    Formats status() as a short markdown summary, or JSON.
+
+    :param result: What status() returned
+    :param fmt: "md" or "json"
+    :return: The formatted text
+    """
+    if fmt == "json":
+        return json.dumps(result, indent=4)
+
+    version = "v" + ".".join(map(str, result["current_version"]))
+    if not result["pending"]:
+        left_out = f" ({result['duplicates']} duplicates left out)" if result["duplicates"] else ""
+        return f"No pending artifacts{left_out}. Current version: {version} | BUILD: {result['current_build']}"
+
+    lines = [
+        f"## NEXT VERSION: v{'.'.join(map(str, result['version_number']))} | BUILD: {result['build_number']}"
+        f" (now {version} | BUILD: {result['current_build']})",
+        "",
+        f"{result['pending']} pending artifacts:",
+        "",
+    ]
+    lines += [f"- {a_type}: {n}" for a_type, n in result["types"].items()]
+    if result["duplicates"]:
+        lines += ["", f"{result['duplicates']} duplicates left out (dedup_policy)"]
+    lines += ["", "Contributors: " + ", ".join(result["contributors"])]
+    if not result.get("history_checked", True):
+        lines += ["", "Not checked against collected versions for duplicates, the next collect builds the dedup index."]
+    return "\n".join(lines)
@@ -0,0 +1,684 @@
+# append-only, segmented log store.
+#
+# log_store.json used to be loaded, appended to, re-sorted and rewritten in
+# full on every collect. The store now lives in a folder of JSON Lines
+# segments plus a small manifest:
+#
+#   ch-logs/store/
+#   ├── manifest.json          # doc_parts, segment list, counts
+#   ├── seg-000000.jsonl       # one version record per line, oldest first
+#   └── seg-000001.jsonl
+#
+# Collecting a release appends one line to the newest segment and rewrites
+# the manifest, so the cost of a release no longer grows with the history.
+# Readers walk the segments backwards to get the newest-first order that
+# log_store.json used to hold.
+#
+# The functions below are the store interface used by glog and jin. With
+# "store_engine": "sqlite" under "app" in glog.json they hand off to the
+# SQLite engine in sqlstore.py instead.
+
+import json
+import os
+import uuid
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+
+try:
+    from instrument import log
+    from journal import begin, commit, file_lock, remove, stage
+    import sqlstore
+except ImportError:
+    from .instrument import log
+    from .journal import begin, commit, file_lock, remove, stage
+    from . import sqlstore
+
+MANIFEST = "manifest.json"
+MIGRATE_LOCK = ".migrate.lock"
+SEGMENT_SIZE = 256
+STORE_FORMAT = 1
+ARCHIVE_PREFIX = "arc-"
+COMPACT_KEEP = 1024
+
+
+def store_dir(data: dict) -> Path:
+    """
+    Returns the folder holding the segmented log store.
+
+    Uses paths.DIR_STORE when configured, otherwise "store" inside DIR_OUTPUT.
+
+    :param data: The running configuration
+    :return: A Path to the store folder
+    """
+    if "DIR_STORE" in data["paths"]:
+        return Path(data["paths"]["DIR_STORE"])
+    return Path(data["paths"]["DIR_OUTPUT"]) / "store"
+
+
+def engine(data: dict) -> str:
+    """
+    Returns the configured storage engine, "segments" (default) or "sqlite".
+
+    :param data: The running configuration
+    :return: The engine name
+    """
+    return data["app"].get("store_engine", "segments")
+
+
+def db_file(data: dict) -> Path:
+    """
+    Returns the SQLite database used by the "sqlite" engine.
+
+    Uses paths.FILE_DB when configured, otherwise "log_store.sqlite3" in the store folder.
+
+    :param data: The running configuration
+    :return: A Path to the database
+    """
+    if "FILE_DB" in data["paths"]:
+        return Path(data["paths"]["FILE_DB"])
+    return store_dir(data) / "log_store.sqlite3"
+
+
+def open_db(data: dict):
+    """
+    Opens the SQLite store, filling it from the existing store on first use.
+
+    :param data: The running configuration
+    :return: An open sqlite3 connection
+    """
+    target = db_file(data)
+    fresh = not target.exists()
+    con = sqlstore.connect(target)
+    if fresh:
+        log_store = _load_segments_store(data)
+        added = sqlstore.import_records(con, log_store)
+        sqlstore.save_generation(con, _new_generation())
+        log.info(f"STORE: imported {added} versions into {target}")
+    return con
+
+
+def _segment_name(index: int) -> str:
+    return f"seg-{index:06d}.jsonl"
+
+
+def _dump_record(record: dict) -> str:
+    return json.dumps(record, sort_keys=True) + "\n"
+
+
+def _write_manifest(folder: Path, manifest: dict) -> None:
+    # write beside the target then swap it in, a reader never sees half a
+    # manifest. Named per process, a writer never swaps in another's file
+    target = folder / MANIFEST
+    stage = folder / (MANIFEST + f".{os.getpid()}.tmp")
+    stage.write_text(json.dumps(manifest, indent=4, sort_keys=True), encoding="utf-8")
+    os.replace(stage, target)
+
+
+def _new_generation() -> str:
+    return uuid.uuid4().hex
+
+
+def _empty_manifest() -> dict:
+    return {
+        "format": STORE_FORMAT,
+        "generation": _new_generation(),
+        "count": 0,
+        "doc_parts": {"futures": []},
+        "segments": [],
+    }
+
+
+def _write_segments(folder: Path, manifest: dict, records: list) -> None:
+    """
+    Writes records (oldest first) into fresh segments and lists them in the manifest.
+    """
+    for name, chunk in _segment_chunks(manifest, records):
+        with open(folder / name, "w", encoding="utf-8") as fs:
+            fs.writelines(_dump_record(r) for r in chunk)
+
+
+def _segment_chunks(manifest: dict, records: list):
+    """
+    Splits records (oldest first) into segments, listing each in the
+    manifest before yielding its (name, records).
+    """
+    for start in range(0, len(records), SEGMENT_SIZE):
+        chunk = records[start : start + SEGMENT_SIZE]
+        name = _segment_name(len(manifest["segments"]))
+        manifest["segments"].append(
+            {
+                "name": name,
+                "count": len(chunk),
+                "first": chunk[0]["version_number"],
+                "last": chunk[-1]["version_number"],
+            }
+        )
+        manifest["count"] += len(chunk)
+        yield name, chunk
+
+
+def migrate_json(data: dict) -> dict:
+    """
+    Converts an existing log_store.json into the segmented layout.
+
+    The legacy file is renamed to "log_store.json.migrated" once the
+    segments and manifest are safely on disk. Every process that finds no
+    manifest comes here: one migrates under a lock in the store folder,
+    the others wait for it and read its manifest.
+
+    :param data: The running configuration
+    :return: The new manifest
+    """
+    folder = store_dir(data)
+    folder.mkdir(parents=True, exist_ok=True)
+    wait = data["app"].get("collect_lease_wait", 30)
+    with file_lock(folder / MIGRATE_LOCK, wait, f"STORE: another process is migrating into {folder}"):
+        target = folder / MANIFEST
+        if target.exists():
+            return json.loads(target.read_text(encoding="utf-8"))
+        return _migrate_json(data, folder)
+
+
+def _migrate_json(data: dict, folder: Path) -> dict:
+    legacy = Path(data["paths"]["FILE_LOG"])
+    manifest = _empty_manifest()
+
+    if legacy.exists():
+        log_store = json.loads(legacy.read_text(encoding="utf-8") or "{}")
+        doc_parts = log_store.get("doc_parts") or {}
+        doc_parts["futures"] = doc_parts.get("futures") or []
+        manifest["doc_parts"] = doc_parts
+
+        # the only full sort the store will ever do
+        records = sorted(
+            log_store.get("details") or [], key=lambda x: x["version_number"]
+        )
+        _write_segments(folder, manifest, records)
+        manifest["migrated_from"] = legacy.name
+
+    _write_manifest(folder, manifest)
+
+    if legacy.exists():
+        os.replace(legacy, legacy.with_name(legacy.name + ".migrated"))
+        log.info(f"STORE: migrated {legacy} into {folder}")
+
+    return manifest
+
+
+def load_manifest(data: dict) -> dict:
+    """
+    Loads the store manifest, migrating log_store.json on first use.
+
+    For the sqlite engine this is a small stand-in holding the engine name,
+    the version count, the generation and the doc_parts.
+
+    The generation is an id given to a store when it is created, migrated
+    or replaced by --import-store. Indexes derived from the store (dedup,
+    stats, search) keep the generation they were built from, and are
+    rebuilt when it changes even if the version count didn't. Stores from
+    before generations have none, nor do the indexes built from them.
+
+    :param data: The running configuration
+    :return: The manifest data
+    """
+    if engine(data) == "sqlite":
+        con = open_db(data)
+        try:
+            return {
+                "engine": "sqlite",
+                "count": sqlstore.count_versions(con),
+                "generation": sqlstore.load_generation(con),
+                "doc_parts": sqlstore.load_doc_parts(con),
+            }
+        finally:
+            con.close()
+
+    return _load_segments_manifest(data)
+
+
+def _load_segments_manifest(data: dict) -> dict:
+    target = store_dir(data) / MANIFEST
+    if not target.exists():
+        return migrate_json(data)
+
+    return json.loads(target.read_text(encoding="utf-8"))
+
+
+def is_archived(name: str) -> bool:
+    """
+    :param name: A segment's name, from the manifest
+    :return: True for a compressed archive written by compact()
+    """
+    return name.startswith(ARCHIVE_PREFIX)
+
+
+def _archive():
+    # gzip, lzma and mmap are only imported once the store has archives
+    try:
+        import archive
+    except ImportError:
+        from . import archive
+    return archive
+
+
+def _raw_lines(folder: Path, name: str) -> list:
+    # oldest first, without newlines
+    if is_archived(name):
+        with _archive().Archive(folder, name) as arc:
+            return arc.lines()
+    with open(folder / name, "r", encoding="utf-8") as fs:
+        return [line.rstrip("\n") for line in fs if line.strip()]
+
+
+def _read_segment(folder: Path, name: str) -> list:
+    return [json.loads(line) for line in _raw_lines(folder, name)]
+
+
+def read_raw_segment(data: dict, name: str) -> list:
+    """
+    Returns the raw JSON lines of one store segment, newest first.
+
+    Archived segments are decoded here, when something reads them.
+
+    :param data: The running configuration
+    :param name: The segment's name, from the manifest
+    :return: A list of JSON strings
+    """
+    lines = _raw_lines(store_dir(data), name)
+    lines.reverse()
+    return lines
+
+
+def iter_raw_versions(data: dict, manifest: dict = None):
+    """
+    Yields every collected version as its raw JSON line, newest first.
+
+    Lets callers hash or skip records without parsing them.
+
+    :param data: The running configuration
+    :param manifest: An already loaded manifest, loaded here when omitted
+    :return: A generator of JSON strings
+    """
+    if manifest is None:
+        manifest = load_manifest(data)
+
+    if manifest.get("engine") == "sqlite":
+        con = open_db(data)
+        try:
+            yield from sqlstore.iter_raw_versions(con)
+        finally:
+            con.close()
+        return
+
+    for segment in reversed(manifest["segments"]):
+        yield from read_raw_segment(data, segment["name"])
+
+
+def iter_versions(data: dict, manifest: dict = None):
+    """
+    Yields every collected version record, newest first.
+
+    Only one segment is held in memory at a time.
+
+    :param data: The running configuration
+    :param manifest: An already loaded manifest, loaded here when omitted
+    :return: A generator of version dicts
+    """
+    for line in iter_raw_versions(data, manifest):
+        yield json.loads(line)
+
+
+def _version_of(line: str) -> list:
+    return json.loads(line)["version_number"]
+
+
+def _find_lines(folder: Path, name: str, versions: list) -> list:
+    # a segment's lines are in version order, bisected parsing only a few of them
+    if is_archived(name):
+        with _archive().Archive(folder, name) as arc:
+            lines = range(arc.count)
+            at = arc.line
+            return [
+                at(i)
+                for version in versions
+                for i in range(
+                    bisect_left(lines, version, key=lambda i: _version_of(at(i))),
+                    bisect_right(lines, version, key=lambda i: _version_of(at(i))),
+                )
+            ]
+    with open(folder / name, "r", encoding="utf-8") as fs:
+        lines = [line.rstrip("\n") for line in fs if line.strip()]
+    found = []
+    for version in versions:
+        lo = bisect_left(lines, version, key=_version_of)
+        hi = bisect_right(lines, version, lo=lo, key=_version_of)
+        found.extend(lines[lo:hi])
+    return found
+
+
+def read_versions(data: dict, versions: list, manifest: dict = None) -> list:
+    """
+    Reads the stored records of the given version numbers, newest first.
+
+    The manifest's version ranges pick the segments, and only those are read.
+
+    :param data: The running configuration
+    :param versions: Version numbers, e.g. [[0, 2, 72], [0, 2, 40]]
+    :param manifest: An already loaded manifest, loaded here when omitted
+    :return: A list of version records
+    """
+    wanted = sorted({tuple(v) for v in versions})
+    if manifest is None:
+        manifest = load_manifest(data)
+
+    if manifest.get("engine") == "sqlite":
+        lines = []
+        con = open_db(data)
+        try:
+            # in chunks, under sqlite's limit on parameters
+            for start in range(0, len(wanted), 300):
+                chunk = wanted[start : start + 300]
+                rows = ", ".join("(?, ?, ?)" for _ in chunk)
+                params = tuple(n for v in chunk for n in v)
+                lines.extend(
+                    sqlstore.iter_raw_versions(con, f"(v.major, v.minor, v.patch) IN (VALUES {rows})", params)
+                )
+        finally:
+            con.close()
+    else:
+        folder = store_dir(data)
+        segments = manifest["segments"]
+        lasts = [segment["last"] for segment in segments]
+        per_segment = {}
+        for version in map(list, wanted):
+            # a version repeated across a boundary is in each segment it spans
+            for n in range(bisect_left(lasts, version), len(segments)):
+                if segments[n]["first"] > version:
+                    break
+                per_segment.setdefault(n, []).append(version)
+        lines = []
+        for n, found in per_segment.items():
+            lines.extend(_find_lines(folder, segments[n]["name"], found))
+
+    records = [json.loads(line) for line in lines]
+    records.sort(key=lambda r: r["version_number"], reverse=True)
+    return records
+
+
+def open_futures(data: dict) -> list:
+    """
+    Returns the stored futures that are still open, for `glog --todo`.
+
+    The sqlite engine reads them through its status index, the segmented
+    store from the manifest.
+
+    :param data: The running configuration
+    :return: Future records and/or "<n> - text" strings, see todo.records()
+    """
+    if engine(data) == "sqlite":
+        con = open_db(data)
+        try:
+            return sqlstore.load_open_futures(con)
+        finally:
+            con.close()
+
+    return [f for f in load_manifest(data)["doc_parts"]["futures"] if not isinstance(f, dict) or f["status"] == "open"]
+
+
+def load_store(data: dict) -> dict:
+    """
+    Loads the whole store in the layout log_store.json used to have.
+
+    :param data: The running configuration
+    :return: {"doc_parts": {...}, "details": [newest, ..., oldest]}
+    """
+    manifest = load_manifest(data)
+    return {
+        "doc_parts": manifest["doc_parts"],
+        "details": list(iter_versions(data, manifest)),
+    }
+
+
+def _load_segments_store(data: dict) -> dict:
+    manifest = _load_segments_manifest(data)
+    return {
+        "doc_parts": manifest["doc_parts"],
+        "details": list(iter_versions(data, manifest)),
+    }
+
+
+def export_json(data: dict, target) -> None:
+    """
+    Writes the whole store out in the log_store.json layout.
+
+    :param data: The running configuration
+    :param target: The JSON file to write
+    :return: None
+    """
+    log_store = load_store(data)
+    Path(target).write_text(
+        json.dumps(log_store, indent=4, sort_keys=True), encoding="utf-8"
+    )
+    log.info(f"STORE: exported {len(log_store['details'])} versions to {target}")
+
+
+def import_json(data: dict, src) -> None:
+    """
+    Replaces the contents of the configured store with a log_store.json layout file.
+
+    The old store stays whole until the new one replaces it: the new
+    segments and manifest are staged and swapped in by one journal
+    transaction, and the old segments are removed after that (a new sqlite
+    database is built beside the old one and renamed over it). The caller
+    holds the collect lease.
+
+    :param data: The running configuration
+    :param src: The JSON file to read
+    :return: None
+    """
+    log_store = json.loads(Path(src).read_text(encoding="utf-8"))
+    doc_parts = log_store.get("doc_parts") or {}
+    doc_parts["futures"] = doc_parts.get("futures") or []
+
+    if engine(data) == "sqlite":
+        target = db_file(data)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        staged = target.with_name(target.name + f".{os.getpid()}.tmp")
+        staged.unlink(missing_ok=True)
+        try:
+            con = sqlstore.connect(staged)
+            try:
+                sqlstore.import_records(con, {"doc_parts": doc_parts, "details": log_store.get("details")})
+                sqlstore.save_generation(con, _new_generation())
+            finally:
+                con.close()
+            os.replace(staged, target)
+        finally:
+            # only left when the import failed
+            staged.unlink(missing_ok=True)
+
+    else:
+        folder = store_dir(data)
+        folder.mkdir(parents=True, exist_ok=True)
+        manifest = _empty_manifest()
+        manifest["doc_parts"] = doc_parts
+        records = sorted(log_store.get("details") or [], key=lambda x: x["version_number"])
+
+        txn = begin()
+        for name, chunk in _segment_chunks(manifest, records):
+            stage(txn, folder / name, "".join(_dump_record(r) for r in chunk))
+        stage(txn, folder / MANIFEST, json.dumps(manifest, indent=4, sort_keys=True))
+        # whatever the new manifest doesn't name goes once it's in
+        kept = {s["name"] for s in manifest["segments"]}
+        old = [p.name for pattern in ("seg-*.jsonl", ARCHIVE_PREFIX + "*") for p in folder.glob(pattern)]
+        remove(txn, folder, [name for name in old if name not in kept], "STORE: {} replaced segments removed.")
+        commit(data, txn)
+
+    log.info(f"STORE: imported {src} into the {engine(data)} store")
+
+
+def append_version(data: dict, context: dict, futures: list = None, txn: dict = None) -> None:
+    """
+    Appends one collected version to the store.
+
+    A version newer than everything stored is appended to the last segment
+    (a new segment is started once it holds SEGMENT_SIZE records). An older
+    version only rewrites the one segment it belongs in, so the order stays
+    correct without re-sorting the history.
+
+    With a journal transaction the segment and manifest are staged into it
+    instead of written, and land when the transaction commits.
+
+    :param data: The running configuration
+    :param context: The version record built by collect_changelogs
+    :param futures: The full futures list to store (records, see todo.py), left untouched when None
+    :param txn: An open journal transaction, or None to write straight away
+    :return: None
+    """
+    if engine(data) == "sqlite":
+        entry = {"db": str(db_file(data)), "record": context, "futures": futures}
+        if txn is None:
+            sqlstore.apply_journal_record(entry)
+        else:
+            # applied by the journal after its commit point, replays are no-ops
+            open_db(data).close()
+            txn["records"].append(entry)
+        log.info(f"STORE: version {context['version_number']} queued for {entry['db']}")
+        return
+
+    folder = store_dir(data)
+    manifest = _load_segments_manifest(data)
+    segments = manifest["segments"]
+    version = context["version_number"]
+
+    try:
+        if not segments or version >= segments[-1]["last"]:
+            if not segments or segments[-1]["count"] >= SEGMENT_SIZE:
+                segments.append(
+                    {
+                        "name": _segment_name(len(segments)),
+                        "count": 0,
+                        "first": version,
+                        "last": version,
+                    }
+                )
+            segment = segments[-1]
+            target = folder / segment["name"]
+
+            if txn is None:
+                with open(target, "a", encoding="utf-8") as fs:
+                    fs.write(_dump_record(context))
+            else:
+                text = target.read_text(encoding="utf-8") if target.exists() else ""
+                stage(txn, target, text + _dump_record(context))
+
+        else:
+            # out of order, slot it into the segment covering its version
+            firsts = [s["first"] for s in segments]
+            seg_no = max(bisect_right(firsts, version) - 1, 0)
+            segment = segments[seg_no]
+            records = _read_segment(folder, segment["name"])
+            keys = [r["version_number"] for r in records]
+            records.insert(bisect_right(keys, version), context)
+            text = "".join(_dump_record(r) for r in records)
+
+            if is_archived(segment["name"]):
+                # back to a plain segment, the next compact archives it again
+                archived = [segment["name"], _archive().index_name(segment["name"])]
+                if txn is None:
+                    for name in archived:
+                        (folder / name).unlink()
+                else:
+                    remove(txn, folder, archived, "STORE: {} archive files of a reopened segment removed.")
+                segment["name"] = _segment_name(seg_no)
+                segment.pop("codec", None)
+            target = folder / segment["name"]
+
+            if txn is None:
+                tmp = folder / (segment["name"] + f".{os.getpid()}.tmp")
+                tmp.write_text(text, encoding="utf-8")
+                os.replace(tmp, target)
+            else:
+                stage(txn, target, text)
+
+        segment["count"] += 1
+        segment["first"] = min(segment["first"], version)
+        segment["last"] = max(segment["last"], version)
+        manifest["count"] += 1
+
+        if futures is not None:
+            manifest["doc_parts"]["futures"] = futures
+
+        if txn is None:
+            _write_manifest(folder, manifest)
+        else:
+            stage(txn, folder / MANIFEST, json.dumps(manifest, indent=4, sort_keys=True))
+
+        log.info(f"STORE: version {version} appended to {segment['name']}")
+
+    except Exception as e:
+        raise Exception(f"STORE: Error appending to {folder}: {e}")
+
+
+def compact(data: dict, cutoff: list = None) -> int:
+    """
+    Moves old segments into compressed archives, see archive.py.
+
+    A segment is archived when every version in it is older than cutoff,
+    or without a cutoff once app.compact_keep (default COMPACT_KEEP)
+    versions are stored after it. The newest segment is never archived.
+    The codec is app.compact_codec, "gzip" (default) or "lzma".
+
+    :param data: The running configuration
+    :param cutoff: A version number, e.g. [0, 2, 40], or None
+    :return: The number of segments archived
+    """
+    if engine(data) == "sqlite":
+        log.info("STORE: --compact applies to the segmented store, nothing to do for sqlite")
+        return 0
+
+    arc = _archive()
+    codec = data["app"].get("compact_codec", "gzip")
+    if codec not in arc.CODECS:
+        raise ValueError(f"STORE: compact_codec {codec!r}, expected one of {', '.join(arc.CODECS)}")
+    keep = data["app"].get("compact_keep", COMPACT_KEEP)
+
+    folder = store_dir(data)
+    manifest = _load_segments_manifest(data)
+    segments = manifest["segments"]
+
+    picked, after = [], 0
+    for i in range(len(segments) - 2, -1, -1):
+        after += segments[i + 1]["count"]
+        segment = segments[i]
+        if is_archived(segment["name"]):
+            continue
+        if (segment["last"] < cutoff) if cutoff is not None else (after >= keep):
+            picked.append(i)
+    if not picked:
+        log.info("STORE: nothing to compact")
+        return 0
+
+    before = size = 0
+    replaced = []
+    for i in sorted(picked):
+        segment = segments[i]
+        plain = folder / segment["name"]
+        with open(plain, "r", encoding="utf-8") as fs:
+            # byte for byte, the render cache and query index hash these lines
+            lines = [line for line in fs if line.strip()]
+        name = arc.archive_name(i, codec)
+        before += plain.stat().st_size
+        size += arc.write_archive(folder, name, codec, lines)
+        replaced.append(segment["name"])
+        segment["name"], segment["codec"] = name, codec
+
+    # the archives are used once the manifest names them, the plain
+    # segments go after that
+    txn = begin()
+    stage(txn, folder / MANIFEST, json.dumps(manifest, indent=4, sort_keys=True))
+    remove(txn, folder, replaced, "STORE: {} compacted segments removed.")
+    commit(data, txn)
+
+    log.info(f"STORE: compacted {len(picked)} segments with {codec}, {before:,} bytes to {size:,}")
+    return len(picked)
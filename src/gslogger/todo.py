@@ -0,0 +1,170 @@
+# futures (FUTURE UPDATES artifacts) as a to-do list.
+#
+# The store used to keep futures as "<n> - text" strings, re-sorted as
+# strings on every collect ("10 - ..." before "2 - ..."). They are records
+# now, in the same doc_parts["futures"] list, ordered by id:
+#
+#   {"id": 12, "text": "...", "status": "open", "added_in": "v0.2.73",
+#    "resolved_in": null}
+#
+# Ids are handed out once and never reused: the next one follows both the
+# last id in the list and app.f_count, which then holds the last id given.
+# An artifact with "--done 12" in its message resolves future 12 in the
+# version it is collected into. The changelog still lists the open items
+# as "<id> - text", so templates and existing changelogs are unchanged.
+#
+# Stores written before keep their strings until the next collect that
+# touches the futures; records() reads both.
+
+import json
+import re
+from bisect import bisect_left
+
+OPEN = "open"
+RESOLVED = "resolved"
+DONE = re.compile(r"--done\s+#?(\d+)", re.IGNORECASE)
+_LEGACY = re.compile(r"\s*(\d+)\s+-\s+(.*)", re.DOTALL)
+
+
+def done_ids(message: str) -> list:
+    """
+    Returns the future ids an artifact message resolves.
+
+    :param message: An artifact message
+    :return: The ids after each "--done", in order
+    """
+    return [int(n) for n in DONE.findall(message)]
+
+
+def records(futures: list) -> list:
+    """
+    Returns stored futures as records sorted by id, whatever layout they
+    were stored in.
+
+    :param futures: doc_parts["futures"], records and/or "<n> - text" strings
+    :return: A new list of record dicts
+    """
+    items, unnumbered = [], []
+    for f in futures or ():
+        if isinstance(f, dict):
+            items.append(dict(f))
+            continue
+        match = _LEGACY.match(f)
+        if match:
+            items.append({"id": int(match[1]), "text": match[2], "status": OPEN, "added_in": None, "resolved_in": None})
+        else:
+            unnumbered.append(f)
+    items.sort(key=lambda r: r["id"])
+
+    # hand written, numbered after the rest
+    last = items[-1]["id"] if items else 0
+    for n, text in enumerate(unnumbered, start=last + 1):
+        items.append({"id": n, "text": text, "status": OPEN, "added_in": None, "resolved_in": None})
+    return items
+
+
+class Todo:
+    """
+    The futures, ordered by id: lookups and inserts bisect.
+    """
+
+    def __init__(self, futures: list):
+        self.items = records(futures)
+        self.ids = [r["id"] for r in self.items]
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def get(self, future_id: int):
+        """
+        :param future_id: A future's id
+        :return: Its record, or None
+        """
+        i = bisect_left(self.ids, future_id)
+        if i < len(self.ids) and self.ids[i] == future_id:
+            return self.items[i]
+        return None
+
+    def last_id(self) -> int:
+        return self.ids[-1] if self.ids else 0
+
+    def add(self, future_id: int, text: str, version: str) -> dict:
+        """
+        Inserts a new open future.
+
+        :param future_id: A new id
+        :param text: The future's text
+        :param version: The version it was collected into, e.g. "v1.2.3"
+        :return: The record
+        """
+        record = {"id": future_id, "text": text, "status": OPEN, "added_in": version, "resolved_in": None}
+        i = bisect_left(self.ids, future_id)
+        if i < len(self.ids) and self.ids[i] == future_id:
+            raise ValueError(f"TODO: future {future_id} already exists")
+        self.ids.insert(i, future_id)
+        self.items.insert(i, record)
+        return record
+
+    def resolve(self, future_id: int, version: str) -> bool:
+        """
+        Marks a future resolved by a version.
+
+        :param future_id: The future's id
+        :param version: The version resolving it, e.g. "v1.2.3"
+        :return: False when there is no such future
+        """
+        record = self.get(future_id)
+        if record is None:
+            return False
+        if record["status"] != RESOLVED:
+            record.update(status=RESOLVED, resolved_in=version)
+        return True
+
+    def open_items(self) -> list:
+        return [r for r in self.items if r["status"] == OPEN]
+
+
+def collect(futures: list, texts: list, resolved: list, version: str, f_count: int) -> tuple:
+    """
+    Applies one collect to the futures: new ones added, "--done" ones resolved.
+
+    :param futures: doc_parts["futures"] as stored
+    :param texts: The new futures' texts, in collect order
+    :param resolved: Ids from done_ids(), in collect order
+    :param version: The version being collected, e.g. "v1.2.3"
+    :param f_count: app.f_count
+    :return: (the records to store, the new f_count, ids that didn't resolve anything)
+    """
+    todo = Todo(futures)
+    last = max(f_count, todo.last_id())
+    for last, text in enumerate(texts, start=last + 1):
+        todo.add(last, text, version)
+    unknown = [n for n in resolved if not todo.resolve(n, version)]
+    return todo.items, last, unknown
+
+
+def rendered(futures: list) -> list:
+    """
+    Returns the open futures as the changelog lists them.
+
+    :param futures: doc_parts["futures"] as stored
+    :return: "<id> - text" strings, by id
+    """
+    return [f"{r['id']} - {r['text']}" for r in records(futures) if r["status"] == OPEN]
+
+
+def format_todo(items: list, fmt: str = "md") -> str:
+    """
+    Formats future records as a markdown checklist, or JSON.
+
+    :param items: Future records
+    :param fmt: "md" or "json"
+    :return: The formatted text
+    """
+    if fmt == "json":
+        return json.dumps(items, indent=4)
+    if not items:
+        return "Nothing to do."
+    lines = [f"## TODO: {len(items)} open", ""]
+    lines += [f"- [ ] {r['id']} - {r['text']}" + (f" (since {r['added_in']})" if r["added_in"] else "") for r in items]
+    return "\n".join(lines)
@@ -1,9 +1,9 @@
 from pathlib import Path
 
 try:
-    from extras import load_json
+    from extras import load_config
 except:
-    from .extras import load_json
+    from .extras import load_config
 
 
 # with open("glog.json", "r", encoding="utf-8") as fs:
@@ -27,19 +27,37 @@ except:
 #         if path.parts == ():
 #             return Exception(f"File not found: {filename}")
         
-try:
-    # config_data = load_json(find_path("glog.json"))
-    config_data = load_json(Path.cwd() / "glog.json")
-
-    __version__ = "v" + ".".join(map(str, config_data["app"]["version_number"]))
-    __author__ = config_data["dev"]["developer"]
-    __author_email__ = config_data["dev"]["dev_email"]
-
-except Exception as e:
-    __version__ = "v0.0.0"
-    __author__ = "No Author"
-    __author_email__ = "No Email"
-
-    # raise Exception(f"VERSION: Error loading glog.json: {e}")
-    # print(f"LOAD_JSON: Error loading glog.json: {e}")
-
+# the version details are read from glog.json the first time one of them is
+# asked for, not when the package is imported, and through the same cached
+# load start_up uses.
+
+_FALLBACK = {
+    "__version__": "v0.0.0",
+    "__author__": "No Author",
+    "__author_email__": "No Email",
+}
+
+
+def _read_version() -> dict:
+    try:
+        # config_data = load_json(find_path("glog.json"))
+        config_data = load_config(Path.cwd() / "glog.json")
+
+        return {
+            "__version__": "v" + ".".join(map(str, config_data["app"]["version_number"])),
+            "__author__": config_data["dev"]["developer"],
+            "__author_email__": config_data["dev"]["dev_email"],
+        }
+
+    except Exception as e:
+        # raise Exception(f"VERSION: Error loading glog.json: {e}")
+        # print(f"LOAD_JSON: Error loading glog.json: {e}")
+        return dict(_FALLBACK)
+
+
+def __getattr__(name):
+    if name in _FALLBACK:
+        values = _read_version()
+        globals().update(values)
+        return values[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,348 @@
+# glog --watch: collect and regenerate whenever artifacts arrive.
+#
+# One warm process instead of a cold `glog -c` and `glog -g` per update.
+# DIR_OUTPUT (and its spool folder) are watched with inotify on Linux, or
+# by listing them every app.watch_poll_interval seconds anywhere else, or
+# when app.watch_backend is "poll" (network file systems don't always
+# deliver inotify events).
+#
+# Every change updates the pending state, the artifact files waiting in
+# DIR_OUTPUT plus the records appended to spools since they were last
+# read, without rescanning. Once at least app.watch_min_artifacts are
+# pending and no change came for app.watch_debounce seconds (or
+# app.watch_max_delay passed since the first change, for writers that
+# never pause) a cycle runs collect and then generate, and logs how long
+# after the first change the changelog was written.
+
+import errno
+import os
+import select
+import signal
+import struct
+import sys
+import time
+from pathlib import Path
+
+try:
+    from extras import load_config
+    from instrument import log, span
+    from spool import ROTATED_SUFFIX, SPOOL_SUFFIX, spool_dir
+except ImportError:
+    from .extras import load_config
+    from .instrument import log, span
+    from .spool import ROTATED_SUFFIX, SPOOL_SUFFIX, spool_dir
+
+DEBOUNCE = 0.5
+MAX_DELAY = 10.0
+POLL_INTERVAL = 1.0
+
+# from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_EVENT = struct.Struct("iIII")
+_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+
+class Pending:
+    """
+    The artifacts waiting to be collected, kept current from change events.
+    """
+
+    def __init__(self, data: dict):
+        self.folder = Path(data["paths"]["DIR_OUTPUT"])
+        self.pattern = data["app"]["atf_pattern"]
+        self.spool_folder = spool_dir(data)
+        self.spool_suffixes = (SPOOL_SUFFIX, ROTATED_SUFFIX)
+        self.files = set()
+        # spool name -> (bytes read, records counted)
+        self.spools = {}
+        self.first = None
+        self.last = None
+
+    def __len__(self) -> int:
+        return len(self.files) + sum(lines for _, lines in self.spools.values())
+
+    def _changed(self, grew: bool) -> None:
+        if grew:
+            self.last = time.monotonic()
+            if self.first is None:
+                self.first = self.last
+        elif not len(self):
+            # collected elsewhere, the next artifact starts a new wait
+            self.first = self.last = None
+
+    def resync(self) -> None:
+        """
+        Rebuilds the state from a listing of both folders.
+
+        :return: None
+        """
+        with os.scandir(self.folder) as entries:
+            self.files = {e.name for e in entries if self._is_artifact(e.name) and e.is_file()}
+        self.spools = {}
+        try:
+            names = os.listdir(self.spool_folder)
+        except FileNotFoundError:
+            names = []
+        for name in names:
+            self.spool_changed(name, grown=False)
+        self.first = self.last = None
+        self._changed(len(self) > 0)
+
+    def _is_artifact(self, name: str) -> bool:
+        # temp files being published are hidden
+        return name.endswith(self.pattern) and not name.startswith(".")
+
+    def file_changed(self, name: str) -> None:
+        """
+        Updates the state for a name in DIR_OUTPUT that was created, moved or removed.
+
+        :param name: The file name
+        :return: None
+        """
+        if not self._is_artifact(name):
+            return
+        if (self.folder / name).is_file():
+            if name not in self.files:
+                self.files.add(name)
+                self._changed(True)
+        else:
+            self.files.discard(name)
+            self._changed(False)
+
+    def spool_changed(self, name: str, grown: bool = True) -> None:
+        """
+        Counts the records appended to a spool since it was last read.
+
+        :param name: The file name in the spool folder
+        :param grown: Whether new records count as a change
+        :return: None
+        """
+        if not name.endswith(self.spool_suffixes):
+            return
+        offset, lines = self.spools.get(name, (0, 0))
+        try:
+            with open(self.spool_folder / name, "rb") as fs:
+                if os.fstat(fs.fileno()).st_size < offset:
+                    # a new spool under the old name
+                    offset, lines = 0, 0
+                fs.seek(offset)
+                tail = fs.read()
+        except FileNotFoundError:
+            self.spools.pop(name, None)
+            self._changed(False)
+            return
+        # only whole lines, a record being appended is counted next time
+        end = tail.rfind(b"\n") + 1
+        added = tail.count(b"\n", 0, end)
+        self.spools[name] = (offset + end, lines + added)
+        self._changed(grown and added > 0)
+
+
+class PollWatcher:
+    """
+    Lists DIR_OUTPUT and the spool folder every interval and reports what changed.
+    """
+
+    def __init__(self, pending: Pending, interval: float = POLL_INTERVAL):
+        self.pending = pending
+        self.interval = interval
+        self.seen = self._listing()
+
+    def _listing(self) -> dict:
+        seen = {}
+        for where, folder in (("files", self.pending.folder), ("spool", self.pending.spool_folder)):
+            try:
+                with os.scandir(folder) as entries:
+                    for e in entries:
+                        if e.is_file():
+                            st = e.stat()
+                            seen[(where, e.name)] = (st.st_size, st.st_mtime_ns)
+            except FileNotFoundError:
+                pass
+        return seen
+
+    def wait(self, timeout) -> list:
+        """
+        Sleeps until the next listing, or timeout if that comes first.
+
+        :param timeout: Seconds, None to wait for the next listing
+        :return: (where, name) pairs, where is "files" or "spool"
+        """
+        time.sleep(self.interval if timeout is None else min(timeout, self.interval))
+        seen = self._listing()
+        changed = [key for key in seen.keys() | self.seen.keys() if seen.get(key) != self.seen.get(key)]
+        self.seen = seen
+        return changed
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWatcher:
+    """
+    Reports changes in DIR_OUTPUT and the spool folder as the kernel sees them.
+    """
+
+    def __init__(self, pending: Pending):
+        import ctypes
+        import ctypes.util
+
+        self.pending = pending
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watches = {}
+        self._add(pending.folder, "files")
+        self._add(pending.spool_folder, "spool")
+
+    def _add(self, folder: Path, where: str) -> bool:
+        import ctypes
+
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(folder), _MASK)
+        if wd < 0:
+            if ctypes.get_errno() == errno.ENOENT and where == "spool":
+                # no spool yet, its creation in DIR_OUTPUT is watched
+                return False
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {folder}")
+        self.watches[wd] = where
+        return True
+
+    def wait(self, timeout) -> list:
+        """
+        Waits for events, or for timeout.
+
+        :param timeout: Seconds, None to wait for as long as it takes
+        :return: (where, name) pairs, where is "files" or "spool", or "resync"
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+
+        changed = []
+        while True:
+            try:
+                buf = os.read(self.fd, 1 << 16)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(buf):
+                wd, mask, _, size = _EVENT.unpack_from(buf, offset)
+                name = os.fsdecode(buf[offset + _EVENT.size : offset + _EVENT.size + size].rstrip(b"\0"))
+                offset += _EVENT.size + size
+                if mask & IN_Q_OVERFLOW:
+                    changed.append(("resync", ""))
+                    continue
+                where = self.watches.get(wd)
+                if where == "files" and mask & IN_ISDIR:
+                    if name == self.pending.spool_folder.name and mask & (IN_CREATE | IN_MOVED_TO):
+                        self._add(self.pending.spool_folder, "spool")
+                        changed.append(("resync", ""))
+                elif where is not None:
+                    changed.append((where, name))
+        return changed
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def open_watcher(data: dict, pending: Pending):
+    """
+    Returns the watcher app.watch_backend asks for: "inotify", "poll" or "auto".
+
+    :param data: The running configuration
+    :param pending: The state the watcher reports to
+    :return: An InotifyWatcher or a PollWatcher
+    """
+    backend = data["app"].get("watch_backend", "auto")
+    interval = data["app"].get("watch_poll_interval", POLL_INTERVAL)
+    if backend == "poll" or (backend == "auto" and not sys.platform.startswith("linux")):
+        return PollWatcher(pending, interval)
+    try:
+        return InotifyWatcher(pending)
+    except (OSError, AttributeError) as e:
+        if backend == "inotify":
+            raise
+        log.warning(f"WATCH: inotify unavailable ({e}), polling every {interval}s")
+        return PollWatcher(pending, interval)
+
+
+def _cycle(config_file: str, collect, generate, pending: Pending, n: int) -> None:
+    waiting = len(pending)
+    started = time.perf_counter()
+    with span("watch_collect"):
+        collected = collect(load_config(config_file))
+    collected_at = time.perf_counter()
+    written = False
+    if collected:
+        with span("watch_generate"):
+            written = generate(load_config(config_file))
+    done = time.perf_counter()
+
+    latency = time.monotonic() - pending.first if pending.first is not None else 0.0
+    log.info(
+        f"WATCH: cycle {n}: {waiting} artifacts, collect {(collected_at - started) * 1000:.1f} ms, "
+        f"generate {(done - collected_at) * 1000:.1f} ms, changelog {'written' if written else 'unchanged'} "
+        f"{latency * 1000:.0f} ms after the first change"
+    )
+
+
+def watch(data: dict, collect, generate) -> None:
+    """
+    Watches for artifacts and collects and generates until interrupted.
+
+    The commands are passed in by glog, so this module doesn't import it.
+
+    :param data: The running configuration
+    :param collect: collect_changelogs(data) -> bool
+    :param generate: write_report(data) -> bool
+    :return: None
+    """
+    app = data["app"]
+    debounce = app.get("watch_debounce", DEBOUNCE)
+    max_delay = app.get("watch_max_delay", MAX_DELAY)
+    min_artifacts = max(1, app.get("watch_min_artifacts", 1))
+    config_file = data["paths"]["FILE_CONFIG"]
+
+    pending = Pending(data)
+    pending.resync()
+    watcher = open_watcher(data, pending)
+    # SIGTERM stops the watch like Ctrl-C does
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    log.info(f"WATCH: watching {pending.folder} ({type(watcher).__name__}), {len(pending)} artifacts pending")
+
+    cycles = 0
+    try:
+        while True:
+            timeout = None
+            if len(pending) >= min_artifacts and pending.first is not None:
+                due = min(pending.last + debounce, pending.first + max_delay)
+                timeout = due - time.monotonic()
+                if timeout <= 0:
+                    cycles += 1
+                    _cycle(config_file, collect, generate, pending, cycles)
+                    # whatever arrived during the cycle is still waiting
+                    pending.resync()
+                    continue
+
+            for where, name in watcher.wait(timeout):
+                if where == "files":
+                    pending.file_changed(name)
+                elif where == "spool":
+                    pending.spool_changed(name)
+                else:
+                    pending.resync()
+    except KeyboardInterrupt:
+        log.info(f"WATCH: stopped after {cycles} cycles")
+    finally:
+        watcher.close()
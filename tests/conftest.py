@@ -0,0 +1,125 @@
+# shared fixtures: throwaway glog projects under pytest's tmp_path.
+#
+# The tests import gslogger from src/ and reuse the benchmarks' synthetic
+# project and stress helpers, so nothing has to be installed.
+
+import json
+import shutil
+import sys
+from collections import Counter
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+import synthetic  # noqa: E402
+
+
+def record(version: list, logs: dict, contributors: str = "Alice <alice@example.com>", date: str = "2024-01-01") -> dict:
+    """
+    :return: A stored version record, as collect writes them
+    """
+    return {
+        "build_number": version[2],
+        "contributors": contributors,
+        "date": date,
+        "logs": logs,
+        "version_number": version,
+    }
+
+
+def messages(data: dict) -> Counter:
+    """
+    :return: How often each stored message occurs, lowercased as collect stores them
+    """
+    from gslogger import store
+
+    seen = Counter()
+    for version in store.iter_versions(data):
+        for logs in version["logs"].values():
+            seen.update(m.lower() for m in logs)
+    return seen
+
+
+def write_store(path: Path, records: list) -> Path:
+    """
+    Writes a log_store.json layout file, for store.import_json.
+
+    :return: path
+    """
+    path.write_text(json.dumps({"doc_parts": {"futures": []}, "details": records}), encoding="utf-8")
+    return path
+
+
+# five versions by three contributors, for the query, search and stats tests
+HISTORY = [
+    record([0, 0, 1], {"ADDED": ["Render cache per segment"]}, date="2024-01-01"),
+    record([0, 0, 2], {"FIXED": ["Crash on empty store"], "ADDED": ["Frobnicator support"]},
+           "Bob <bob@example.com>", "2024-02-10"),
+    record([0, 0, 3], {"CHANGED": ["Search tokens are casefolded"]},
+           "Alice <alice@example.com>, Bob <bob@example.com>", "2024-03-05"),
+    record([0, 1, 0], {"FIXED": ["Render crash with lzma archives"]}, "Carol <carol@example.com>", "2024-04-01"),
+    record([0, 1, 1], {"SECURITY": ["Escape html in render output"]}, "Bob <bob@example.com>", "2024-04-20"),
+]
+
+# two stores of the same size, for indexes that must not mistake one for the other
+SAME_SIZE = (
+    [
+        record([0, 0, 1], {"ADDED": ["Apple tart"]}),
+        record([0, 0, 2], {"ADDED": ["Banana split"]}),
+    ],
+    [
+        record([0, 0, 1], {"ADDED": ["Cherry pie"]}, "Bob <bob@example.com>"),
+        record([0, 0, 2], {"ADDED": ["Durian cake"]}, "Bob <bob@example.com>"),
+    ],
+)
+
+
+@pytest.fixture(params=["segments", "sqlite"])
+def engine(request) -> str:
+    return request.param
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch, engine):
+    """
+    An empty project on each store engine, the working directory for the test.
+    """
+    monkeypatch.chdir(tmp_path)
+    return synthetic.make_project(tmp_path, store_engine=engine)
+
+
+@pytest.fixture
+def repo_project(tmp_path, monkeypatch, engine):
+    """
+    A copy of this repository's own glog.json and log store, whose rendered
+    changelog.md is checked in.
+    """
+    config = json.loads((ROOT / "glog.json").read_text(encoding="utf-8"))
+    config["app"]["store_engine"] = engine
+    config["paths"] = {
+        "CWD": str(tmp_path),
+        "DIR_OUTPUT": str(tmp_path / "ch-logs"),
+        "FILE_CONFIG": str(tmp_path / "glog.json"),
+        "FILE_LOG": str(tmp_path / "ch-logs" / "log_store.json"),
+        "FILE_OUTPUT": str(tmp_path / "changelog.md"),
+    }
+    (tmp_path / "ch-logs").mkdir()
+    shutil.copy(ROOT / "ch-logs" / "log_store.json", tmp_path / "ch-logs" / "log_store.json")
+    (tmp_path / "glog.json").write_text(json.dumps(config, indent=4), encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+    return config
+
+
+@pytest.fixture
+def history(project, tmp_path):
+    """
+    A project on each store engine holding HISTORY.
+    """
+    from gslogger import store
+
+    store.import_json(project, write_store(tmp_path / "history.json", HISTORY))
+    return project
@@ -0,0 +1,47 @@
+# glog add --bulk: every entry is checked before anything is written.
+
+import re
+from pathlib import Path
+
+import pytest
+
+from gslogger import glog
+
+
+@pytest.mark.parametrize(
+    "bad, error",
+    [
+        ({"type": "FIXED", "message": 42}, '"message" must be a string, got 42'),
+        ({"type": "FIXED", "message": None}, '"message" must be a string, got None'),
+        ({"type": None, "message": "a long enough message"}, '"type" must be a string'),
+        ({"type": "FIXED", "message": "a long enough message", "date": 2024}, '"date" must be a string'),
+        (5, 'Expected an object with "type" and "message"'),
+        ({"type": "NOPE", "message": "a long enough message"}, "Unknown log type 'NOPE'"),
+        ({"type": "FIXED", "message": "short"}, "Entry must be at least 10 characters long"),
+        ({"type": "FIXED", "message": "a long enough message", "contributor": "Bob\nEvil"},
+         "Contributor must be a single line"),
+        ({"type": "FIXED", "message": "a long enough message", "date": "../../x"},
+         "\"date\" must be YYYY-MM-DD-HH-MM-SS, got '../../x'"),
+        ({"type": "FIXED", "message": "a long enough message", "date": "2024-13-01-00-00-00"},
+         '"date" must be YYYY-MM-DD-HH-MM-SS'),
+    ],
+)
+def test_bad_entry_is_reported_and_nothing_written(project, bad, error):
+    entries = [{"type": "ADDED", "message": "a good entry first"}, bad]
+    with pytest.raises(ValueError, match="^" + re.escape(f"ADD: entry 2: {error}")):
+        glog.add_artifacts(project, entries)
+    assert not list(Path(project["paths"]["DIR_OUTPUT"]).glob("*.txt"))
+
+
+def test_entries_keep_their_order(project):
+    files = glog.add_artifacts(
+        project,
+        [
+            {"type": "fixed", "message": "first of the batch", "contributor": "Bob <bob@example.com>"},
+            ("ADDED", "second of the batch"),
+        ],
+    )
+    assert sorted(files) == files
+    assert Path(files[0]).read_text(encoding="utf-8").splitlines()[1:] == [
+        "FIXED", "first of the batch", "Bob <bob@example.com>",
+    ]
@@ -0,0 +1,45 @@
+# collect: no artifact lost or collected twice under concurrent writers and
+# collectors sharing the collect lease.
+
+import multiprocessing
+from pathlib import Path
+
+import pytest
+
+import stress_concurrency
+from conftest import messages
+from gslogger import glog
+
+
+@pytest.mark.parametrize("artifact_format", ["files", "spool"])
+def test_concurrent_writers_and_collectors_lose_nothing(tmp_path, monkeypatch, artifact_format):
+    writers, per_writer = 4, 50
+    monkeypatch.chdir(tmp_path)
+    data = stress_concurrency.synthetic.make_project(tmp_path, artifact_format=artifact_format)
+
+    done = multiprocessing.Event()
+    rounds = multiprocessing.Value("i", 0)
+    collectors = [
+        multiprocessing.Process(target=stress_concurrency.collector, args=(str(tmp_path), done, rounds))
+        for _ in range(2)
+    ]
+    producers = [
+        multiprocessing.Process(target=stress_concurrency.writer, args=(str(tmp_path), n, per_writer))
+        for n in range(writers)
+    ]
+    for p in collectors + producers:
+        p.start()
+    for p in producers:
+        p.join()
+    done.set()
+    for p in collectors:
+        p.join()
+    assert all(p.exitcode == 0 for p in collectors + producers)
+
+    glog.collect_changelogs(glog.load_config(data["paths"]["FILE_CONFIG"]))
+
+    seen = messages(data)
+    expected = {f"writer {n} artifact {i} stress" for n in range(writers) for i in range(per_writer)}
+    assert set(seen) == expected
+    assert max(seen.values()) == 1
+    assert not list(Path(data["paths"]["DIR_OUTPUT"]).glob("*.txt"))
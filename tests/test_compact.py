@@ -0,0 +1,53 @@
+# glog --compact: old segments moved into compressed archives, and every
+# reader (iteration, version lookups, queries, the changelog) unchanged.
+
+import pytest
+
+import synthetic
+from gslogger import jin, query, store
+
+
+@pytest.fixture(params=["gzip", "lzma"])
+def history(tmp_path, monkeypatch, request):
+    monkeypatch.chdir(tmp_path)
+    data = synthetic.make_project(tmp_path, compact_codec=request.param)
+    synthetic.make_store(data, 60, segment_size=10)
+    return data
+
+
+def _names(data: dict) -> list:
+    return [s["name"] for s in store.load_manifest(data)["segments"]]
+
+
+def test_compacted_store_reads_the_same(history):
+    before = list(store.iter_versions(history))
+    queried = query.run_query(history, versions="v0.0.5..v0.0.25", types=["ADDED"])
+    jin.write_report(history)
+    with open(history["paths"]["FILE_OUTPUT"], "rb") as fs:
+        rendered = fs.read()
+
+    assert store.compact(history, [0, 0, 30]) == 3
+    ext = ".jsonl.gz" if history["app"]["compact_codec"] == "gzip" else ".jsonl.xz"
+    names = _names(history)
+    assert all(n.startswith("arc-") and n.endswith(ext) for n in names[:3])
+    assert all(n.startswith("seg-") for n in names[3:])
+    assert not (store.store_dir(history) / "seg-000000.jsonl").exists()
+
+    assert list(store.iter_versions(history)) == before
+    assert store.read_versions(history, [[0, 0, 7], [0, 0, 42]]) == [before[-43], before[-8]]
+    assert query.run_query(history, versions="v0.0.5..v0.0.25", types=["ADDED"]) == queried
+    assert jin.write_report(history) is False
+    (store.store_dir(history) / jin.RENDER_CACHE).unlink()
+    jin.write_report(history)
+    with open(history["paths"]["FILE_OUTPUT"], "rb") as fs:
+        assert fs.read() == rendered
+
+    # already archived, nothing left to do
+    assert store.compact(history, [0, 0, 30]) == 0
+
+
+def test_compact_keeps_the_newest_versions_plain(history):
+    history["app"]["compact_keep"] = 25
+    # segments with at least 25 versions after them, never the newest
+    assert store.compact(history) == 3
+    assert [store.is_archived(n) for n in _names(history)] == [True] * 3 + [False] * 3
@@ -0,0 +1,77 @@
+# duplicate artifacts: retries are caught, recurring entries and re-planned
+# futures are not.
+
+from gslogger import glog, store
+
+
+def _collect(data: dict) -> bool:
+    return glog.collect_changelogs(glog.load_config(data["paths"]["FILE_CONFIG"]))
+
+
+def _entries(data: dict) -> list:
+    return [(r["version_number"], t, m) for r in store.iter_versions(data) for t, ms in r["logs"].items() for m in ms]
+
+
+def _configure(data: dict, **app) -> dict:
+    config = glog.load_config(data["paths"]["FILE_CONFIG"])
+    config["app"].update(app)
+    glog.save_json(config, config["paths"]["FILE_CONFIG"])
+    return config
+
+
+def test_duplicates_are_kept_by_default(project):
+    glog.write_artifact(project, "FIXED", "crash on an empty store")
+    assert _collect(project)
+    # only reported, written and collected like before
+    assert glog.write_artifact(project, "FIXED", "Crash on an  empty store") is not None
+    assert _collect(project)
+    assert [e[0] for e in _entries(project)] == [[0, 0, 2], [0, 0, 1]]
+
+
+def test_retried_artifact_is_skipped(project):
+    config = _configure(project, dedup_policy="skip")
+    assert glog.write_artifact(config, "FIXED", "crash on an empty store") is not None
+    # before the first collect there is no index, collect catches the copy
+    glog.write_artifact(config, "FIXED", "Crash on an  empty store")
+    assert _collect(config)
+    assert len(_entries(config)) == 1
+
+    # a retry after the collect isn't even written
+    assert glog.write_artifact(config, "FIXED", "crash on an empty store") is None
+    assert not _collect(config)
+
+
+def test_recurring_entry_outside_the_window_is_collected(project):
+    config = _configure(project, dedup_policy="skip", dedup_window=2)
+
+    glog.write_artifact(config, "CHANGED", "updated dependencies")
+    assert _collect(project)
+    glog.write_artifact(config, "ADDED", "search command")
+    assert _collect(project)
+
+    # v0.0.1 is still one of the 2 newest versions
+    assert glog.write_artifact(config, "CHANGED", "updated dependencies") is None
+    glog.write_artifact(config, "ADDED", "stats command")
+    assert _collect(project)
+
+    assert glog.write_artifact(config, "CHANGED", "updated dependencies") is not None
+    assert _collect(project)
+    assert [e for e in _entries(project) if e[1] == "CHANGED"] == [
+        ([0, 0, 4], "CHANGED", "Updated dependencies"),
+        ([0, 0, 1], "CHANGED", "Updated dependencies"),
+    ]
+
+
+def test_resolved_future_can_be_planned_again(project):
+    config = _configure(project, dedup_policy="skip")
+    glog.write_artifact(config, "FUTURE UPDATES", "port to windows")
+    assert _collect(config)
+    assert glog.write_artifact(config, "FUTURE UPDATES", "port to windows") is None
+
+    glog.write_artifact(config, "FIXED", "ported to windows --done 1")
+    assert _collect(config)
+
+    assert glog.write_artifact(config, "FUTURE UPDATES", "port to windows") is not None
+    assert _collect(config)
+    futures = store.load_manifest(config)["doc_parts"]["futures"]
+    assert [(f["id"], f["status"]) for f in futures] == [(1, "resolved"), (2, "open")]
@@ -0,0 +1,36 @@
+# glog --from-git: commits written as artifacts are collected in commit order.
+
+import os
+import subprocess
+
+from gslogger import glog, store
+
+
+def _git(repo, *args, env=None):
+    subprocess.run(["git", *args], cwd=repo, check=True, capture_output=True, env=env)
+
+
+def test_commits_of_one_second_keep_their_order(project, tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    _git(repo, "init", "-q")
+    env = dict(
+        os.environ,
+        GIT_AUTHOR_NAME="Dev",
+        GIT_AUTHOR_EMAIL="dev@example.com",
+        GIT_COMMITTER_NAME="Dev",
+        GIT_COMMITTER_EMAIL="dev@example.com",
+        GIT_AUTHOR_DATE="2024-05-01T12:00:00",
+        GIT_COMMITTER_DATE="2024-05-01T12:00:00",
+    )
+    for message in ("fix: first crash fixed", "feat: second, a new feature\n\n--f", "fix: third crash fixed"):
+        _git(repo, "commit", "-q", "--allow-empty", "-m", message, env=env)
+
+    project["paths"]["CWD"] = str(repo)
+    assert glog.backfill_from_git(project, "HEAD") == 3
+    assert glog.collect_changelogs(project)
+
+    # fix, feature, fix: v0.0.1, v0.1.0, v0.1.1 rather than the feature first
+    record = next(store.iter_versions(project))
+    assert record["version_number"] == [0, 1, 1]
+    assert record["logs"]["FIXED"] == ["First crash fixed", "Third crash fixed"]
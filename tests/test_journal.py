@@ -0,0 +1,58 @@
+# collect journal: an interrupted collect is finished or undone by
+# recover(), and nothing is lost either way.
+
+from pathlib import Path
+
+import pytest
+
+from conftest import messages
+from gslogger import glog, journal
+
+
+def _artifacts(data: dict) -> None:
+    glog.write_artifact(data, "ADDED", "first recovered entry")
+    glog.write_artifact(data, "FIXED", "second recovered entry")
+
+
+def test_crash_after_commit_point_rolls_forward(project, monkeypatch):
+    _artifacts(project)
+
+    def crash(entry):
+        raise SystemExit("crash after the commit point")
+
+    monkeypatch.setattr(journal, "_apply", crash)
+    with pytest.raises(SystemExit):
+        glog.collect_changelogs(project)
+    monkeypatch.undo()
+    assert journal.journal_path(project).exists()
+
+    assert journal.recover(project) is True
+    assert not journal.journal_path(project).exists()
+    assert set(messages(project)) == {"first recovered entry", "second recovered entry"}
+    assert glog.load_config(project["paths"]["FILE_CONFIG"])["app"]["version_number"] == [0, 0, 2]
+    assert not list(Path(project["paths"]["DIR_OUTPUT"]).glob("*.txt"))
+
+
+def test_crash_before_commit_point_rolls_back(project, monkeypatch):
+    _artifacts(project)
+    write_journal = journal._write_journal
+
+    def crash(target, entry):
+        if entry["state"] == "committed":
+            raise SystemExit("crash before the commit point")
+        write_journal(target, entry)
+
+    monkeypatch.setattr(journal, "_write_journal", crash)
+    with pytest.raises(SystemExit):
+        glog.collect_changelogs(project)
+    monkeypatch.undo()
+
+    assert journal.recover(project) is False
+    folder = Path(project["paths"]["DIR_OUTPUT"])
+    assert not list(folder.rglob("*" + journal.STAGE_SUFFIX))
+    assert len(list(folder.glob("*.txt"))) == 2
+    assert not messages(project)
+
+    # nothing was lost, the next collect picks the artifacts up
+    assert glog.collect_changelogs(glog.load_config(project["paths"]["FILE_CONFIG"]))
+    assert set(messages(project)) == {"first recovered entry", "second recovered entry"}
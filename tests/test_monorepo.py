@@ -0,0 +1,49 @@
+# glog --all: every project under a root collected and generated on a
+# process pool, a broken one reported without holding up the others.
+
+import json
+
+import synthetic
+from gslogger import glog, jin, monorepo
+
+
+def _package(root, name: str, artifacts: int) -> dict:
+    folder = root / "packages" / name
+    folder.mkdir(parents=True)
+    data = synthetic.make_project(folder)
+    for n in range(artifacts):
+        glog.write_artifact(data, "ADDED", f"{name} feature number {n}")
+    return data
+
+
+def test_projects_are_found_and_skipped_folders_are_not(tmp_path):
+    _package(tmp_path, "a", 0)
+    _package(tmp_path, "b", 0)
+    for skipped in ("node_modules/c", ".hidden/d", "packages/a/ch-logs/e"):
+        (tmp_path / skipped).mkdir(parents=True)
+        (tmp_path / skipped / monorepo.CONFIG).write_text("{}", encoding="utf-8")
+
+    assert monorepo.discover_projects(tmp_path) == [tmp_path / "packages" / "a", tmp_path / "packages" / "b"]
+
+
+def test_every_project_is_collected_and_generated(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    _package(tmp_path, "a", 2)
+    _package(tmp_path, "b", 1)
+    _package(tmp_path, "c", 0)
+    (tmp_path / "packages" / "broken").mkdir()
+    (tmp_path / "packages" / "broken" / monorepo.CONFIG).write_text("{", encoding="utf-8")
+
+    assert monorepo.run_all(tmp_path, glog.collect_changelogs, jin.write_report, jobs=2, fmt="json") is False
+    results = {r["project"]: r for r in json.loads(capsys.readouterr().out)["projects"]}
+    assert sorted(results) == ["packages/a", "packages/b", "packages/broken", "packages/c"]
+
+    assert results["packages/a"]["ok"] and results["packages/a"]["collected"] is True
+    assert results["packages/b"]["collected"] is True
+    assert results["packages/c"]["collected"] is False and results["packages/c"]["version"] == "v0.0.0"
+    # a patch version per artifact
+    assert results["packages/a"]["version"] == "v0.0.2" and results["packages/b"]["version"] == "v0.0.1"
+    assert not results["packages/broken"]["ok"] and results["packages/broken"]["error"]
+
+    changelog = (tmp_path / "packages" / "a" / "changelog.md").read_text(encoding="utf-8")
+    assert "A feature number 0" in changelog and "A feature number 1" in changelog
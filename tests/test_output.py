@@ -0,0 +1,28 @@
+# glog -g: the markdown changelog is byte for byte what it always was, on
+# every store engine, however small the write buffer it streams through.
+
+from gslogger import jin
+
+from conftest import ROOT
+
+
+def _rendered(data: dict) -> bytes:
+    with open(data["paths"]["FILE_OUTPUT"], "rb") as fs:
+        return fs.read()
+
+
+def test_changelog_is_byte_identical(repo_project):
+    assert jin.write_report(repo_project) is True
+    assert _rendered(repo_project) == (ROOT / "changelog.md").read_bytes()
+
+    # nothing changed, nothing written
+    assert jin.write_report(repo_project) is False
+    assert _rendered(repo_project) == (ROOT / "changelog.md").read_bytes()
+
+
+def test_small_write_buffer_streams_the_same_changelog(repo_project, tmp_path):
+    streamed = tmp_path / "streamed.md"
+    assert jin.write_report(repo_project, target=streamed, buffer_size=64) is True
+    assert streamed.read_bytes() == (ROOT / "changelog.md").read_bytes()
+    # written to a stage file and swapped in whole
+    assert not list(tmp_path.glob("*.tmp"))
@@ -0,0 +1,79 @@
+# glog --query: results on both store engines, and the query index
+# following out-of-order inserts and imports.
+
+import subprocess
+import sys
+
+import pytest
+
+import synthetic
+from conftest import HISTORY, ROOT, SAME_SIZE, write_store
+from gslogger import query, store
+
+
+def _versions(records: list) -> list:
+    return [r["version_number"] for r in records]
+
+
+def test_query_filters(history):
+    assert _versions(query.run_query(history)) == [r["version_number"] for r in reversed(HISTORY)]
+    assert _versions(query.run_query(history, versions="v0.0.2..v0.1.0")) == [[0, 1, 0], [0, 0, 3], [0, 0, 2]]
+    assert _versions(query.run_query(history, versions="v0.1.0..")) == [[0, 1, 1], [0, 1, 0]]
+    assert _versions(query.run_query(history, dates="2024-02-01..2024-03-31")) == [[0, 0, 3], [0, 0, 2]]
+    assert _versions(query.run_query(history, contributor="carol")) == [[0, 1, 0]]
+    assert _versions(query.run_query(history, contributor="bob", versions="..v0.0.3")) == [[0, 0, 3], [0, 0, 2]]
+
+    fixed = query.run_query(history, types=["fixed"])
+    assert _versions(fixed) == [[0, 1, 0], [0, 0, 2]]
+    assert all(list(r["logs"]) == ["FIXED"] for r in fixed)
+
+
+def test_query_follows_an_out_of_order_insert(project, tmp_path):
+    store.import_json(project, write_store(tmp_path / "gap.json", [HISTORY[0], HISTORY[2]]))
+    assert _versions(query.run_query(project, versions="v0.0.2..v0.0.3")) == [[0, 0, 3]]
+
+    store.append_version(project, HISTORY[1])
+    assert _versions(query.run_query(project, versions="v0.0.3")) == [[0, 0, 3]]
+    assert _versions(query.run_query(project, versions="v0.0.2")) == [[0, 0, 2]]
+    assert _versions(query.run_query(project)) == [[0, 0, 3], [0, 0, 2], [0, 0, 1]]
+
+
+def test_query_follows_an_import_of_the_same_size(project, tmp_path):
+    store.import_json(project, write_store(tmp_path / "first.json", SAME_SIZE[0]))
+    assert query.run_query(project, versions="v0.0.1")[0]["logs"] == {"ADDED": ["Apple tart"]}
+
+    store.import_json(project, write_store(tmp_path / "second.json", SAME_SIZE[1]))
+    assert query.run_query(project, versions="v0.0.1")[0]["logs"] == {"ADDED": ["Cherry pie"]}
+
+
+def test_bad_range_is_reported(project):
+    with pytest.raises(ValueError, match="^QUERY: notaversion is not a version like v0.2.40$"):
+        query.run_query(project, versions="notaversion")
+
+    done = subprocess.run(
+        [sys.executable, str(ROOT / "src" / "gslogger" / "glog.py"), "-q", "--versions", "notaversion"],
+        capture_output=True,
+        text=True,
+    )
+    assert done.returncode == 1
+    assert "QUERY: notaversion is not a version" in done.stdout and "Traceback" not in done.stderr
+
+
+def test_a_query_reads_only_what_its_filters_point_at(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    data = synthetic.make_project(tmp_path)
+    synthetic.make_store(data, 600, segment_size=100)
+    query.run_query(data)
+
+    read = []
+    read_json = query._read_json
+
+    def spy(target):
+        read.append(target.name)
+        return read_json(target)
+
+    monkeypatch.setattr(query, "_read_json", spy)
+    found = query.run_query(data, versions="v0.2.10..v0.2.20", types=["FIXED"])
+    assert found and all(list(r["logs"]) == ["FIXED"] for r in found)
+    # the meta, the FIXED postings and the one segment holding v0.2.x
+    assert sorted(read) == sorted([query.META, "s000002.json", query.Index(tmp_path)._file(("types", "FIXED")).name])
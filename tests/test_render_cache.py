@@ -0,0 +1,27 @@
+# render cache: a changelog rendered from cached blocks is the one a fresh
+# render writes, after appends and backfills alike.
+
+from gslogger import jin, store
+
+from conftest import record
+
+
+def _rendered(data: dict) -> bytes:
+    with open(data["paths"]["FILE_OUTPUT"], "rb") as fs:
+        return fs.read()
+
+
+def test_cached_render_matches_a_fresh_one(repo_project, tmp_path):
+    jin.write_report(repo_project)
+    store.append_version(
+        repo_project, record([0, 2, 73], {"FIXED": ["Cached blocks stay in order"]}, date="2024-10-01")
+    )
+    store.append_version(repo_project, record([0, 1, 5], {"ADDED": ["An older version, backfilled"]}))
+    assert jin.write_report(repo_project) is True
+    cached = _rendered(repo_project)
+
+    fresh = tmp_path / "fresh.md"
+    (store.store_dir(repo_project) / jin.RENDER_CACHE).unlink()
+    jin.write_report(repo_project, target=fresh)
+    assert cached == fresh.read_bytes()
+    assert b"Cached blocks stay in order" in cached and b"An older version, backfilled" in cached
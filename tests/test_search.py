@@ -0,0 +1,32 @@
+# glog --search: every term matched as a prefix, filtered by version range
+# and type, on both store engines.
+
+import pytest
+
+from conftest import SAME_SIZE, write_store
+from gslogger import search, store
+
+
+def test_search(history):
+    found = search.search(history, "render")
+    assert [(r["version"], r["type"]) for r in found] == [([0, 1, 1], "SECURITY"), ([0, 1, 0], "FIXED"), ([0, 0, 1], "ADDED")]
+
+    # every term, each as a prefix
+    assert [r["message"] for r in search.search(history, "rend cra")] == ["Render crash with lzma archives"]
+    assert [r["version"] for r in search.search(history, "render", ([0, 0, 2], [0, 1, 0]))] == [[0, 1, 0]]
+    assert [r["version"] for r in search.search(history, "crash", types=["FIXED"])] == [[0, 1, 0], [0, 0, 2]]
+    assert search.search(history, "render", types=["CHANGED"]) == []
+    assert search.search(history, "nothing") == []
+    with pytest.raises(ValueError):
+        search.search(history, "?")
+
+
+
+
+def test_search_follows_an_import_of_the_same_size(project, tmp_path):
+    store.import_json(project, write_store(tmp_path / "first.json", SAME_SIZE[0]))
+    assert [r["message"] for r in search.search(project, "apple")] == ["Apple tart"]
+
+    store.import_json(project, write_store(tmp_path / "second.json", SAME_SIZE[1]))
+    assert search.search(project, "apple") == []
+    assert [r["message"] for r in search.search(project, "cherry")] == ["Cherry pie"]
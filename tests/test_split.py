@@ -0,0 +1,44 @@
+# app.output_split: one page per version line next to an index page, only
+# the page holding new versions rewritten, and "none" removing the pages.
+
+from conftest import record
+from gslogger import jin, store
+
+
+def _read(path) -> str:
+    return path.read_text(encoding="utf-8")
+
+
+def test_split_by_minor(history, tmp_path):
+    history["app"]["output_split"] = "minor"
+    assert jin.write_report(history) is True
+
+    index, pages = tmp_path / "changelog.md", tmp_path / "changelog"
+    assert sorted(p.name for p in pages.iterdir()) == ["v0.0.md", "v0.1.md"]
+    assert "- [v0.1](changelog/v0.1.md) | v0.1.0 - v0.1.1 | 2 versions | 2024-04-20" in _read(index)
+    assert "- [v0.0](changelog/v0.0.md) | v0.0.1 - v0.0.3 | 3 versions | 2024-03-05" in _read(index)
+    assert "## VERSION: v0.0.2 |" in _read(pages / "v0.0.md")
+    assert "## VERSION: v0.0.2 |" not in _read(pages / "v0.1.md")
+    assert "[All versions](../changelog.md)" in _read(pages / "v0.1.md")
+
+    # nothing changed, nothing written
+    assert jin.write_report(history) is False
+
+    # a new version rewrites its own page only
+    old_page = (pages / "v0.0.md").stat().st_mtime_ns
+    store.append_version(history, record([0, 1, 2], {"ADDED": ["Pages per version line"]}, date="2024-05-01"))
+    assert jin.write_report(history) is True
+    assert "## VERSION: v0.1.2 |" in _read(pages / "v0.1.md")
+    assert "v0.1.0 - v0.1.2 | 3 versions | 2024-05-01" in _read(index)
+    assert (pages / "v0.0.md").stat().st_mtime_ns == old_page
+
+
+def test_back_to_one_file(history, tmp_path):
+    history["app"]["output_split"] = "major"
+    jin.write_report(history)
+    assert sorted(p.name for p in (tmp_path / "changelog").iterdir()) == ["v0.md"]
+
+    history["app"]["output_split"] = "none"
+    assert jin.write_report(history) is True
+    assert not (tmp_path / "changelog").exists()
+    assert "## VERSION: v0.0.1 |" in _read(tmp_path / "changelog.md")
@@ -0,0 +1,43 @@
+# spool: a spool a writer still holds open is rotated once it's free, or
+# left for the next collect.
+
+import os
+
+from conftest import messages
+from gslogger import glog, spool
+
+
+def _busy_spools(monkeypatch, times: int) -> None:
+    # a spool a writer has open can't be renamed on windows
+    replace = os.replace
+    left = [times]
+
+    def busy(src, dst):
+        if str(src).endswith(spool.SPOOL_SUFFIX) and left[0]:
+            left[0] -= 1
+            raise PermissionError(13, "The process cannot access the file", str(src))
+        replace(src, dst)
+
+    monkeypatch.setattr(os, "replace", busy)
+    monkeypatch.setattr(spool, "ROTATE_WAIT", 0)
+
+
+def test_spool_in_use_is_rotated_once_free(project, monkeypatch):
+    project["app"]["artifact_format"] = "spool"
+    glog.write_artifact(project, "ADDED", "spooled while in use")
+    _busy_spools(monkeypatch, spool.ROTATE_TRIES - 1)
+
+    assert glog.collect_changelogs(project)
+    assert set(messages(project)) == {"spooled while in use"}
+
+
+def test_spool_staying_in_use_waits_for_the_next_collect(project, monkeypatch):
+    project["app"]["artifact_format"] = "spool"
+    glog.write_artifact(project, "ADDED", "spooled while in use")
+    _busy_spools(monkeypatch, spool.ROTATE_TRIES)
+
+    assert not glog.collect_changelogs(project)
+    assert not messages(project)
+
+    assert glog.collect_changelogs(project)
+    assert set(messages(project)) == {"spooled while in use"}
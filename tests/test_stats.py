@@ -0,0 +1,36 @@
+# glog --stats: the incrementally kept view on both store engines.
+
+import synthetic
+from conftest import SAME_SIZE, write_store
+from gslogger import stats, store
+
+
+def test_stats(history):
+    view = stats.stats(history)
+    assert view["versions"] == 5
+    assert view["entries"] == 6
+    assert view["first"] == [0, 0, 1] and view["last"] == [0, 1, 1]
+    assert view["types"]["FIXED"] == {"entries": 2, "versions": 2}
+    assert view["contributors"]["Bob <bob@example.com>"] == {"versions": 3, "first": [0, 0, 2], "last": [0, 1, 1]}
+    assert view["months"] == {"2024-01": 1, "2024-02": 1, "2024-03": 1, "2024-04": 2}
+    assert "| Carol <carol@example.com> | 1 | v0.1.0 | v0.1.0 |" in stats.format_stats(view, chtypes=history["CHTYPES"])
+
+
+def test_stats_follow_an_import_of_the_same_size(project, tmp_path):
+    store.import_json(project, write_store(tmp_path / "first.json", SAME_SIZE[0]))
+    assert list(stats.stats(project)["contributors"]) == ["Alice <alice@example.com>"]
+
+    store.import_json(project, write_store(tmp_path / "second.json", SAME_SIZE[1]))
+    assert list(stats.stats(project)["contributors"]) == ["Bob <bob@example.com>"]
+
+
+def test_stats_keep_the_counts_of_every_version(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    data = synthetic.make_project(tmp_path)
+    synthetic.make_store(data, 120, segment_size=50)
+
+    view = stats.stats(data)
+    records = list(reversed(list(store.iter_versions(data))))
+    assert [v for v, _, _ in view["by_version"]] == [r["version_number"] for r in records]
+    assert view["by_version"][0][2] == {t: len(m) for t, m in records[0]["logs"].items()}
+    assert sum(sum(counts.values()) for _, _, counts in view["by_version"]) == view["entries"]
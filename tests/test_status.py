@@ -0,0 +1,65 @@
+# glog --status: the next version predicted as collect would make it, from
+# an index writers keep current and a rescan when they couldn't.
+
+import os
+import shutil
+
+from gslogger import dedup, glog, status
+
+
+def _config(data: dict) -> dict:
+    return glog.load_config(data["paths"]["FILE_CONFIG"])
+
+
+def test_status_predicts_the_next_collect(project):
+    glog.write_artifact(project, "FIXED", "crash on an empty store", stamp="2024-01-01-00-00-01")
+    glog.write_artifact(project, "ADDED", "a search command --f", stamp="2024-01-01-00-00-02")
+    glog.write_artifact(project, "FIXED", "search crash on a single letter", "Bob <bob@example.com>",
+                        stamp="2024-01-01-00-00-03")
+
+    result = status.status(project)
+    assert result["pending"] == 3 and result["rescanned"]
+    assert result["types"] == {"ADDED": 1, "FIXED": 2}
+    assert result["contributors"] == ["Bob <bob@example.com>", "bench <bench@example.com>"]
+    assert "## NEXT VERSION: v0.1.1 | BUILD: 3 (now v0.0.0 | BUILD: 0)" in status.format_status(result)
+
+    assert glog.collect_changelogs(_config(project))
+    config = _config(project)
+    assert config["app"]["version_number"] == result["version_number"]
+    assert config["app"]["build_number"] == result["build_number"]
+
+    after = status.status(config)
+    assert after["pending"] == 0 and after["current_version"] == result["version_number"]
+
+
+def test_writers_keep_the_index_current(project):
+    glog.write_artifact(project, "ADDED", "first pending artifact", stamp="2024-01-01-00-00-01")
+    assert status.status(project)["rescanned"]
+
+    second = glog.write_artifact(project, "ADDED", "second pending artifact", stamp="2024-01-01-00-00-02")
+    result = status.status(project)
+    assert result["pending"] == 2 and not result["rescanned"]
+
+    # removed behind the index's back
+    os.remove(second)
+    result = status.status(project)
+    assert result["pending"] == 1 and result["rescanned"]
+
+
+def test_status_does_not_build_the_dedup_index(project):
+    glog.write_artifact(project, "FIXED", "crash on an empty store", stamp="2024-01-01-00-00-01")
+    glog.write_artifact(project, "FIXED", "Crash on an  empty store", stamp="2024-01-01-00-00-02")
+    assert glog.collect_changelogs(_config(project))
+    config = _config(project)
+    config["app"]["dedup_policy"] = "skip"
+    shutil.rmtree(dedup._dedup_dir(config))
+
+    glog.write_artifact(config, "FIXED", "crash on an empty store", stamp="2024-01-01-00-00-03")
+    glog.write_artifact(config, "ADDED", "a search command", stamp="2024-01-01-00-00-04")
+    glog.write_artifact(config, "ADDED", "A search  command", stamp="2024-01-01-00-00-05")
+    result = status.status(config)
+    # the repeat within the backlog is found, the copy of v0.0.1 can't be
+    assert result["pending"] == 2 and result["duplicates"] == 1
+    assert not result["history_checked"]
+    assert "the next collect builds the dedup index" in status.format_status(result)
+    assert not dedup._dedup_dir(config).exists()
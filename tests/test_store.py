@@ -0,0 +1,87 @@
+# --import-store: the old store stays whole until the new one replaces it,
+# on both engines, and an interrupted import is finished or undone by
+# recover() like a collect.
+
+import pytest
+
+import synthetic
+from conftest import HISTORY, SAME_SIZE, write_store
+from gslogger import journal, sqlstore, store
+
+
+def _versions(data: dict) -> list:
+    return [r["version_number"] for r in store.iter_versions(data)]
+
+
+def test_import_replaces_the_store(project, tmp_path):
+    store.import_json(project, write_store(tmp_path / "history.json", HISTORY))
+    store.import_json(project, write_store(tmp_path / "first.json", SAME_SIZE[0]))
+    assert _versions(project) == [[0, 0, 2], [0, 0, 1]]
+    assert not list(store.store_dir(project).glob("*" + journal.STAGE_SUFFIX))
+    assert not journal.journal_path(project).exists()
+
+
+def test_import_replaces_archived_segments(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    data = synthetic.make_project(tmp_path)
+    synthetic.make_store(data, 60, segment_size=10)
+    store.compact(data, [0, 0, 30])
+
+    store.import_json(data, write_store(tmp_path / "first.json", SAME_SIZE[0]))
+    assert _versions(data) == [[0, 0, 2], [0, 0, 1]]
+    assert sorted(p.name for p in store.store_dir(data).glob("*.json*")) == ["manifest.json", "seg-000000.jsonl"]
+
+
+@pytest.mark.parametrize("engine", ["segments"])
+def test_import_interrupted_before_the_commit_point_keeps_the_old_store(project, tmp_path, monkeypatch):
+    store.import_json(project, write_store(tmp_path / "history.json", HISTORY))
+    write_journal = journal._write_journal
+
+    def crash(target, entry):
+        if entry["state"] == "committed":
+            raise SystemExit("crash before the commit point")
+        write_journal(target, entry)
+
+    monkeypatch.setattr(journal, "_write_journal", crash)
+    with pytest.raises(SystemExit):
+        store.import_json(project, write_store(tmp_path / "first.json", SAME_SIZE[0]))
+    monkeypatch.undo()
+
+    # the old store is still all there, before and after the roll back
+    assert _versions(project) == [r["version_number"] for r in reversed(HISTORY)]
+    assert journal.recover(project) is False
+    assert _versions(project) == [r["version_number"] for r in reversed(HISTORY)]
+    assert not list(store.store_dir(project).glob("*" + journal.STAGE_SUFFIX))
+
+
+@pytest.mark.parametrize("engine", ["segments"])
+def test_import_interrupted_after_the_commit_point_rolls_forward(project, tmp_path, monkeypatch):
+    store.import_json(project, write_store(tmp_path / "history.json", HISTORY))
+
+    def crash(entry):
+        raise SystemExit("crash after the commit point")
+
+    monkeypatch.setattr(journal, "_apply", crash)
+    with pytest.raises(SystemExit):
+        store.import_json(project, write_store(tmp_path / "first.json", SAME_SIZE[0]))
+    monkeypatch.undo()
+
+    assert journal.recover(project) is True
+    assert _versions(project) == [[0, 0, 2], [0, 0, 1]]
+    assert sorted(p.name for p in store.store_dir(project).glob("seg-*")) == ["seg-000000.jsonl"]
+
+
+@pytest.mark.parametrize("engine", ["sqlite"])
+def test_failed_sqlite_import_keeps_the_old_database(project, tmp_path, monkeypatch):
+    store.import_json(project, write_store(tmp_path / "history.json", HISTORY))
+
+    def fail(con, log_store):
+        raise ValueError("bad record")
+
+    monkeypatch.setattr(sqlstore, "import_records", fail)
+    with pytest.raises(ValueError):
+        store.import_json(project, write_store(tmp_path / "first.json", SAME_SIZE[0]))
+    monkeypatch.undo()
+
+    assert _versions(project) == [r["version_number"] for r in reversed(HISTORY)]
+    assert not list(store.store_dir(project).glob("*.tmp"))
@@ -0,0 +1,59 @@
+# jin templates: the compiled template language, and glog -g writing every
+# output format, built in or from glog.json's "templates", in one pass.
+
+import json
+
+import pytest
+
+from conftest import HISTORY
+from gslogger import jin, store
+
+
+def test_compiled_template():
+    render = jin.compile_template(
+        '{% for a_type, items in logs %}{{ a_type | upper }}: {{ items | join(", ") }};{% endfor %}'
+        "{# a comment #}{% if shown %}shown{% elif other %}other{% else %}hidden{% endif %}"
+        '  {{- missing | default("none") }}'
+    )
+    assert render({"logs": {"added": ["a", "b"], "fixed": ["c"]}, "shown": 0}) == "ADDED: a, b;FIXED: c;hiddennone"
+    assert render({"logs": {}, "other": 1, "missing": "set"}) == "otherset"
+    assert jin.compile_template("{{ s | escape }}")({"s": "<a & b>"}) == "&lt;a &amp; b&gt;"
+
+
+@pytest.mark.parametrize(
+    "source, error",
+    [
+        ("{% for x in y %}", "'for x in y' is never closed"),
+        ("{{ x | nofilter }}", "unknown filter 'nofilter'"),
+        ("{% endif %}", "unknown tag 'endif'"),
+    ],
+)
+def test_bad_template_is_reported(source, error):
+    with pytest.raises(jin.TemplateError, match=error):
+        jin.compile_template(source)
+
+
+def test_every_format_is_written(history, tmp_path):
+    (tmp_path / "version.txt").write_text("{{ ver.version_number | version }} {{ ver.date }}\n", encoding="utf-8")
+    history["app"]["output_formats"] = ["md", "json", "txt"]
+    history["templates"] = {
+        "md": {"foot": "\n\nMaintained by the release team"},
+        "txt": {"ext": ".txt", "head": "{{ app.app_title }}\n", "version": "@version.txt", "foot": ""},
+    }
+    assert jin.write_report(history) is True
+
+    base = tmp_path / "changelog"
+    assert base.with_suffix(".md").read_text(encoding="utf-8").endswith("\n\nMaintained by the release team")
+    versions = json.loads(base.with_suffix(".json").read_text(encoding="utf-8"))["versions"]
+    assert [v["version_number"] for v in versions] == [r["version_number"] for r in reversed(HISTORY)]
+    assert base.with_suffix(".txt").read_text(encoding="utf-8").splitlines()[1:] == [
+        "v0.1.1 2024-04-20", "v0.1.0 2024-04-01", "v0.0.3 2024-03-05", "v0.0.2 2024-02-10", "v0.0.1 2024-01-01",
+    ]
+
+    # a changed template renders its format again
+    (tmp_path / "version.txt").write_text("{{ ver.version_number | version }}\n", encoding="utf-8")
+    assert jin.write_report(history) is True
+    assert base.with_suffix(".txt").read_text(encoding="utf-8").splitlines()[1] == "v0.1.1"
+    store.append_version(history, dict(HISTORY[-1], version_number=[0, 1, 2], build_number=2))
+    assert jin.write_report(history) is True
+    assert base.with_suffix(".txt").read_text(encoding="utf-8").splitlines()[1:3] == ["v0.1.2", "v0.1.1"]
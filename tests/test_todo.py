@@ -0,0 +1,43 @@
+# glog --todo: futures collected as numbered records, resolved by a later
+# "--done <id>", and stores holding the old "<n> - text" strings.
+
+from gslogger import glog, store, todo
+
+
+def _collect(data: dict) -> dict:
+    assert glog.collect_changelogs(glog.load_config(data["paths"]["FILE_CONFIG"]))
+    return glog.load_config(data["paths"]["FILE_CONFIG"])
+
+
+def test_futures_are_numbered_and_resolved(project):
+    glog.write_artifact(project, "FUTURE UPDATES", "split the parser out", stamp="2024-01-01-00-00-01")
+    glog.write_artifact(project, "FUTURE UPDATES", "package a new release", stamp="2024-01-01-00-00-02")
+    config = _collect(project)
+    assert config["app"]["f_count"] == 2
+    items = todo.Todo(store.open_futures(config)).open_items()
+    assert [(r["id"], r["text"], r["added_in"]) for r in items] == [
+        (1, "Split the parser out", "v0.0.2"),
+        (2, "Package a new release", "v0.0.2"),
+    ]
+
+    glog.write_artifact(config, "FIXED", "the parser is its own module --done 1")
+    config = _collect(config)
+    items = todo.Todo(store.open_futures(config)).open_items()
+    assert todo.format_todo(items) == "## TODO: 1 open\n\n- [ ] 2 - Package a new release (since v0.0.2)"
+    resolved = todo.Todo(store.load_manifest(config)["doc_parts"]["futures"]).get(1)
+    assert resolved["status"] == todo.RESOLVED and resolved["resolved_in"] == "v0.0.3"
+
+    # ids are never handed out twice
+    glog.write_artifact(config, "FUTURE UPDATES", "a third plan for later")
+    config = _collect(config)
+    assert [r["id"] for r in todo.Todo(store.open_futures(config)).open_items()] == [2, 3]
+
+
+def test_legacy_futures_sort_by_number():
+    items = todo.records(["10 - tenth", "2 - second", "written by hand"])
+    assert [(r["id"], r["text"]) for r in items] == [(2, "second"), (10, "tenth"), (11, "written by hand")]
+    assert todo.rendered(items) == ["2 - second", "10 - tenth", "11 - written by hand"]
+
+    futures, f_count, unknown = todo.collect(["10 - tenth"], ["new one"], [10, 99], "v1.0.0", 4)
+    assert [(r["id"], r["status"]) for r in futures] == [(10, todo.RESOLVED), (11, todo.OPEN)]
+    assert f_count == 11 and unknown == [99]
@@ -0,0 +1,47 @@
+# glog --watch: pending artifacts counted from change events, and a cycle
+# collecting them and writing the changelog.
+
+import os
+from pathlib import Path
+
+from conftest import messages
+from gslogger import glog, jin, watch
+
+
+def test_pending_counts_files_and_spool_records(project):
+    pending = watch.Pending(project)
+    pending.resync()
+    assert len(pending) == 0 and pending.first is None
+
+    pending.file_changed(Path(glog.write_artifact(project, "ADDED", "a file artifact")).name)
+    assert len(pending) == 1 and pending.first is not None
+
+    project["app"]["artifact_format"] = "spool"
+    glog.write_artifact(project, "ADDED", "a spooled artifact")
+    glog.write_artifact(project, "FIXED", "another spooled artifact")
+    for spool_name in os.listdir(pending.spool_folder):
+        pending.spool_changed(spool_name)
+    assert len(pending) == 3
+
+    # a listing finds the same
+    pending.resync()
+    assert len(pending) == 3
+
+
+def test_a_cycle_collects_and_generates(project, monkeypatch):
+    project["app"].update(watch_backend="poll", watch_poll_interval=0.01, watch_debounce=0)
+    glog.write_artifact(project, "ADDED", "watched into the changelog")
+    # leave pytest's SIGTERM handler alone
+    monkeypatch.setattr(watch.signal, "signal", lambda *args: None)
+
+    cycles = []
+
+    def generate(data):
+        cycles.append(jin.write_report(data))
+        raise KeyboardInterrupt
+
+    watch.watch(project, glog.collect_changelogs, generate)
+    assert cycles == [True]
+    assert set(messages(project)) == {"watched into the changelog"}
+    with open(project["paths"]["FILE_OUTPUT"], encoding="utf-8") as fs:
+        assert "Watched into the changelog" in fs.read()